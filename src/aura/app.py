@@ -1,20 +1,19 @@
 import os
+import atexit
+import functools
+import itertools
 import logging
 import json
-import queue
 import threading
 import time
-import re
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
 from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from werkzeug.exceptions import HTTPException
-from dataclasses import dataclass, field
-from typing import List, Dict, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 import uuid
-import requests
 
 # IMPORT RELATIVO DO MÓDULO Accounts
 from .features.modules.Accounts import (
@@ -25,6 +24,29 @@ from .features.modules.Accounts import (
 )
 
 from . import bot_components_api
+from .http_cache import LIST_KEY, VersionedResponseCache
+from .locks import InstrumentedLock, LockStripes
+from .realtime import ChangeLog, SidebarFeed, SubscriberHub
+from .telegram import (
+    ChatOrderedWorkerPool,
+    DelayedSendScheduler,
+    PollingManager,
+    TelegramBotClient,
+    TelegramClientRegistry,
+    TelegramRateLimiter,
+    UpdateDeduplicator,
+)
+from .storage import (
+    BACKEND_JSON,
+    MODE_SNAPSHOT,
+    MemoryBudget,
+    ConversationIndex,
+    MessageColumns,
+    MessageView,
+    WriteBehindWriter,
+    create_repository,
+    window_bounds,
+)
 
 # --- Configurações Iniciais ---
 logging.getLogger('werkzeug').setLevel(logging.WARNING)
@@ -45,9 +67,14 @@ logger.info("Aplicação Flask iniciada e CORS configurado.")
 # Configuração de timezone brasileiro
 BRASIL_TZ = timezone(timedelta(hours=-3))
 
+# Como os updates do Telegram chegam: "webhook" (via NGROK_URL) ou "polling" (getUpdates, sem túnel)
+TELEGRAM_INGEST_MODE = os.environ.get('AURA_TELEGRAM_INGEST_MODE', 'webhook').strip().lower()
+
 # Se estiver em dev e não houver NGROK_URL, inicia ngrok automaticamente
 ngrok_url_env = os.environ.get('NGROK_URL')
-if os.environ.get('FLASK_ENV') == 'development' and not ngrok_url_env:
+if TELEGRAM_INGEST_MODE == 'polling':
+    logger.info("Ingestão do Telegram por polling (getUpdates) - ngrok não será iniciado")
+elif os.environ.get('FLASK_ENV') == 'development' and not ngrok_url_env:
     try:
         from pyngrok import ngrok, conf
         auth_token = os.environ.get('NGROK_AUTH_TOKEN')
@@ -62,15 +89,35 @@ if os.environ.get('FLASK_ENV') == 'development' and not ngrok_url_env:
 elif ngrok_url_env:
     logger.info(f"Usando NGROK_URL do .env: {ngrok_url_env}")
 
-# --- Definições de dataclasses para conversas e mensagens ---
-@dataclass
+# --- Modelos de conversas e mensagens ---
+# Classes com __slots__ (sem __dict__ por instância); as mensagens de cada conversa
+# ficam em colunas (MessageColumns) e os objetos Message são montados na leitura.
 class Message:
-    id: str
-    sender: str
-    text: str
-    timestamp: str = field(default_factory=lambda: datetime.now(BRASIL_TZ).isoformat())
-    read: bool = False
-    platform: str = "telegram"
+    __slots__ = ('id', 'sender', 'text', 'timestamp', 'read', 'platform')
+
+    def __init__(
+        self,
+        id: str,
+        sender: str,
+        text: str,
+        timestamp: Optional[str] = None,
+        read: bool = False,
+        platform: str = "telegram",
+    ):
+        self.id = id
+        self.sender = sender
+        self.text = text
+        self.timestamp = timestamp if timestamp is not None else datetime.now(BRASIL_TZ).isoformat()
+        self.read = read
+        self.platform = platform
+
+    def __eq__(self, other):
+        if not isinstance(other, Message):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in Message.__slots__)
+
+    def __repr__(self):
+        return f"Message(id={self.id!r}, sender={self.sender!r}, timestamp={self.timestamp!r})"
 
     def to_dict(self):
         return {
@@ -82,19 +129,44 @@ class Message:
             'platform': self.platform
         }
 
-@dataclass
 class Conversation:
-    id: str
-    title: str
-    createdAt: str = field(default_factory=lambda: datetime.now(BRASIL_TZ).isoformat())
-    participants: List[Dict] = field(default_factory=list)
-    messages: List[Message] = field(default_factory=list)
-    lastMessage: str = ""
-    lastAt: str = field(default_factory=lambda: datetime.now(BRASIL_TZ).isoformat())
-    isArchived: bool = False
-    platform: str = "telegram"
-    chat_type: str = "private"
-    is_bot_conversation: bool = False
+    __slots__ = (
+        'id', 'title', 'createdAt', 'participants', 'messages', 'lastMessage',
+        'lastAt', 'isArchived', 'platform', 'chat_type', 'is_bot_conversation',
+        'snapshot',
+    )
+
+    def __init__(
+        self,
+        id: str,
+        title: str,
+        createdAt: Optional[str] = None,
+        participants: Optional[List[Dict]] = None,
+        messages: Optional[Iterable[Message]] = None,
+        lastMessage: str = "",
+        lastAt: Optional[str] = None,
+        isArchived: bool = False,
+        platform: str = "telegram",
+        chat_type: str = "private",
+        is_bot_conversation: bool = False,
+    ):
+        now = datetime.now(BRASIL_TZ).isoformat()
+        self.id = id
+        self.title = title
+        self.createdAt = createdAt if createdAt is not None else now
+        self.participants = participants if participants is not None else []
+        self.messages = MessageColumns(Message, messages or ())
+        self.lastMessage = lastMessage
+        self.lastAt = lastAt if lastAt is not None else now
+        self.isArchived = isArchived
+        self.platform = platform
+        self.chat_type = chat_type
+        self.is_bot_conversation = is_bot_conversation
+        self.snapshot = None
+        self.publish()
+
+    def __repr__(self):
+        return f"Conversation(id={self.id!r}, title={self.title!r}, messages={len(self.messages)})"
 
     def to_dict(self):
         return {
@@ -110,149 +182,436 @@ class Conversation:
             'is_bot_conversation': self.is_bot_conversation
         }
 
+    def publish(self) -> "ConversationSnapshot":
+        """
+        Publica o estado atual para os leitores (chamar com o lock da conversa).
+        A troca de ``self.snapshot`` é uma única atribuição, então quem lê vê o
+        snapshot antigo ou o novo, nunca um estado parcial.
+        """
+        previous = self.snapshot
+        base = None
+        if previous is not None and previous.messages.source is self.messages:
+            # Mesmas colunas (só cresceram): a contagem por dia continua da anterior
+            base = previous._counted_by_date()
+        self.snapshot = ConversationSnapshot(self.to_dict(), self.messages.view(), base, next(_snapshot_versions))
+        return self.snapshot
+
+class ConversationSnapshot:
+    """
+    Estado imutável de uma conversa para leitura sem lock: metadados (``to_dict``)
+    e uma visão das mensagens existentes na publicação. Quem lê não deve alterar
+    ``conversation``; a contagem por dia é calculada na primeira consulta e
+    reaproveitada, de forma incremental, pelo snapshot seguinte. ``version`` cresce
+    a cada publicação, em todas as conversas (ordena as gravações de uma conversa,
+    mesmo depois de ela sair da memória e ser carregada de novo).
+    """
+
+    __slots__ = ('conversation', 'messages', 'version', '_by_date', '_base')
+
+    def __init__(
+        self,
+        conversation: Dict,
+        messages: MessageView,
+        base: Optional[Tuple[int, Dict[str, int]]] = None,
+        version: int = 0,
+    ):
+        self.conversation = conversation
+        self.messages = messages
+        self.version = version
+        self._by_date: Optional[Dict[str, int]] = None
+        # (mensagens já contadas, contagem) herdados do snapshot anterior
+        self._base = base
+
+    def _counted_by_date(self) -> Optional[Tuple[int, Dict[str, int]]]:
+        if self._by_date is not None:
+            return len(self.messages), self._by_date
+        return self._base
+
+    def messages_by_date(self) -> Dict[str, int]:
+        """Quantidade de mensagens por dia (AAAA-MM-DD); o dicionário não deve ser alterado"""
+        if self._by_date is None:
+            counted, base = self._base or (0, {})
+            by_date = dict(base)
+            for msg in self.messages[counted:]:
+                try:
+                    date_key = datetime.fromisoformat(msg.timestamp).strftime('%Y-%m-%d')
+                except ValueError:
+                    continue
+                by_date[date_key] = by_date.get(date_key, 0) + 1
+            # Dois leitores podem calcular ao mesmo tempo: o resultado é o mesmo
+            self._by_date = by_date
+            self._base = None
+        return self._by_date
+
+# Versão dos snapshots publicados (global; next() de itertools.count é atômico)
+_snapshot_versions = itertools.count(1)
+
 # Armazenamento otimizado em memória
 _conversations: Dict[str, Conversation] = {}
-_conversation_lock = threading.RLock()
 chat_to_account: Dict[str, str] = {}
-sse_subscribers: Dict[str, List[queue.Queue]] = {}
+
+# Locks: o global só protege entradas e saídas do mapa de conversas (curto, sem I/O);
+# alterações de uma conversa usam o lock da conversa, de uma tabela com striping.
+# Ordem: lock da conversa antes do global, nunca o contrário.
+CONVERSATION_LOCK_STRIPES = int(os.environ.get('AURA_CONVERSATION_LOCK_STRIPES', 64))
+
+_conversation_lock = InstrumentedLock(threading.RLock())
+_chat_locks = LockStripes(CONVERSATION_LOCK_STRIPES)
+
+def _chat_lock(conversation_id: str) -> InstrumentedLock:
+    """Lock das alterações de uma conversa (mensagens e metadados)"""
+    return _chat_locks.for_key(conversation_id)
+
+# Gravações de uma conversa, em série e separadas do lock da conversa (o I/O não
+# bloqueia quem acrescenta mensagens); nunca tomado antes do lock da conversa
+_save_locks = LockStripes(CONVERSATION_LOCK_STRIPES)
+# Versão do último snapshot gravado por conversa
+_persisted_versions: Dict[str, int] = {}
+
+# Streams SSE por conversa: fila limitada por assinante, replay dos eventos recentes
+# (Last-Event-ID) e heartbeat para detectar clientes desconectados
+SSE_QUEUE_SIZE = int(os.environ.get('AURA_SSE_QUEUE_SIZE', 100))
+SSE_REPLAY_SIZE = int(os.environ.get('AURA_SSE_REPLAY_SIZE', 50))
+SSE_HEARTBEAT_INTERVAL = float(os.environ.get('AURA_SSE_HEARTBEAT_INTERVAL', 15))
+# Fila cheia: "disconnect" (cliente reconecta e recupera pelo replay) ou "drop_oldest"
+SSE_OVERFLOW_POLICY = os.environ.get('AURA_SSE_OVERFLOW_POLICY', 'disconnect')
+# Buffers de replay de conversas sem assinantes: descartados após AURA_SSE_TOPIC_TTL
+# segundos sem eventos ou além de AURA_SSE_MAX_TOPICS (os menos recentes primeiro)
+SSE_MAX_TOPICS = int(os.environ.get('AURA_SSE_MAX_TOPICS', 1000))
+SSE_TOPIC_TTL = float(os.environ.get('AURA_SSE_TOPIC_TTL', 600))
+
+_sse_hub = SubscriberHub(
+    max_queue=SSE_QUEUE_SIZE,
+    replay_size=SSE_REPLAY_SIZE,
+    overflow=SSE_OVERFLOW_POLICY,
+    max_topics=SSE_MAX_TOPICS,
+    idle_ttl=SSE_TOPIC_TTL,
+)
+
+# Feed único de mudanças da lista de conversas (barra lateral do painel)
+SSE_SIDEBAR_REPLAY_SIZE = int(os.environ.get('AURA_SSE_SIDEBAR_REPLAY_SIZE', 500))
+# Mutações recentes numeradas por uma sequência global (/api/conversations/changes)
+CHANGE_LOG_SIZE = int(os.environ.get('AURA_CHANGE_LOG_SIZE', 10000))
+_change_log = ChangeLog(CHANGE_LOG_SIZE)
+
+_sidebar_feed = SidebarFeed(
+    SubscriberHub(max_queue=SSE_QUEUE_SIZE, replay_size=SSE_SIDEBAR_REPLAY_SIZE, overflow=SSE_OVERFLOW_POLICY)
+)
 
 DATA_DIR = Path(__file__).resolve().parent / "data" / "telegram_history"
 DATA_DIR.mkdir(parents=True, exist_ok=True)
 
-_FILENAME_SANITIZER = re.compile(r"[^a-z0-9_-]+")
+# Backend das conversas: "json" (arquivos em DATA_DIR) ou "sqlite"
+STORAGE_BACKEND = os.environ.get('AURA_STORAGE_BACKEND', BACKEND_JSON)
+SQLITE_PATH = os.environ.get('AURA_SQLITE_PATH')
+
+# Modo de gravação do histórico JSON: "snapshot" (arquivo inteiro) ou "append" (log + metadados)
+HISTORY_MODE = os.environ.get('AURA_HISTORY_MODE', MODE_SNAPSHOT)
+HISTORY_COMPACT_THRESHOLD = int(os.environ.get('AURA_HISTORY_COMPACT_THRESHOLD', 500))
+HISTORY_COMPACT_INTERVAL = float(os.environ.get('AURA_HISTORY_COMPACT_INTERVAL', 60))
+
+# Intervalo mínimo (s) entre gravações da mesma conversa; 0 grava de forma síncrona
+WRITE_BEHIND_INTERVAL = float(os.environ.get('AURA_WRITE_BEHIND_INTERVAL', 1.0))
+
+# Orçamento de memória das conversas residentes (0 = sem limite); acima dele, as
+# conversas menos usadas são despejadas e recarregadas do armazenamento sob demanda
+MEMORY_MAX_MESSAGES = int(os.environ.get('AURA_MEMORY_MAX_MESSAGES', 0))
+MEMORY_MAX_BYTES = int(os.environ.get('AURA_MEMORY_MAX_BYTES', 0))
+MEMORY_MIN_IDLE = float(os.environ.get('AURA_MEMORY_MIN_IDLE', 30))
 
-# Cache para otimização
-_cache = {
-    'conversations_last_update': 0,
-    'conversations_cache': [],
-    'cache_duration': 5
-}
+_memory_budget = MemoryBudget(MEMORY_MAX_MESSAGES, MEMORY_MAX_BYTES, MEMORY_MIN_IDLE)
 
+_history_store = create_repository(
+    STORAGE_BACKEND,
+    DATA_DIR,
+    history_mode=HISTORY_MODE,
+    compact_threshold=HISTORY_COMPACT_THRESHOLD,
+    sqlite_path=Path(SQLITE_PATH) if SQLITE_PATH else None,
+)
+
+# Respostas JSON já codificadas por versão de conversa (ETag / If-None-Match)
+_response_cache = VersionedResponseCache()
+
+# Conversas listáveis ordenadas por lastAt, atualizadas a cada alteração
+_conversation_index = ConversationIndex()
 
-def _sanitize_filename(value: str) -> str:
-    if not value:
-        return "contato"
 
-    normalized = value.strip().lower()
-    sanitized = _FILENAME_SANITIZER.sub("_", normalized)
-    sanitized = re.sub(r"_+", "_", sanitized).strip("_")
-    return sanitized or "contato"
+def _index_conversation(conversation_id: str, conversation: Optional[Dict]):
+    if conversation is None or conversation.get('is_bot_conversation'):
+        _conversation_index.remove(conversation_id)
+    else:
+        _conversation_index.upsert(conversation)
 
 
-def _history_path(title: str, conversation_id: str) -> Path:
-    safe_title = _sanitize_filename(title or conversation_id)
-    return DATA_DIR / f"{safe_title}_{conversation_id}_telegram.json"
+def _rebuild_conversation_index():
+    """Carrega o índice a partir do catálogo do armazenamento (inicialização)"""
+    for entry in _history_store.list_metadata():
+        conversation = entry["conversation"]
+        _index_conversation(conversation["id"], conversation)
+        _sidebar_feed.prime(conversation, entry.get("messageCount", 0))
 
 
-def _find_history_path(conversation_id: str) -> Optional[Path]:
-    possible_files = list(DATA_DIR.glob(f"*_{conversation_id}_telegram.json"))
-    return possible_files[0] if possible_files else None
+def _conversation_changed(conversation_id: str):
+    """
+    Chamada depois de cada alteração de uma conversa: atualiza o índice, invalida as
+    respostas em cache e publica o delta da barra lateral
+    """
+    with _chat_lock(conversation_id):
+        conv = _conversations.get(conversation_id)
+        if conv is not None:
+            conversation = conv.publish().conversation
+        else:
+            # Fora da memória (removida só da memória): vale o que está no catálogo
+            entry = _history_store.get_metadata(conversation_id)
+            conversation = entry["conversation"] if entry else None
+        _index_conversation(conversation_id, conversation)
+
+        if conversation is None:
+            _change_log.conversation_deleted(conversation_id)
+            _sidebar_feed.conversation_removed(conversation_id)
+        else:
+            _change_log.conversation_changed(conversation)
+            _sidebar_feed.conversation_changed(conversation, conv.messages if conv is not None else None)
+    _response_cache.bump(conversation_id)
+
 
+def _conversation_removed(conversation_id: str):
+    """Chamada quando a conversa é apagada de vez"""
+    _conversation_index.remove(conversation_id)
+    _response_cache.forget(conversation_id)
+    _sse_hub.drop_topic(conversation_id)
+    _change_log.conversation_deleted(conversation_id)
+    _sidebar_feed.conversation_removed(conversation_id)
 
-def _conversation_to_full_dict(conv: Conversation) -> Dict:
-    data = conv.to_dict()
-    data["messages"] = [msg.to_dict() for msg in conv.messages]
-    return data
+
+def _versioned_json(view):
+    """
+    Serve a resposta de um GET do cache enquanto a versão da conversa (ou da lista de
+    conversas) não muda, com ETag; um If-None-Match igual recebe 304 sem serialização.
+    Só respostas 200 são guardadas.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = kwargs.get('conversation_id', LIST_KEY)
+        variant = request.full_path
+        version = _response_cache.version(key)
+        etag = _response_cache.etag(key, variant, version)
+
+        if request.if_none_match.contains(etag):
+            _response_cache.record_not_modified()
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
+
+        body = _response_cache.get(key, variant, version)
+        if body is None:
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            body = response.get_data()
+            _response_cache.put(key, variant, version, body)
+
+        response = Response(body, status=200, mimetype='application/json')
+        response.set_etag(etag)
+        return response
+
+    return wrapper
 
 
 def _load_conversation_from_disk(conversation_id: str, fallback_title: str = "") -> Optional[Conversation]:
+    """
+    Carrega a conversa do armazenamento e a coloca em memória. A leitura e a montagem
+    das mensagens acontecem fora dos locks; se a conversa já estiver residente (ou for
+    incluída por outra thread), a instância existente é devolvida sem alterações.
+    """
     try:
-        history_path = _find_history_path(conversation_id)
-        if not history_path or not history_path.exists():
+        data = _history_store.load(conversation_id)
+        if data is None:
             return None
 
-        with history_path.open("r", encoding="utf-8") as file:
-            data = json.load(file)
-
-        title = data.get("title") or fallback_title or conversation_id
-
-        with _conversation_lock:
-            conv = _conversations.get(conversation_id) or Conversation(
-                id=conversation_id,
-                title=title,
-                createdAt=data.get("createdAt", get_brasil_time()),
-                lastMessage=data.get("lastMessage", ""),
-                lastAt=data.get("lastAt", get_brasil_time()),
-                isArchived=data.get("isArchived", False),
-                platform=data.get("platform", "telegram"),
-                chat_type=data.get("chat_type", "private"),
-                is_bot_conversation=data.get("is_bot_conversation", False)
+        platform = data.get("platform", "telegram")
+        messages = [
+            Message(
+                id=msg_data.get("id", uuid.uuid4().hex),
+                sender=msg_data.get("sender", "user"),
+                text=msg_data.get("text", ""),
+                timestamp=msg_data.get("timestamp", get_brasil_time()),
+                read=msg_data.get("read", False),
+                platform=msg_data.get("platform", platform)
             )
+            for msg_data in data.get("messages", [])
+        ]
+
+        # Mantém a ordem de gravação (sem reordenar por timestamp): a posição em memória
+        # é o seq do cursor de paginação, o mesmo que o armazenamento usa
+        loaded = Conversation(
+            id=conversation_id,
+            title=data.get("title") or fallback_title or conversation_id,
+            createdAt=data.get("createdAt", get_brasil_time()),
+            messages=messages,
+            lastMessage=data.get("lastMessage", ""),
+            lastAt=data.get("lastAt", get_brasil_time()),
+            isArchived=data.get("isArchived", False),
+            platform=platform,
+            chat_type=data.get("chat_type", "private"),
+            is_bot_conversation=data.get("is_bot_conversation", False)
+        )
 
-            conv.title = title
-            conv.createdAt = data.get("createdAt", conv.createdAt)
-            conv.lastMessage = data.get("lastMessage", conv.lastMessage)
-            conv.lastAt = data.get("lastAt", conv.lastAt)
-            conv.isArchived = data.get("isArchived", conv.isArchived)
-            conv.platform = data.get("platform", conv.platform)
-            conv.chat_type = data.get("chat_type", conv.chat_type)
-            conv.is_bot_conversation = data.get("is_bot_conversation", conv.is_bot_conversation)
-
-            conv.messages = []
-            for msg_data in data.get("messages", []):
-                conv.messages.append(
-                    Message(
-                        id=msg_data.get("id", uuid.uuid4().hex),
-                        sender=msg_data.get("sender", "user"),
-                        text=msg_data.get("text", ""),
-                        timestamp=msg_data.get("timestamp", get_brasil_time()),
-                        read=msg_data.get("read", False),
-                        platform=msg_data.get("platform", conv.platform)
-                    )
-                )
-
-            def _msg_datetime(message: Message) -> datetime:
-                try:
-                    return datetime.fromisoformat(message.timestamp)
-                except ValueError:
-                    return datetime.fromtimestamp(0, tz=BRASIL_TZ)
+        # Incluída só se ainda não estiver em memória: a instância residente pode ter
+        # mensagens mais novas que o disco e não é substituída
+        with _chat_lock(conversation_id):
+            with _conversation_lock:
+                conv = _conversations.setdefault(conversation_id, loaded)
+            _memory_budget.touch(conversation_id, conv.snapshot.messages)
 
-            conv.messages.sort(key=_msg_datetime)
-            _conversations[conversation_id] = conv
-            return conv
+        if conv is loaded:
+            _evict_cold_conversations()
+        return conv
     except Exception as error:
         logger.error(f"Erro ao carregar histórico da conversa {conversation_id}: {error}")
         return None
 
 
-def _load_all_conversations_from_disk():
-    for file_path in DATA_DIR.glob("*_telegram.json"):
-        try:
-            with file_path.open("r", encoding="utf-8") as file:
-                data = json.load(file)
+def _get_conversation(conversation_id: str) -> Optional[Conversation]:
+    """Retorna a conversa em memória ou carrega o histórico do disco sob demanda"""
+    conv = _conversations.get(conversation_id)
+    if conv is not None:
+        _memory_budget.touch(conversation_id, conv.snapshot.messages)
+    else:
+        conv = _load_conversation_from_disk(conversation_id)
+    return conv
 
-            conversation_id = str(data.get("id") or data.get("conversation_id") or "").strip()
-            if not conversation_id:
+
+def _evict_cold_conversations() -> int:
+    """
+    Despeja as conversas menos usadas enquanto o orçamento de memória estiver estourado.
+    Só sai da memória o que já está gravado por inteiro; os metadados continuam
+    disponíveis pelo catálogo do armazenamento.
+    """
+    if not _memory_budget.over_budget():
+        return 0
+
+    evicted = 0
+    for conv_id in _memory_budget.eviction_candidates():
+        # Lock global só para ler o mapa; a consulta ao catálogo (SQL no SQLite) fica fora
+        with _conversation_lock:
+            conv = _conversations.get(conv_id)
+        if conv is None:
+            _memory_budget.forget(conv_id)
+            continue
+        if _history_writer and _history_writer.is_dirty(conv_id):
+            continue
+
+        message_count = len(conv.snapshot.messages)
+        entry = _history_store.get_metadata(conv_id)
+        if entry is None or entry.get("messageCount") != message_count:
+            continue
+
+        # Conversa sendo alterada agora não é candidata (e não se espera pelo lock dela).
+        # Confere de novo, na ordem chat -> global, que nada mudou desde a consulta
+        chat_lock = _chat_lock(conv_id)
+        if not chat_lock.acquire(blocking=False):
+            continue
+        try:
+            if len(conv.messages) != message_count:
+                continue
+            if _history_writer and _history_writer.is_dirty(conv_id):
                 continue
+            with _conversation_lock:
+                if _conversations.get(conv_id) is not conv:
+                    continue
+                del _conversations[conv_id]
+            _memory_budget.evicted(conv_id)
+            _persisted_versions.pop(conv_id, None)
+            evicted += 1
+        finally:
+            chat_lock.release()
+
+    if evicted:
+        logger.info(f"{evicted} conversas despejadas da memória (orçamento excedido)")
+    return evicted
+
+
+def _conversation_summaries() -> Dict[str, Dict]:
+    """Metadados de todas as conversas: catálogo em disco sobreposto pelas conversas em memória"""
+    summaries = {
+        entry["conversation"]["id"]: entry
+        for entry in _history_store.list_metadata()
+    }
+
+    # Snapshots publicados: nenhum lock, nem o global (list() copia o dicionário de uma vez)
+    for conv in list(_conversations.values()):
+        snapshot = conv.snapshot
+        entry = summaries.get(conv.id) or {}
+        message_count = len(snapshot.messages)
+        messages_by_date = entry.get("messagesByDate")
+        if messages_by_date is None or entry.get("messageCount") != message_count:
+            messages_by_date = snapshot.messages_by_date()
+
+        summaries[conv.id] = {
+            "conversation": snapshot.conversation,
+            "messageCount": message_count,
+            "messagesByDate": messages_by_date,
+        }
 
-            _load_conversation_from_disk(conversation_id, data.get("title", ""))
-        except Exception as error:
-            logger.error(f"Erro ao carregar histórico em {file_path}: {error}")
+    return summaries
 
-def _save_conversation_history(conv: Conversation):
-    try:
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
-        new_path = _history_path(conv.title, conv.id)
-        existing_path = _find_history_path(conv.id)
+def _persist_snapshot(conv: Conversation):
+    """
+    Grava o snapshot publicado mais recente da conversa. As gravações da mesma conversa
+    são feitas em série e um snapshot que não é mais novo que o último gravado é
+    ignorado: duas gravações concorrentes nunca devolvem o arquivo a um estado antigo.
+    """
+    with _save_locks.for_key(conv.id):
+        snapshot = conv.snapshot
+        if snapshot.version <= _persisted_versions.get(conv.id, 0):
+            return
+        # O store só serializa as mensagens ainda não gravadas
+        _history_store.save(snapshot.conversation, snapshot.messages)
+        _persisted_versions[conv.id] = snapshot.version
 
-        if existing_path and existing_path != new_path and existing_path.exists():
-            try:
-                existing_path.unlink()
-            except OSError as remove_error:
-                logger.warning(f"Não foi possível remover histórico antigo {existing_path}: {remove_error}")
 
-        with new_path.open("w", encoding="utf-8") as file:
-            json.dump(_conversation_to_full_dict(conv), file, ensure_ascii=False, indent=2)
+def _flush_conversation(conversation_id: str):
+    """Grava no disco o estado atual de uma conversa em memória"""
+    conv = _conversations.get(conversation_id)
+    if conv is not None:
+        _persist_snapshot(conv)
 
-        _cache['conversations_last_update'] = 0
+_history_writer = WriteBehindWriter(_flush_conversation, WRITE_BEHIND_INTERVAL) if WRITE_BEHIND_INTERVAL > 0 else None
+if _history_writer:
+    atexit.register(_history_writer.stop)
+
+_rebuild_conversation_index()
+
+def _save_conversation_history(conv: Conversation, changed: bool = True):
+    """
+    Grava a conversa. Com ``changed``, a alteração ainda não foi notificada: publica o
+    snapshot e invalida os caches (_conversation_changed) antes de gravar. Quem já
+    notificou sob o lock da conversa passa False e só grava.
+    """
+    try:
+        if changed:
+            _conversation_changed(conv.id)
+
+        # Fora do lock da conversa: só o snapshot publicado pode ser lido
+        _memory_budget.touch(conv.id, conv.snapshot.messages)
+
+        if _history_writer:
+            _history_writer.mark_dirty(conv.id)
+        else:
+            _persist_snapshot(conv)
     except Exception as error:
         logger.error(f"Erro ao salvar histórico da conversa {conv.id}: {error}")
 
+    _evict_cold_conversations()
+
 def _delete_conversation_history(conversation_id: str):
+    _memory_budget.forget(conversation_id)
+    _persisted_versions.pop(conversation_id, None)
     try:
-        history_path = _find_history_path(conversation_id)
-        if history_path and history_path.exists():
-            history_path.unlink()
+        if _history_writer:
+            _history_writer.discard(conversation_id)
+        _history_store.delete(conversation_id)
     except Exception as error:
         logger.error(f"Erro ao remover histórico da conversa {conversation_id}: {error}")
 
@@ -266,78 +625,138 @@ def cleanup_old_conversations():
     cutoff_time = datetime.now(BRASIL_TZ) - timedelta(hours=24)
     cutoff_iso = cutoff_time.isoformat()
 
+    removed = []
     with _conversation_lock:
-        to_remove = []
-        for conv_id, conv in _conversations.items():
-            if conv.lastAt < cutoff_iso and len(conv.messages) == 0:
-                to_remove.append(conv_id)
+        for conv_id, conv in list(_conversations.items()):
+            if conv.lastAt >= cutoff_iso or len(conv.messages) != 0:
+                continue
+            # Não espera por conversas em uso: ficam para a próxima limpeza
+            chat_lock = _chat_lock(conv_id)
+            if not chat_lock.acquire(blocking=False):
+                continue
+            try:
+                del _conversations[conv_id]
+                _memory_budget.forget(conv_id)
+                removed.append(conv_id)
+            finally:
+                chat_lock.release()
 
-        for conv_id in to_remove:
-            del _conversations[conv_id]
-            logger.info(f"Conversa inativa removida: {conv_id}")
+    for conv_id in removed:
+        _conversation_changed(conv_id)
+        logger.info(f"Conversa inativa removida: {conv_id}")
+
+    _evict_cold_conversations()
 
 def broadcast_to_subscribers(conv_id: str, message_data: dict):
-    """Envia mensagem para todos os subscribers SSE"""
-    if conv_id in sse_subscribers:
-        dead_queues = []
-        for q in sse_subscribers[conv_id]:
-            try:
-                q.put(message_data, timeout=1)
-            except Exception:
-                dead_queues.append(q)
+    """Envia mensagem para todos os subscribers SSE; só enfileira para o despachante, sem bloquear"""
+    _change_log.message_added(conv_id, message_data)
+    _sse_hub.publish(conv_id, message_data)
 
-        for q in dead_queues:
-            sse_subscribers[conv_id].remove(q)
+# Conexões persistentes com a Bot API por conta (pool por cliente e timeout das chamadas)
+TELEGRAM_POOL_SIZE = int(os.environ.get('AURA_TELEGRAM_POOL_SIZE', 8))
+TELEGRAM_TIMEOUT = float(os.environ.get('AURA_TELEGRAM_TIMEOUT', 10))
 
-def send_telegram_message(chat_id: str, text: str, account_id: str, options: List[Dict] = None) -> bool:
-    """Envia mensagem via Telegram API - SEM botões, apenas texto"""
-    try:
-        accounts = listTelegramAccounts()
-        account = next((acc for acc in accounts if acc.id == account_id), None)
+_telegram_clients = TelegramClientRegistry(
+    listTelegramAccounts,
+    pool_size=TELEGRAM_POOL_SIZE,
+    timeout=TELEGRAM_TIMEOUT,
+)
+atexit.register(_telegram_clients.close)
 
-        bot_token = None
-        if account:
-            bot_token = account.apiKey
-            logger.info(f"Conta Telegram encontrada: {account_id} - {account.botName}")
-        else:
-            # Fallback: usar token da variável de ambiente
-            bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
-            if bot_token:
-                logger.warning(f"Conta {account_id} não encontrada em listTelegramAccounts, usando TELEGRAM_BOT_TOKEN da variável de ambiente")
-            else:
-                logger.error(f"Conta Telegram não encontrada: {account_id} e TELEGRAM_BOT_TOKEN não configurado")
-                logger.error(f"Contas disponíveis: {[acc.id for acc in accounts]}")
-                return False
+def _telegram_client(account_id: str) -> Optional[TelegramBotClient]:
+    """Cliente da conta; sem conta cadastrada, usa TELEGRAM_BOT_TOKEN como fallback"""
+    client = _telegram_clients.get(account_id)
+    if client:
+        return client
 
-        url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+    bot_token = os.environ.get('TELEGRAM_BOT_TOKEN')
+    if bot_token:
+        logger.warning(f"Conta {account_id} não encontrada em listTelegramAccounts, usando TELEGRAM_BOT_TOKEN da variável de ambiente")
+        return _telegram_clients.for_token(bot_token)
 
-        payload = {
-            'chat_id': chat_id,
-            'text': text,
-            'parse_mode': 'HTML'
-        }
+    logger.error(f"Conta Telegram não encontrada: {account_id} e TELEGRAM_BOT_TOKEN não configurado")
+    logger.error(f"Contas disponíveis: {[acc.id for acc in listTelegramAccounts()]}")
+    return None
+
+# Limites de envio da Bot API: mensagens/s por bot e por chat (com rajada) e espera máxima
+# aceitável em envios síncronos (painel) antes de desistir
+TELEGRAM_GLOBAL_RATE = float(os.environ.get('AURA_TELEGRAM_GLOBAL_RATE', 30))
+TELEGRAM_GLOBAL_BURST = int(os.environ.get('AURA_TELEGRAM_GLOBAL_BURST', 30))
+TELEGRAM_CHAT_RATE = float(os.environ.get('AURA_TELEGRAM_CHAT_RATE', 1))
+TELEGRAM_CHAT_BURST = int(os.environ.get('AURA_TELEGRAM_CHAT_BURST', 3))
+TELEGRAM_MAX_INLINE_WAIT = float(os.environ.get('AURA_TELEGRAM_MAX_INLINE_WAIT', 5))
+
+_telegram_rate_limiter = TelegramRateLimiter(
+    global_rate=TELEGRAM_GLOBAL_RATE,
+    global_burst=TELEGRAM_GLOBAL_BURST,
+    chat_rate=TELEGRAM_CHAT_RATE,
+    chat_burst=TELEGRAM_CHAT_BURST,
+)
+
+def _try_send_telegram_message(chat_id: str, text: str, account_id: str) -> Tuple[bool, float]:
+    """
+    Tenta enviar uma mensagem respeitando os limites de envio.
+    Retorna (enviada, segundos para tentar de novo); 0 segundos = não adianta repetir.
+    """
+    try:
+        client = _telegram_client(account_id)
+        if not client:
+            return False, 0.0
+
+        wait = _telegram_rate_limiter.reserve(client.token, chat_id)
+        if wait > 0:
+            logger.info(f"Envio para chat {chat_id} limitado: nova tentativa em {wait:.2f}s")
+            return False, wait
 
         # Don't add reply_markup - we want plain text messages only
 
         logger.info(f"Enviando mensagem Telegram para chat {chat_id}: {text[:50]}...")
 
-        response = requests.post(url, json=payload, timeout=10)
+        response = client.send_message(chat_id, text)
+
+        if response.status_code == 429:
+            try:
+                retry_after = float(response.json().get('parameters', {}).get('retry_after', 0))
+            except ValueError:
+                retry_after = 0.0
+            retry_after = retry_after or float(response.headers.get('Retry-After', 1))
+            _telegram_rate_limiter.retry_after(client.token, chat_id, retry_after)
+            logger.warning(f"Telegram limitou o envio para chat {chat_id} (429): nova tentativa em {retry_after}s")
+            return False, retry_after
 
         if response.status_code == 200:
             result = response.json()
             if result.get('ok'):
                 logger.info(f"Mensagem Telegram enviada com sucesso para {chat_id}")
-                return True
+                return True, 0.0
             else:
                 logger.error(f"Erro na API Telegram: {result.get('description', 'Erro desconhecido')}")
-                return False
+                return False, 0.0
         else:
             logger.error(f"Erro HTTP ao enviar mensagem Telegram: {response.status_code}")
-            return False
+            return False, 0.0
 
     except Exception as e:
         logger.error(f"Erro ao enviar mensagem Telegram: {e}")
-        return False
+        return False, 0.0
+
+def send_telegram_message(chat_id: str, text: str, account_id: str, options: List[Dict] = None) -> bool:
+    """
+    Envia mensagem via Telegram API - SEM botões, apenas texto.
+    Envio síncrono (painel): espera o limite de envio ou o retry_after de um 429 enquanto
+    a espera couber em AURA_TELEGRAM_MAX_INLINE_WAIT.
+    """
+    waited = 0.0
+    while True:
+        sent, retry_in = _try_send_telegram_message(chat_id, text, account_id)
+        if sent:
+            return True
+        if retry_in <= 0 or waited + retry_in > TELEGRAM_MAX_INLINE_WAIT:
+            if retry_in > 0:
+                logger.error(f"Envio para chat {chat_id} desistiu após {waited:.1f}s aguardando o limite da API")
+            return False
+        time.sleep(retry_in)
+        waited += retry_in
 
 def create_test_conversation():
     """Cria uma conversa de teste para debug"""
@@ -368,12 +787,13 @@ def create_test_conversation():
             test_conv.lastAt = test_message.timestamp
 
             _conversations[test_conv_id] = test_conv
-            _cache['conversations_last_update'] = 0
+        else:
+            test_conv = None
 
-            logger.info(f"Conversa de teste criada: {test_conv_id}")
-            return test_conv
-
-    return None
+    if test_conv:
+        _conversation_changed(test_conv_id)
+        logger.info(f"Conversa de teste criada: {test_conv_id}")
+    return test_conv
 
 # --- Tratamento de erros otimizado ---
 @app.errorhandler(404)
@@ -593,19 +1013,16 @@ def criar_account():
         logger.info(f"Conta Telegram conectada: {nova_acc.id} - {nova_acc.botName}")
 
         ngrok_url = os.environ.get('NGROK_URL')
-        if ngrok_url:
+        if _polling:
+            _polling.sync()
+            logger.info(f"Conta {nova_acc.id} recebendo updates por polling (getUpdates)")
+        elif ngrok_url:
             webhook_url = f"{ngrok_url}/api/telegram/webhook/{nova_acc.id}"
             try:
-                requests.post(
-                    f"https://api.telegram.org/bot{nova_acc.apiKey}/deleteWebhook",
-                    timeout=10
-                )
+                client = _telegram_clients.get(nova_acc.id)
+                client.delete_webhook()
 
-                resp = requests.post(
-                    f"https://api.telegram.org/bot{nova_acc.apiKey}/setWebhook",
-                    data={'url': webhook_url},
-                    timeout=10
-                )
+                resp = client.set_webhook(webhook_url)
 
                 if resp.status_code == 200:
                     result = resp.json()
@@ -621,8 +1038,6 @@ def criar_account():
         else:
             logger.warning("NGROK_URL não configurado - webhook não será configurado")
 
-        _cache['conversations_last_update'] = 0
-
         return jsonify(nova_acc.__dict__), 201
 
     except Exception as e:
@@ -634,15 +1049,11 @@ def criar_account():
 def deletar_account(account_id):
     """Remove conta Telegram e limpa dados associados"""
     try:
-        contas = listTelegramAccounts()
-        bot = next((c for c in contas if c.id == account_id), None)
+        client = _telegram_clients.get(account_id)
 
-        if bot:
+        if client:
             try:
-                resp = requests.post(
-                    f"https://api.telegram.org/bot{bot.apiKey}/deleteWebhook",
-                    timeout=10
-                )
+                resp = client.delete_webhook()
                 logger.info(f"Webhook removido: {resp.status_code}")
             except Exception as e:
                 logger.warning(f"Erro ao remover webhook: {e}")
@@ -652,11 +1063,16 @@ def deletar_account(account_id):
                 del chat_to_account[chat_id]
 
         removeTelegram(account_id)
+        if _polling:
+            _polling.sync()
+        _telegram_clients.discard(account_id)
+        _update_dedupe.forget_account(account_id)
 
         with _conversation_lock:
             _conversations.pop(account_id, None)
+            _memory_budget.forget(account_id)
 
-        _cache['conversations_last_update'] = 0
+        _conversation_changed(account_id)
 
         logger.info(f"Conta Telegram {account_id} removida completamente")
         return '', 204
@@ -667,61 +1083,88 @@ def deletar_account(account_id):
 
 # --- Listar conversas otimizado ---
 @app.route('/api/conversations', methods=['GET'])
+@_versioned_json
 def listar_conversas():
-    """Lista todas as conversas com cache otimizado - APENAS CONVERSAS DE USUÁRIOS REAIS"""
+    """
+    Lista as conversas de usuários reais, da mais recente para a mais antiga.
+    Sem parâmetros devolve a lista inteira; com ?limit=N e/ou ?cursor=<next_cursor>
+    devolve uma página {"conversations", "next_cursor", "has_more"}.
+    """
     try:
-        current_time = time.time()
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
 
-        if (current_time - _cache['conversations_last_update']) < _cache['cache_duration']:
-            logger.info(f"Cache hit - Retornando {len(_cache['conversations_cache'])} conversas")
-            return jsonify(_cache['conversations_cache']), 200
+        if limit is None and cursor is None:
+            conversations, _ = _conversation_index.page()
+            logger.info("Retornando %s conversas Telegram", len(conversations))
+            return jsonify(conversations), 200
 
-        _load_all_conversations_from_disk()
+        limit = min(max(limit if limit is not None else 50, 1), 500)
+        try:
+            conversations, next_cursor = _conversation_index.page(limit, cursor or None)
+        except ValueError:
+            return jsonify({"erro": "Cursor inválido"}), 400
 
-        telegram_conversations = []
-        with _conversation_lock:
-            logger.info(f"Verificando {len(_conversations)} conversas no armazenamento")
-            for conv_id, conv in _conversations.items():
-                logger.info(
-                    f"   Conversa {conv_id}: {conv.title} - Arquivada: {conv.isArchived}, Bot: {conv.is_bot_conversation}"
-                )
-                if not conv.is_bot_conversation:
-                    telegram_conversations.append(conv.to_dict())
-                    logger.info("     Incluída na lista")
-                else:
-                    logger.info("     Filtrada (bot)")
+        logger.info("Retornando página com %s conversas Telegram", len(conversations))
+        return jsonify({
+            "conversations": conversations,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
+        }), 200
 
-        telegram_conversations.sort(key=lambda x: x.get('lastAt', ''), reverse=True)
+    except Exception as e:
+        logger.error(f"Erro ao listar conversas: {e}")
+        return jsonify({"erro": str(e)}), 500
 
-        _cache['conversations_cache'] = telegram_conversations
-        _cache['conversations_last_update'] = current_time
+# --- Sincronização por delta ---
+@app.route('/api/conversations/changes', methods=['GET'])
+def listar_mudancas():
+    """
+    Mutações de conversas e mensagens depois de ?since=<seq>, para clientes sem SSE.
+    Responde {"changes", "seq", "has_more", "reset", "epoch"}: "seq" é a nova marca
+    d'água para a próxima chamada; "reset" pede recarga completa (cliente atrasado
+    demais ou de outra execução do servidor, conferida por ?epoch=).
+    """
+    try:
+        try:
+            since = int(request.args.get('since', 0))
+        except ValueError:
+            return jsonify({"erro": "Parâmetro 'since' deve ser um número de sequência"}), 400
 
-        logger.info(
-            "Retornando %s conversas Telegram", len(telegram_conversations)
-        )
-        return jsonify(telegram_conversations), 200
+        limit = min(max(request.args.get('limit', type=int, default=500), 1), 5000)
+        changes, high_water, has_more, reset = _change_log.since(since, limit, request.args.get('epoch'))
+
+        logger.info(f"Retornando {len(changes)} mudanças desde {since}")
+        return jsonify({
+            "changes": changes,
+            "seq": high_water,
+            "has_more": has_more,
+            "reset": reset,
+            "epoch": _change_log.epoch,
+        }), 200
 
     except Exception as e:
-        logger.error(f"Erro ao listar conversas: {e}")
+        logger.error(f"Erro ao listar mudanças: {e}")
         return jsonify({"erro": str(e)}), 500
 
 # --- Obter conversa específica ---
 @app.route('/api/conversations/<conversation_id>', methods=['GET'])
+@_versioned_json
 def obter_conversa(conversation_id):
     """Obtém uma conversa específica do Telegram"""
     try:
         logger.info(f"Buscando conversa: {conversation_id}")
 
-        with _conversation_lock:
-            if conversation_id in _conversations:
-                conv = _conversations[conversation_id]
-                logger.info(f"Conversa Telegram encontrada: {conv.title}")
-                return jsonify(conv.to_dict()), 200
+        conv = _conversations.get(conversation_id)
+        if conv is not None:
+            conversation = conv.snapshot.conversation
+            logger.info(f"Conversa Telegram encontrada: {conversation['title']}")
+            return jsonify(conversation), 200
 
-        conv = _load_conversation_from_disk(conversation_id)
-        if conv:
-            logger.info(f"Conversa carregada do histórico: {conv.title}")
-            return jsonify(conv.to_dict()), 200
+        entry = _history_store.get_metadata(conversation_id)
+        if entry:
+            logger.info(f"Conversa encontrada no catálogo: {entry['conversation'].get('title')}")
+            return jsonify(entry["conversation"]), 200
 
         logger.warning(f"Conversa não encontrada: {conversation_id}")
         return jsonify({"erro": "Conversa não encontrada"}), 404
@@ -730,30 +1173,103 @@ def obter_conversa(conversation_id):
         logger.error(f"Erro ao obter conversa: {e}")
         return jsonify({"erro": str(e)}), 500
 
+def _parse_cursor(value: Optional[str]) -> Optional[int]:
+    """Cursor de paginação: seq da mensagem; vazio ou "latest" significa o fim da conversa"""
+    if value is None or value in ('', 'latest'):
+        return None
+    return int(value)
+
+def _obter_mensagens_por_cursor(conversation_id: str):
+    """Página de mensagens por cursor (before/after); a página mais recente custa O(limit)"""
+    try:
+        before = _parse_cursor(request.args.get('before'))
+        after = _parse_cursor(request.args.get('after'))
+    except ValueError:
+        return jsonify({"erro": "Cursor inválido: use o seq de uma mensagem"}), 400
+
+    if 'after' in request.args and after is None:
+        after = -1
+    limit = min(max(request.args.get('limit', type=int, default=50), 1), 500)
+
+    window = None
+    conv = _conversations.get(conversation_id)
+    if conv is not None:
+        _memory_budget.touch(conversation_id, conv.snapshot.messages)
+
+    if conv is None and not _history_store.supports_paging:
+        conv = _load_conversation_from_disk(conversation_id)
+
+    if conv is not None:
+        messages = conv.snapshot.messages
+        start, end, has_more = window_bounds(len(messages), before, after, limit)
+        page = [
+            dict(msg.to_dict(), seq=start + index)
+            for index, msg in enumerate(messages[start:end])
+        ]
+        window = (page, has_more)
+    else:
+        window = _history_store.get_message_window(conversation_id, before, after, limit)
+
+    if window is None:
+        logger.warning(f"Conversa não encontrada: {conversation_id}")
+        return jsonify({"erro": "Conversa não encontrada"}), 404
+
+    page, has_more = window
+    if after is not None:
+        next_cursor = page[-1]['seq'] if page else after
+    else:
+        next_cursor = page[0]['seq'] if page and has_more else None
+
+    logger.info("Retornando %s mensagens Telegram (cursor)", len(page))
+    return jsonify({
+        "messages": page,
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+    }), 200
+
 # --- Obter mensagens de uma conversa ---
 @app.route('/api/conversations/<conversation_id>/messages', methods=['GET'])
+@_versioned_json
 def obter_mensagens(conversation_id):
-    """Obtém mensagens de uma conversa do Telegram"""
+    """
+    Obtém mensagens de uma conversa do Telegram.
+    Com ?before=<seq>/?after=<seq> (before vazio = mais recentes) responde
+    {"messages", "next_cursor", "has_more"}; sem cursor mantém offset/limit.
+    """
     try:
+        if 'before' in request.args or 'after' in request.args:
+            return _obter_mensagens_por_cursor(conversation_id)
+
         limit = request.args.get('limit', type=int)
         offset = request.args.get('offset', type=int, default=0)
 
         logger.info(f"Buscando mensagens da conversa: {conversation_id}")
 
-        with _conversation_lock:
-            if conversation_id in _conversations:
-                conv = _conversations[conversation_id]
-                messages = conv.messages
+        conv = _conversations.get(conversation_id)
+        if conv is not None:
+            messages = conv.snapshot.messages
+            _memory_budget.touch(conversation_id, messages)
 
-                if limit is not None:
-                    messages = messages[offset : offset + limit]
-                else:
-                    messages = messages[offset:]
+            if limit is not None:
+                messages = messages[offset : offset + limit]
+            else:
+                messages = messages[offset:]
+
+            messages_data = [msg.to_dict() for msg in messages]
+            logger.info("Retornando %s mensagens Telegram", len(messages_data))
+            return jsonify(messages_data), 200
 
-                messages_data = [msg.to_dict() for msg in messages]
-                logger.info("Retornando %s mensagens Telegram", len(messages_data))
+        if _history_store.supports_paging:
+            # Backend com consultas paginadas: não precisa carregar a conversa inteira
+            messages_data = _history_store.get_messages(conversation_id, offset, limit)
+            if messages_data is not None:
+                logger.info("Retornando %s mensagens Telegram do armazenamento", len(messages_data))
                 return jsonify(messages_data), 200
 
+            logger.warning(f"Conversa não encontrada: {conversation_id}")
+            return jsonify({"erro": "Conversa não encontrada"}), 404
+
+        # Primeira abertura da conversa: o histórico é carregado sob demanda
         conv = _load_conversation_from_disk(conversation_id)
         if conv:
             messages = conv.messages
@@ -773,7 +1289,82 @@ def obter_mensagens(conversation_id):
         logger.error(f"Erro ao obter mensagens: {e}")
         return jsonify({"erro": str(e)}), 500
 
+def _last_event_id() -> Optional[int]:
+    """Last-Event-ID enviado pelo navegador ao reconectar (ou ?lastEventId=)"""
+    value = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+def _sse_response(stream) -> Response:
+    return Response(
+        stream_with_context(stream),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',
+        },
+    )
+
+# --- Feed SSE de mudanças da lista de conversas ---
+@app.route('/api/conversations/events', methods=['GET'])
+def stream_lista_conversas():
+    """
+    Stream SSE único para a barra lateral: cada evento é um delta
+    {"type": "upsert", "id", "title", "lastMessage", "lastAt", "isArchived", "unreadDelta"}
+    ou {"type": "delete", "id"}. Substitui o polling de /api/conversations.
+    """
+    logger.info("Feed SSE da lista de conversas aberto")
+    return _sse_response(_sidebar_feed.stream(_last_event_id(), SSE_HEARTBEAT_INTERVAL))
+
+# --- Stream SSE de uma conversa ---
+@app.route('/api/conversations/<conversation_id>/stream', methods=['GET'])
+def stream_conversa(conversation_id):
+    """
+    Stream SSE com as mensagens novas da conversa. Um cliente que reconecta envia
+    Last-Event-ID (o navegador faz isso sozinho) e recebe os eventos perdidos que
+    ainda estão no buffer da conversa.
+    """
+    logger.info(f"Stream SSE aberto para conversa: {conversation_id}")
+    return _sse_response(_sse_hub.stream(conversation_id, _last_event_id(), SSE_HEARTBEAT_INTERVAL))
+
+def _commit_sent_message(conversation_id: str, sender: str, text: str, unarchive: bool = True) -> Optional[Message]:
+    """
+    Registra na conversa uma mensagem já aceita pelo Telegram, sob o lock da conversa.
+    A conversa é resolvida de novo aqui: pode ter saído da memória durante o envio.
+    """
+    with _chat_lock(conversation_id):
+        conv = _get_conversation(conversation_id)
+        if not conv:
+            logger.warning(f"Conversa {conversation_id} removida durante o envio; mensagem não registrada")
+            return None
+
+        message = Message(
+            id=uuid.uuid4().hex,
+            sender=sender,
+            text=text,
+            timestamp=get_brasil_time(),
+            read=True,
+            platform='telegram'
+        )
+
+        conv.messages.append(message)
+        conv.lastMessage = text
+        conv.lastAt = message.timestamp
+        if unarchive:
+            conv.isArchived = False
+
+        broadcast_to_subscribers(conversation_id, message.to_dict())
+
+    _save_conversation_history(conv)
+    return message
+
 # --- Enviar mensagem ---
+# Quem pode aparecer como autor de uma mensagem enviada pelo painel
+_OUTBOUND_SENDERS = frozenset({'operator', 'bot'})
+
+
 @app.route('/api/conversations/<conversation_id>/messages', methods=['POST'])
 def enviar_mensagem(conversation_id):
     """Envia mensagem para uma conversa do Telegram"""
@@ -788,10 +1379,12 @@ def enviar_mensagem(conversation_id):
             return jsonify({"erro": "Dados JSON são obrigatórios"}), 400
 
         text = data.get('text', '').strip()
-        sender = data.get('sender', 'operator').strip()
+        sender = data.get('sender', 'operator')
 
         if not text:
             return jsonify({"erro": "Texto da mensagem é obrigatório"}), 400
+        if sender not in _OUTBOUND_SENDERS:
+            return jsonify({"erro": f"sender deve ser um de: {', '.join(sorted(_OUTBOUND_SENDERS))}"}), 400
 
         logger.info(f"Enviando mensagem para conversa: {conversation_id}")
 
@@ -811,126 +1404,69 @@ def enviar_mensagem(conversation_id):
                 # Send closure message to client
                 closure_message = result.get("message", "Atendimento encerrado.")
 
-                with _conversation_lock:
-                    if conversation_id in _conversations:
-                        conv = _conversations[conversation_id]
-                        account_id = chat_to_account.get(conversation_id)
-
-                        if account_id:
-                            success = send_telegram_message(conversation_id, closure_message, account_id)
-
-                            if success:
-                                # Add closure message to conversation
-                                closure_msg = Message(
-                                    id=uuid.uuid4().hex,
-                                    sender='bot',
-                                    text=closure_message,
-                                    timestamp=get_brasil_time(),
-                                    read=True,
-                                    platform='telegram'
-                                )
-
-                                conv.messages.append(closure_msg)
-                                conv.lastMessage = closure_message
-                                conv.lastAt = closure_msg.timestamp
-
-                                broadcast_to_subscribers(conversation_id, closure_msg.to_dict())
-                                _cache['conversations_last_update'] = 0
-                                _save_conversation_history(conv)
-
-                                # Reset the bot conversation so next message starts from beginning
-                                workflows = bot_components_api.get_all_workflows()
-                                active_workflows = [w for w in workflows if w.get('enabled', True)]
-                                if active_workflows:
-                                    active_workflows.sort(key=lambda w: w.get('updated_at', w.get('created_at', '')), reverse=True)
-                                    workflow_id = active_workflows[0]['id']
-                                    bot_components_api.reset_conversation(conversation_id, workflow_id)
-                                    logger.info(f"Conversa do bot resetada para {conversation_id} após /finalizar")
-
-                                return jsonify({
-                                    "success": True,
-                                    "message": "Atendimento encerrado com sucesso",
-                                    "session_ended": True
-                                }), 200
+                conv = _get_conversation(conversation_id)
+                account_id = chat_to_account.get(conversation_id)
 
-                return jsonify({"erro": "Falha ao enviar mensagem de encerramento"}), 500
+                # Envio fora de qualquer lock; a mensagem só é registrada se o Telegram aceitar
+                if conv and account_id and send_telegram_message(conversation_id, closure_message, account_id):
+                    # Add closure message to conversation
+                    closure_msg = _commit_sent_message(conversation_id, 'bot', closure_message, unarchive=False)
 
-            # Regular operator message - format with bold prefix
-            formatted_message = result.get("message", text)
+                    if closure_msg:
+                        # Reset the bot conversation so next message starts from beginning
+                        active_workflow = bot_components_api.get_active_workflow()
+                        if active_workflow:
+                            bot_components_api.reset_conversation(conversation_id, active_workflow['id'])
+                            logger.info(f"Conversa do bot resetada para {conversation_id} após /finalizar")
 
-            with _conversation_lock:
-                if conversation_id in _conversations:
-                    conv = _conversations[conversation_id]
-                    account_id = chat_to_account.get(conversation_id)
-
-                    if account_id:
-                        # Send formatted message to Telegram
-                        success = send_telegram_message(conversation_id, formatted_message, account_id)
-
-                        if success:
-                            # Save operator message to conversation
-                            nova_mensagem = Message(
-                                id=uuid.uuid4().hex,
-                                sender='operator',
-                                text=formatted_message,
-                                timestamp=get_brasil_time(),
-                                read=True,
-                                platform='telegram'
-                            )
-
-                            conv.messages.append(nova_mensagem)
-                            conv.lastMessage = formatted_message
-                            conv.lastAt = nova_mensagem.timestamp
-                            conv.isArchived = False
-
-                            broadcast_to_subscribers(conversation_id, nova_mensagem.to_dict())
-                            _cache['conversations_last_update'] = 0
-                            _save_conversation_history(conv)
+                        return jsonify({
+                            "success": True,
+                            "message": "Atendimento encerrado com sucesso",
+                            "session_ended": True
+                        }), 200
 
-                            logger.info(f"Mensagem do operador enviada e formatada: {nova_mensagem.id}")
-                            return jsonify(nova_mensagem.to_dict()), 201
-                        else:
-                            return jsonify({"erro": "Falha ao enviar mensagem via Telegram"}), 500
-
-            logger.warning(f"Conversa não encontrada: {conversation_id}")
-            return jsonify({"erro": "Conversa não encontrada"}), 404
+                return jsonify({"erro": "Falha ao enviar mensagem de encerramento"}), 500
 
-        with _conversation_lock:
-            if conversation_id in _conversations:
-                conv = _conversations[conversation_id]
+            # Regular operator message - format with bold prefix
+            formatted_message = result.get("message", text)
 
+            conv = _get_conversation(conversation_id)
+            if conv:
                 account_id = chat_to_account.get(conversation_id)
 
                 if account_id:
-                    success = send_telegram_message(conversation_id, text, account_id)
+                    # Send formatted message to Telegram
+                    success = send_telegram_message(conversation_id, formatted_message, account_id)
 
                     if success:
-                        nova_mensagem = Message(
-                            id=uuid.uuid4().hex,
-                            sender=sender,
-                            text=text,
-                            timestamp=get_brasil_time(),
-                            read=True,
-                            platform='telegram'
-                        )
+                        # Save operator message to conversation
+                        nova_mensagem = _commit_sent_message(conversation_id, 'operator', formatted_message)
+                        if nova_mensagem:
+                            logger.info(f"Mensagem do operador enviada e formatada: {nova_mensagem.id}")
+                            return jsonify(nova_mensagem.to_dict()), 201
+                    else:
+                        return jsonify({"erro": "Falha ao enviar mensagem via Telegram"}), 500
 
-                        conv.messages.append(nova_mensagem)
-                        conv.lastMessage = text
-                        conv.lastAt = nova_mensagem.timestamp
-                        conv.isArchived = False
+            logger.warning(f"Conversa não encontrada: {conversation_id}")
+            return jsonify({"erro": "Conversa não encontrada"}), 404
 
-                        broadcast_to_subscribers(conversation_id, nova_mensagem.to_dict())
+        conv = _get_conversation(conversation_id)
+        if conv:
 
-                        _cache['conversations_last_update'] = 0
+            account_id = chat_to_account.get(conversation_id)
 
-                        _save_conversation_history(conv)
+            if account_id:
+                success = send_telegram_message(conversation_id, text, account_id)
 
+                if success:
+                    nova_mensagem = _commit_sent_message(conversation_id, sender, text)
+                    if nova_mensagem:
                         logger.info(f"Mensagem Telegram enviada: {nova_mensagem.id}")
                         return jsonify(nova_mensagem.to_dict()), 201
-                    else:
-                        return jsonify({"erro": "Falha ao enviar mensagem via Telegram"}), 500
                 else:
-                    return jsonify({"erro": "Conta Telegram não encontrada para esta conversa"}), 404
+                    return jsonify({"erro": "Falha ao enviar mensagem via Telegram"}), 500
+            else:
+                return jsonify({"erro": "Conta Telegram não encontrada para esta conversa"}), 404
 
         logger.warning(f"Conversa não encontrada: {conversation_id}")
         return jsonify({"erro": "Conversa não encontrada"}), 404
@@ -957,17 +1493,18 @@ def renomear_conversa(conversation_id):
 
         logger.info(f"Renomeando conversa {conversation_id} para: {new_title}")
 
-        with _conversation_lock:
-            if conversation_id in _conversations:
-                conv = _conversations[conversation_id]
+        with _chat_lock(conversation_id):
+            conv = _get_conversation(conversation_id)
+            if conv:
                 old_title = conv.title
                 conv.title = new_title
+                conversation = conv.to_dict()
 
-                _cache['conversations_last_update'] = 0
-                _save_conversation_history(conv)
+        if conv:
+            _save_conversation_history(conv)
 
-                logger.info(f"Conversa Telegram renomeada: '{old_title}' -> '{new_title}'")
-                return jsonify(conv.to_dict()), 200
+            logger.info(f"Conversa Telegram renomeada: '{old_title}' -> '{new_title}'")
+            return jsonify(conversation), 200
 
         logger.warning(f"Conversa não encontrada para renomeação: {conversation_id}")
         return jsonify({"erro": "Conversa não encontrada"}), 404
@@ -986,24 +1523,25 @@ def arquivar_conversa(conversation_id):
 
         logger.info(f"{'Arquivando' if is_archived else 'Desarquivando'} conversa: {conversation_id}")
 
-        with _conversation_lock:
-            if conversation_id in _conversations:
-                conv = _conversations[conversation_id]
+        with _chat_lock(conversation_id):
+            conv = _get_conversation(conversation_id)
+            if conv:
                 conv.isArchived = is_archived
+                conversation = conv.to_dict()
 
-                _cache['conversations_last_update'] = 0
-                _save_conversation_history(conv)
+        if conv:
+            _save_conversation_history(conv)
 
-                logger.info(
-                    "Conversa Telegram %s: %s",
-                    'arquivada' if is_archived else 'desarquivada',
-                    conversation_id,
-                )
-                return jsonify({
-                    "success": True,
-                    "message": f"Conversa {'arquivada' if is_archived else 'desarquivada'} com sucesso",
-                    "conversation": conv.to_dict(),
-                }), 200
+            logger.info(
+                "Conversa Telegram %s: %s",
+                'arquivada' if is_archived else 'desarquivada',
+                conversation_id,
+            )
+            return jsonify({
+                "success": True,
+                "message": f"Conversa {'arquivada' if is_archived else 'desarquivada'} com sucesso",
+                "conversation": conversation,
+            }), 200
 
         logger.warning(f"Conversa não encontrada para arquivamento: {conversation_id}")
         return jsonify({"erro": "Conversa não encontrada"}), 404
@@ -1019,18 +1557,21 @@ def deletar_conversa(conversation_id):
     try:
         logger.info(f"Deletando conversa: {conversation_id}")
 
-        with _conversation_lock:
-            if conversation_id in _conversations:
-                del _conversations[conversation_id]
+        with _chat_lock(conversation_id):
+            found = conversation_id in _conversations or _history_store.get_metadata(conversation_id) is not None
+            if found:
+                with _conversation_lock:
+                    _conversations.pop(conversation_id, None)
+                    chat_to_account.pop(conversation_id, None)
 
-                if conversation_id in chat_to_account:
-                    del chat_to_account[conversation_id]
+                _conversation_removed(conversation_id)
 
-                _cache['conversations_last_update'] = 0
-                _delete_conversation_history(conversation_id)
+        if found:
+            # Fora do lock: aguarda uma gravação write-behind em andamento da conversa
+            _delete_conversation_history(conversation_id)
 
-                logger.info(f"Conversa Telegram deletada: {conversation_id}")
-                return '', 204
+            logger.info(f"Conversa Telegram deletada: {conversation_id}")
+            return '', 204
 
         logger.warning(f"Conversa não encontrada para deleção: {conversation_id}")
         return jsonify({"erro": "Conversa não encontrada"}), 404
@@ -1039,28 +1580,124 @@ def deletar_conversa(conversation_id):
         logger.error(f"Erro ao deletar conversa: {e}")
         return jsonify({"erro": str(e)}), 500
 
-# --- Webhook Telegram - INTEGRADO COM BOT DE WORKFLOWS REAIS ---
-@app.route('/api/telegram/webhook/<account_id>', methods=['POST'])
-def webhook_telegram(account_id):
+# --- Envio das respostas do bot ---
+# Threads que enviam as respostas agendadas e pausa entre mensagens consecutivas sem delay
+SEND_WORKERS = int(os.environ.get('AURA_SEND_WORKERS', 4))
+SEND_INTERVAL_MS = int(os.environ.get('AURA_SEND_INTERVAL_MS', 500))
+
+_send_scheduler = DelayedSendScheduler(workers=SEND_WORKERS)
+atexit.register(_send_scheduler.stop)
+
+def _deliver_bot_message(chat_id: str, account_id: str, response_text: str, response_options: List[Dict], idx: int, total: int) -> Optional[float]:
     """
-    Webhook para receber mensagens do Telegram
-    PROCESSA MENSAGENS USANDO O BOT DE WORKFLOWS REAIS - SEM MOCK!
+    Envia uma resposta do bot e, se o Telegram aceitar, registra a mensagem na conversa.
+    Se o envio foi limitado (limite local ou 429), retorna em quantos segundos o
+    agendador deve tentar de novo, mantendo a ordem do chat.
     """
+    logger.info(f"[WEBHOOK] 📤 Enviando mensagem #{idx + 1}/{total} para Telegram...")
+    success, retry_in = _try_send_telegram_message(chat_id, response_text, account_id)
+
+    if retry_in > 0:
+        return retry_in
+
+    if not success:
+        logger.error(f"[WEBHOOK] ❌ FALHA ao enviar mensagem #{idx + 1} via Telegram API!")
+        logger.error(f"[WEBHOOK] Texto que falhou: {response_text[:200]}...")
+        return
+
+    logger.info(f"[WEBHOOK] ✅ Mensagem #{idx + 1} enviada com SUCESSO via Telegram!")
+
+    # Mensagem registrada só depois do envio, sob o lock da conversa
+    with _chat_lock(chat_id):
+        conv = _conversations.get(chat_id)
+        if not conv:
+            logger.warning(f"[WEBHOOK] Conversa {chat_id} não está mais em memória; mensagem #{idx + 1} não registrada")
+            return
+
+        bot_message = Message(
+            id=uuid.uuid4().hex,
+            sender='bot',
+            text=response_text,
+            timestamp=get_brasil_time(),
+            platform='telegram',
+            read=True
+        )
+
+        conv.messages.append(bot_message)
+        conv.lastMessage = response_text
+        conv.lastAt = bot_message.timestamp
+
+        broadcast_to_subscribers(chat_id, bot_message.to_dict())
+        _conversation_changed(chat_id)
+
+    logger.info(f"[WEBHOOK] Mensagem #{idx + 1} salva na conversa")
+
+def _finish_bot_replies(chat_id: str, archive: bool):
+    """Última tarefa de um lote de respostas: arquiva (se pedido), grava e libera a conversa"""
     try:
-        logger.info(f"Webhook recebido para conta: {account_id}")
+        # Cada resposta já foi notificada ao ser registrada; só o arquivamento é novo
+        archived = False
+        if archive:
+            logger.info(f"[WEBHOOK] 📦 Arquivando conversa {chat_id} após finalização do fluxo")
+            with _chat_lock(chat_id):
+                conv = _conversations.get(chat_id)
+                if conv is not None and not conv.isArchived:
+                    conv.isArchived = True
+                    archived = True
 
-        data = request.get_json()
-        logger.info(f"Dados do webhook: {json.dumps(data, indent=2)}")
+        conv = _conversations.get(chat_id)
+        if conv:
+            _save_conversation_history(conv, changed=archived)
+    finally:
+        _memory_budget.unpin(chat_id)
 
-        if not data:
-            logger.warning("Webhook sem dados")
-            return '', 200
+def _schedule_bot_replies(chat_id: str, account_id: str, messages_to_send: List[Dict], archive: bool = False):
+    """
+    Agenda as respostas do bot no agendador de envios, na ordem, respeitando o delay de
+    cada mensagem e a pausa entre mensagens consecutivas. Nenhuma thread fica parada
+    esperando: o agendador envia quando cada mensagem vence.
+    """
+    total = len(messages_to_send)
+    # A conversa fica fixada na memória até a última resposta ser registrada
+    _memory_budget.pin(chat_id)
+
+    previous_delay = None
+    for idx, msg_data in enumerate(messages_to_send):
+        response_text = msg_data.get('text', '')
+        response_options = msg_data.get('options', [])
+        delay = msg_data.get('delay', 0)
+
+        logger.info(f"[WEBHOOK] Agendando mensagem #{idx + 1}/{total}")
+        logger.info(f"[WEBHOOK]   - Tamanho do texto: {len(response_text)} caracteres")
+        logger.info(f"[WEBHOOK]   - Delay: {delay}ms")
+        logger.info(f"[WEBHOOK]   - Preview: {response_text[:100]}...")
+
+        if not response_text.strip():
+            logger.warning(f"[WEBHOOK] ⚠️ Pulando mensagem vazia #{idx + 1}")
+            continue
+
+        wait_ms = delay
+        if previous_delay == 0:
+            wait_ms += SEND_INTERVAL_MS
+        previous_delay = delay
+
+        _send_scheduler.schedule(
+            chat_id,
+            wait_ms / 1000.0,
+            functools.partial(_deliver_bot_message, chat_id, account_id, response_text, response_options, idx, total),
+        )
 
-        if 'message' not in data:
-            logger.warning("Webhook sem campo 'message'")
-            return '', 200
+    _send_scheduler.schedule(chat_id, 0, functools.partial(_finish_bot_replies, chat_id, archive))
 
-        message = data['message']
+# --- Processamento de updates do Telegram ---
+def _process_telegram_message(account_id: str, message: Dict):
+    """
+    Processa uma mensagem recebida do Telegram: registra na conversa, executa o bot
+    de workflows, envia as respostas e grava o histórico. Roda nos workers do pool de
+    ingestão, em ordem por chat.
+    """
+    pinned_chat_id = None
+    try:
         chat_id = str(message['chat']['id'])
         text = message.get('text', '')
         user_info = message.get('from', {})
@@ -1076,30 +1713,34 @@ def webhook_telegram(account_id):
         # FILTRO: Ignorar mensagens de bots
         if is_bot:
             logger.info(f"Ignorando mensagem de bot: {user_name}")
-            return '', 200
+            return
 
         # Mapear chat para conta
         chat_to_account[chat_id] = account_id
         logger.info(f"Chat {chat_id} mapeado para conta {account_id}")
 
-        # Buscar ou criar conversa
-        with _conversation_lock:
+        # Buscar ou criar conversa (só a inclusão no mapa usa o lock global)
+        with _chat_lock(chat_id):
             if chat_id not in _conversations:
                 _load_conversation_from_disk(chat_id, user_name)
 
             if chat_id not in _conversations:
                 logger.info(f"Criando nova conversa para chat {chat_id}")
-                _conversations[chat_id] = Conversation(
-                    id=chat_id,
-                    title=user_name,
-                    platform='telegram',
-                    chat_type='private',
-                    is_bot_conversation=False
-                )
+                with _conversation_lock:
+                    _conversations[chat_id] = Conversation(
+                        id=chat_id,
+                        title=user_name,
+                        platform='telegram',
+                        chat_type='private',
+                        is_bot_conversation=False
+                    )
             else:
                 logger.info(f"Conversa existente encontrada para chat {chat_id}")
 
             conv = _conversations[chat_id]
+            # A conversa fica fixada na memória até o fim do processamento
+            _memory_budget.pin(chat_id)
+            pinned_chat_id = chat_id
 
             # Criar mensagem do usuário
             nova_mensagem = Message(
@@ -1120,20 +1761,15 @@ def webhook_telegram(account_id):
             # Broadcast para subscribers
             broadcast_to_subscribers(chat_id, nova_mensagem.to_dict())
 
-            _cache['conversations_last_update'] = 0
-
-        workflows = bot_components_api.get_all_workflows()
-        active_workflows = [w for w in workflows if w.get('enabled', True)]
+            _conversation_changed(chat_id)
 
-        logger.info(f"Total de workflows: {len(workflows)}")
-        logger.info(f"Workflows ATIVOS: {len(active_workflows)}")
+        # Resolvido quando os workflows mudam, não a cada mensagem
+        active_workflow = bot_components_api.get_active_workflow()
 
-        if not active_workflows:
+        if not active_workflow:
             logger.warning("INTERNO: Nenhum workflow ATIVO configurado - mensagem ignorada silenciosamente")
-            return '', 200
+            return
 
-        active_workflows.sort(key=lambda w: w.get('updated_at', w.get('created_at', '')), reverse=True)
-        active_workflow = active_workflows[0]
         workflow_id = active_workflow['id']
 
         logger.info(f"Processando mensagem com workflow ATIVO MAIS RECENTE: {workflow_id}")
@@ -1155,85 +1791,119 @@ def webhook_telegram(account_id):
             logger.info(f"[WEBHOOK] ========================================")
             # </CHANGE>
 
-            for idx, msg_data in enumerate(messages_to_send):
-                response_text = msg_data.get('text', '')
-                response_options = msg_data.get('options', [])
-                delay = msg_data.get('delay', 0)
-
-                logger.info(f"[WEBHOOK] Processando mensagem #{idx + 1}/{len(messages_to_send)}")
-                logger.info(f"[WEBHOOK]   - Tamanho do texto: {len(response_text)} caracteres")
-                logger.info(f"[WEBHOOK]   - Delay: {delay}ms")
-                logger.info(f"[WEBHOOK]   - Preview: {response_text[:100]}...")
-                # </CHANGE>
+            _schedule_bot_replies(
+                chat_id,
+                account_id,
+                messages_to_send,
+                archive=bool(bot_response.get('archive_conversation')),
+            )
+        else:
+            error_message = bot_response.get('messages', [{}])[0].get('text', 'Erro ao processar mensagem')
+            logger.error(f"[WEBHOOK] ❌ ERRO no processamento do bot: {error_message}")
 
-                if not response_text.strip():
-                    logger.warning(f"[WEBHOOK] ⚠️ Pulando mensagem vazia #{idx + 1}")
-                    continue
+        logger.info(f"Webhook processado com sucesso para {chat_id}")
+        # A mensagem recebida já foi notificada sob o lock; as respostas notificam ao serem registradas
+        conv = _conversations.get(chat_id)
+        if conv:
+            _save_conversation_history(conv, changed=False)
 
-                if delay > 0:
-                    logger.info(f"[WEBHOOK] ⏳ Aguardando {delay}ms antes de enviar...")
-                    import time
-                    time.sleep(delay / 1000.0)
-                    logger.info(f"[WEBHOOK] ✅ Delay concluído, enviando agora...")
-                # </CHANGE>
+    except Exception as e:
+        logger.error(f"Erro ao processar update do Telegram: {e}")
+        logger.exception("Stack trace completo:")
+    finally:
+        if pinned_chat_id:
+            _memory_budget.unpin(pinned_chat_id)
+
+# Workers que processam os updates recebidos (0 = processa dentro da requisição do webhook)
+WEBHOOK_WORKERS = int(os.environ.get('AURA_WEBHOOK_WORKERS', 8))
+WEBHOOK_MAX_PENDING = int(os.environ.get('AURA_WEBHOOK_MAX_PENDING', 10000))
+
+_ingest_pool = ChatOrderedWorkerPool(
+    lambda chat_id, item: _process_telegram_message(*item),
+    workers=WEBHOOK_WORKERS,
+    max_pending=WEBHOOK_MAX_PENDING,
+) if WEBHOOK_WORKERS > 0 else None
+if _ingest_pool:
+    atexit.register(_ingest_pool.stop)
+
+# Janela (s) e limite por conta dos update_ids lembrados para descartar reentregas do Telegram
+UPDATE_DEDUPE_WINDOW = float(os.environ.get('AURA_UPDATE_DEDUPE_WINDOW', 86400))
+UPDATE_DEDUPE_SIZE = int(os.environ.get('AURA_UPDATE_DEDUPE_SIZE', 5000))
+
+_update_dedupe = UpdateDeduplicator(
+    DATA_DIR.parent / "telegram_updates",
+    window=UPDATE_DEDUPE_WINDOW,
+    max_per_account=UPDATE_DEDUPE_SIZE,
+)
+atexit.register(_update_dedupe.stop)
 
-                logger.info(f"[WEBHOOK] 📤 Enviando mensagem #{idx + 1} para Telegram...")
-                success = send_telegram_message(chat_id, response_text, account_id, response_options)
+def _enqueue_telegram_update(account_id: str, update: Optional[Dict]) -> bool:
+    """
+    Valida um update do Telegram e o entrega ao pool de ingestão.
+    Updates já recebidos (mesmo update_id na conta) são descartados antes de qualquer
+    lock ou I/O. Retorna False apenas quando a fila está cheia (o Telegram reenviará o update).
+    """
+    if not update:
+        logger.warning("Webhook sem dados")
+        return True
+
+    update_id = update.get('update_id')
+    if update_id is not None and _update_dedupe.is_duplicate(account_id, update_id):
+        logger.info(f"Update {update_id} da conta {account_id} já recebido - ignorando reentrega")
+        return True
+
+    if 'message' not in update:
+        logger.warning("Webhook sem campo 'message'")
+        return True
+
+    message = update['message']
+    chat_id = str(message['chat']['id'])
+
+    if update_id is not None and not _update_dedupe.claim(account_id, update_id):
+        logger.info(f"Update {update_id} da conta {account_id} já recebido - ignorando reentrega")
+        return True
+
+    if _ingest_pool is None:
+        _process_telegram_message(account_id, message)
+        return True
+
+    if not _ingest_pool.submit(chat_id, (account_id, message)):
+        logger.error(f"Fila de ingestão cheia: update do chat {chat_id} recusado")
+        if update_id is not None:
+            _update_dedupe.release(account_id, update_id)
+        return False
+    return True
 
-                if success:
-                    logger.info(f"[WEBHOOK] ✅ Mensagem #{idx + 1} enviada com SUCESSO via Telegram!")
-                    # </CHANGE>
-
-                    # Adicionar resposta do bot à conversa
-                    with _conversation_lock:
-                        bot_message = Message(
-                            id=uuid.uuid4().hex,
-                            sender='bot',
-                            text=response_text,
-                            timestamp=get_brasil_time(),
-                            platform='telegram',
-                            read=True
-                        )
-
-                        conv.messages.append(bot_message)
-                        conv.lastMessage = response_text
-                        conv.lastAt = bot_message.timestamp
-
-                        broadcast_to_subscribers(chat_id, bot_message.to_dict())
-
-                    logger.info(f"[WEBHOOK] Mensagem #{idx + 1} salva na conversa")
-
-                    if idx < len(messages_to_send) - 1 and delay == 0:
-                        import time
-                        time.sleep(0.5)
-                    # </CHANGE>
-                else:
-                    logger.error(f"[WEBHOOK] ❌ FALHA ao enviar mensagem #{idx + 1} via Telegram API!")
-                    logger.error(f"[WEBHOOK] Texto que falhou: {response_text[:200]}...")
-                    # </CHANGE>
+# Long polling (AURA_TELEGRAM_INGEST_MODE=polling): um poller por conta alimenta o mesmo pipeline do webhook
+TELEGRAM_POLL_TIMEOUT = int(os.environ.get('AURA_TELEGRAM_POLL_TIMEOUT', 25))
+TELEGRAM_POLL_BATCH_SIZE = int(os.environ.get('AURA_TELEGRAM_POLL_BATCH_SIZE', 100))
 
-            logger.info(f"[WEBHOOK] ========================================")
-            logger.info(f"[WEBHOOK] Processamento concluído: {len(messages_to_send)} mensagens processadas")
-            logger.info(f"[WEBHOOK] ========================================")
-            # </CHANGE>
+_polling = PollingManager(
+    listTelegramAccounts,
+    _telegram_clients,
+    _enqueue_telegram_update,
+    poll_timeout=TELEGRAM_POLL_TIMEOUT,
+    batch_size=TELEGRAM_POLL_BATCH_SIZE,
+) if TELEGRAM_INGEST_MODE == 'polling' else None
+if _polling:
+    atexit.register(_polling.stop)
 
-            if bot_response.get('archive_conversation'):
-                logger.info(f"[WEBHOOK] 📦 Arquivando conversa {chat_id} após finalização do fluxo")
-                with _conversation_lock:
-                    if chat_id in _conversations:
-                        _conversations[chat_id].isArchived = True
-        else:
-            error_message = bot_response.get('messages', [{}])[0].get('text', 'Erro ao processar mensagem')
-            logger.error(f"[WEBHOOK] ❌ ERRO no processamento do bot: {error_message}")
+# --- Webhook Telegram - INTEGRADO COM BOT DE WORKFLOWS REAIS ---
+@app.route('/api/telegram/webhook/<account_id>', methods=['POST'])
+def webhook_telegram(account_id):
+    """
+    Webhook para receber mensagens do Telegram.
+    Só valida e enfileira o update, respondendo na hora; o bot de workflows, os
+    envios e a gravação rodam no pool de ingestão, em ordem por chat.
+    """
+    try:
+        logger.info(f"Webhook recebido para conta: {account_id}")
 
-        # Limpar cache
-        _cache['conversations_last_update'] = 0
-        logger.info("Cache limpo - conversas serão recarregadas")
+        data = request.get_json()
+        logger.debug(f"Dados do webhook: {json.dumps(data, indent=2)}")
 
-        logger.info(f"Webhook processado com sucesso para {chat_id}")
-        conv = _conversations.get(chat_id)
-        if conv:
-            _save_conversation_history(conv)
+        if not _enqueue_telegram_update(account_id, data):
+            return jsonify({"erro": "Fila de processamento cheia"}), 503
 
         return '', 200
 
@@ -1250,18 +1920,19 @@ def debug_status():
         telegram_accounts = listTelegramAccounts()
 
         conversations_info = []
-        with _conversation_lock:
-            for conv_id, conv in _conversations.items():
-                conversations_info.append({
-                    "id": conv_id,
-                    "title": conv.title,
-                    "platform": conv.platform,
-                    "is_archived": conv.isArchived,
-                    "is_bot_conversation": conv.is_bot_conversation,
-                    "messages_count": len(conv.messages),
-                    "last_message": conv.lastMessage,
-                    "last_at": conv.lastAt
-                })
+        for conv in list(_conversations.values()):
+            snapshot = conv.snapshot
+            conversation = snapshot.conversation
+            conversations_info.append({
+                "id": conversation['id'],
+                "title": conversation['title'],
+                "platform": conversation['platform'],
+                "is_archived": conversation['isArchived'],
+                "is_bot_conversation": conversation['is_bot_conversation'],
+                "messages_count": len(snapshot.messages),
+                "last_message": conversation['lastMessage'],
+                "last_at": conversation['lastAt']
+            })
 
         return jsonify({
             "timestamp": get_brasil_time(),
@@ -1272,16 +1943,37 @@ def debug_status():
                 "chat_mappings": len(chat_to_account),
                 "chat_mappings_detail": chat_to_account,
             },
+            "ingest_mode": TELEGRAM_INGEST_MODE,
+            "ingest": _ingest_pool.stats() if _ingest_pool else None,
+            "polling": _polling.stats() if _polling else None,
+            "update_dedupe": _update_dedupe.stats(),
+            "sender": _send_scheduler.stats(),
+            "telegram_api": _telegram_clients.stats(),
+            "rate_limit": _telegram_rate_limiter.stats(),
             "bot": {
                 "workflows_count": len(bot_components_api.get_all_workflows()),
                 "workflows": [{"id": w['id'], "tag": w['tag'], "enabled": w['enabled']} for w in bot_components_api.get_all_workflows()],
                 "active_executions": len(bot_components_api._active_executions)
             },
             "conversations_detail": conversations_info,
+            "persistence": {
+                "backend": STORAGE_BACKEND,
+                "history_mode": _history_store.mode,
+                "write_behind": _history_writer.stats() if _history_writer else None,
+            },
+            "memory": _memory_budget.stats(),
+            "locks": {
+                "global": _conversation_lock.stats(),
+                "conversations": _chat_locks.stats(),
+            },
+            "realtime": {
+                "conversations": _sse_hub.stats(),
+                "sidebar": _sidebar_feed.stats(),
+                "changes": _change_log.stats(),
+            },
             "cache": {
-                "last_update": _cache['conversations_last_update'],
-                "cached_conversations": len(_cache['conversations_cache']),
-                "cache_duration": _cache['cache_duration']
+                "indexed_conversations": len(_conversation_index),
+                "responses": _response_cache.stats(),
             },
             "system": {
                 "ngrok_url": os.environ.get('NGROK_URL'),
@@ -1328,9 +2020,6 @@ def get_telegram_statistics():
 
         logger.info(f"Buscando estatísticas - Start: {start_date}, End: {end_date}")
 
-        # Carregar todas as conversas do disco
-        _load_all_conversations_from_disk()
-
         statistics = {
             'total_conversations': 0,
             'total_messages': 0,
@@ -1348,66 +2037,63 @@ def get_telegram_statistics():
         booking_stats = booking_manager.get_statistics(start_date, end_date)
         statistics['bookings'] = booking_stats
 
-        with _conversation_lock:
-            for conv_id, conv in _conversations.items():
-                # Filtrar apenas conversas reais (não de bot)
-                if conv.is_bot_conversation:
-                    continue
+        # Metadados do catálogo: nenhum histórico precisa ser aberto
+        for entry in _conversation_summaries().values():
+            conv = entry["conversation"]
+
+            # Filtrar apenas conversas reais (não de bot)
+            if conv.get('is_bot_conversation'):
+                continue
+
+            # Parse da data de criação
+            try:
+                created_at = datetime.fromisoformat(conv.get('createdAt'))
+            except:
+                continue
 
-                # Parse da data de criação
+            # Aplicar filtros de data se fornecidos
+            if start_date:
                 try:
-                    created_at = datetime.fromisoformat(conv.createdAt)
+                    start_dt = datetime.fromisoformat(start_date)
+                    if created_at < start_dt:
+                        continue
                 except:
-                    continue
+                    pass
 
-                # Aplicar filtros de data se fornecidos
-                if start_date:
-                    try:
-                        start_dt = datetime.fromisoformat(start_date)
-                        if created_at < start_dt:
-                            continue
-                    except:
-                        pass
-
-                if end_date:
-                    try:
-                        end_dt = datetime.fromisoformat(end_date)
-                        if created_at > end_dt:
-                            continue
-                    except:
-                        pass
-
-                # Contar conversa
-                statistics['total_conversations'] += 1
-
-                # Agrupar por data
-                date_key = created_at.strftime('%Y-%m-%d')
-                statistics['conversations_by_date'][date_key] = statistics['conversations_by_date'].get(date_key, 0) + 1
-
-                # Contar mensagens
-                message_count = len(conv.messages)
-                statistics['total_messages'] += message_count
-
-                # Agrupar mensagens por data
-                for msg in conv.messages:
-                    try:
-                        msg_date = datetime.fromisoformat(msg.timestamp)
-                        msg_date_key = msg_date.strftime('%Y-%m-%d')
-                        statistics['messages_by_date'][msg_date_key] = statistics['messages_by_date'].get(msg_date_key, 0) + 1
-                    except:
+            if end_date:
+                try:
+                    end_dt = datetime.fromisoformat(end_date)
+                    if created_at > end_dt:
                         continue
-
-                # Adicionar conversa aos detalhes
-                statistics['conversations'].append({
-                    'id': conv.id,
-                    'title': conv.title,
-                    'createdAt': conv.createdAt,
-                    'lastMessage': conv.lastMessage,
-                    'lastAt': conv.lastAt,
-                    'messageCount': message_count,
-                    'isArchived': conv.isArchived,
-                    'platform': conv.platform
-                })
+                except:
+                    pass
+
+            # Contar conversa
+            statistics['total_conversations'] += 1
+
+            # Agrupar por data
+            date_key = created_at.strftime('%Y-%m-%d')
+            statistics['conversations_by_date'][date_key] = statistics['conversations_by_date'].get(date_key, 0) + 1
+
+            # Contar mensagens
+            message_count = entry["messageCount"]
+            statistics['total_messages'] += message_count
+
+            # Agrupar mensagens por data
+            for msg_date_key, count in entry["messagesByDate"].items():
+                statistics['messages_by_date'][msg_date_key] = statistics['messages_by_date'].get(msg_date_key, 0) + count
+
+            # Adicionar conversa aos detalhes
+            statistics['conversations'].append({
+                'id': conv.get('id'),
+                'title': conv.get('title'),
+                'createdAt': conv.get('createdAt'),
+                'lastMessage': conv.get('lastMessage'),
+                'lastAt': conv.get('lastAt'),
+                'messageCount': message_count,
+                'isArchived': conv.get('isArchived'),
+                'platform': conv.get('platform')
+            })
 
         # Ordenar conversas por data (mais recentes primeiro)
         statistics['conversations'].sort(key=lambda x: x['lastAt'], reverse=True)
@@ -1555,4 +2241,11 @@ if __name__ == '__main__':
     cleanup_worker = threading.Thread(target=cleanup_thread, daemon=True)
     cleanup_worker.start()
 
+    # Compactação do log de mensagens (modo append)
+    _history_store.start_compactor(HISTORY_COMPACT_INTERVAL)
+
+    # Polling do Telegram; com o reloader do modo debug, só no processo que serve as requisições
+    if _polling and (not debug_mode or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        _polling.start()
+
     app.run(host='0.0.0.0', port=port, debug=debug_mode, threaded=True)
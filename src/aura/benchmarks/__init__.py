@@ -0,0 +1 @@
+"""Benchmarks executáveis (python -m src.aura.benchmarks.<nome>)."""
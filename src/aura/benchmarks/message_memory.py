@@ -0,0 +1,98 @@
+"""
+Bytes por mensagem residente: dataclass com __dict__ (representação anterior),
+objetos com __slots__ e armazenamento colunar (MessageColumns).
+
+Uso: python -m src.aura.benchmarks.message_memory [quantidade]
+"""
+
+import gc
+import sys
+import tracemalloc
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List
+
+from src.aura.storage.message_columns import MessageColumns
+
+BRASIL_TZ = timezone(timedelta(hours=-3))
+
+
+@dataclass
+class DictMessage:
+    """Representação anterior de Message em app.py"""
+    id: str
+    sender: str
+    text: str
+    timestamp: str
+    read: bool = False
+    platform: str = "telegram"
+
+
+class SlottedMessage:
+    __slots__ = ("id", "sender", "text", "timestamp", "read", "platform")
+
+    def __init__(self, id, sender, text, timestamp, read=False, platform="telegram"):
+        self.id = id
+        self.sender = sender
+        self.text = text
+        self.timestamp = timestamp
+        self.read = read
+        self.platform = platform
+
+
+def _sample_rows(count: int) -> List[tuple]:
+    start = datetime(2025, 1, 1, 8, 0, tzinfo=BRASIL_TZ)
+    return [
+        (
+            uuid.uuid4().hex,
+            "user" if index % 2 else "bot",
+            f"Mensagem de teste número {index}",
+            start + timedelta(seconds=37 * index, microseconds=index),
+            bool(index % 3),
+        )
+        for index in range(count)
+    ]
+
+
+def _fields(row: tuple) -> tuple:
+    # Timestamp e platform são strings novas por mensagem, como chegam do JSON do histórico
+    message_id, sender, text, moment, read = row
+    return message_id, sender, text, moment.isoformat(), read, "".join(("tele", "gram"))
+
+
+def _measure(build: Callable[[], object]) -> int:
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    container = build()
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del container
+    return after - before
+
+
+def main(count: int = 100_000) -> None:
+    rows = _sample_rows(count)
+    # Ids e textos são compartilhados entre as variantes; o resto é alocado por cada uma
+    variants = {
+        "dataclass (__dict__)": lambda: [DictMessage(*_fields(row)) for row in rows],
+        "__slots__": lambda: [SlottedMessage(*_fields(row)) for row in rows],
+        "MessageColumns": lambda: MessageColumns(SlottedMessage, (SlottedMessage(*_fields(row)) for row in rows)),
+    }
+
+    print(f"{count} mensagens (sem contar ids e textos)")
+    baseline = None
+    for name, build in variants.items():
+        per_message = _measure(build) / count
+        baseline = baseline or per_message
+        print(f"  {name:<22} {per_message:8.1f} bytes/mensagem  ({per_message / baseline:6.1%})")
+
+    columns = MessageColumns(SlottedMessage, (SlottedMessage(*_fields(row)) for row in rows[:1000]))
+    assert [vars(DictMessage(*_fields(row))) for row in rows[:1000]] == [
+        {name: getattr(msg, name) for name in SlottedMessage.__slots__} for msg in columns
+    ], "MessageColumns não reproduziu as mensagens originais"
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
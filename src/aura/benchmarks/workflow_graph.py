@@ -0,0 +1,95 @@
+"""
+Custo por passo da navegação de um workflow conforme o número de nós: busca
+linear nas listas de nós e conexões (implementação anterior de find_next_node)
+contra o grafo compilado no registro (WorkflowGraph).
+
+Uso: python -m src.aura.benchmarks.workflow_graph [passos]
+"""
+
+import sys
+import timeit
+from typing import Dict, List, Optional
+
+from src.aura import bot_components_api
+from src.aura.bot_components_api import FlowEdge, FlowNode, find_next_node
+
+SIZES = (10, 100, 300, 1000, 3000)
+
+
+def _workflow(workflow_id: str, size: int) -> Dict:
+    """Cadeia start -> (sendMessage | options com duas saídas) -> ... com ``size`` nós"""
+    nodes = [{"id": "n0", "type": "start", "data": {"label": "Start"}}]
+    edges = []
+    for index in range(1, size):
+        if index % 10 == 0:
+            nodes.append({
+                "id": f"n{index}",
+                "type": "options",
+                "data": {"label": f"O{index}", "message": "Escolha", "options": [{"text": "A"}, {"text": "B"}]},
+            })
+        else:
+            nodes.append({"id": f"n{index}", "type": "sendMessage", "data": {"label": f"M{index}", "message": "Olá"}})
+        source = nodes[index - 1]
+        if source["type"] == "options":
+            edges.append({"id": f"e{index}a", "source": source["id"], "target": f"n{index}", "sourceHandle": "output-0"})
+            edges.append({"id": f"e{index}b", "source": source["id"], "target": f"n{index}", "sourceHandle": "output-1"})
+        else:
+            edges.append({"id": f"e{index}", "source": source["id"], "target": f"n{index}"})
+    return {"_id": workflow_id, "flowData": {"nodes": nodes, "edges": edges}}
+
+
+def _linear_next_node(
+    nodes: List[FlowNode], edges: List[FlowEdge], current_node_id: str, option_index: Optional[int] = None
+) -> Optional[FlowNode]:
+    """find_next_node antes do grafo compilado (sem os logs)"""
+    outgoing_edges = [e for e in edges if e.source == current_node_id]
+    if not outgoing_edges:
+        return None
+    if option_index is not None:
+        target_edge = next((e for e in outgoing_edges if e.sourceHandle == f"output-{option_index}"), None)
+        if not target_edge:
+            return None
+    else:
+        target_edge = outgoing_edges[0]
+    return next((n for n in nodes if n.id == target_edge.target), None)
+
+
+def _walk(next_node, start: FlowNode, steps: int) -> int:
+    """Percorre ``steps`` passos (recomeçando do START no fim da cadeia); retorna os passos dados"""
+    node = start
+    for _ in range(steps):
+        node = next_node(node.id, 1 if node.type == "options" else None) or start
+    return steps
+
+
+def main(steps: int = 2000) -> None:
+    print(f"µs por passo ({steps} passos por medição, melhor de 5)")
+    print(f"  {'nós':>6} {'busca linear':>14} {'grafo':>10}")
+    for size in SIZES:
+        workflow_id = f"benchmark-{size}"
+        assert bot_components_api.register_workflow(_workflow(workflow_id, size))
+        workflow = bot_components_api.get_workflow_by_id(workflow_id)
+        graph = bot_components_api.get_workflow_graph(workflow_id)
+        nodes, edges = workflow["nodes"], workflow["edges"]
+
+        # As duas navegações precisam chegar aos mesmos nós
+        linear = graph.start
+        compiled = graph.start
+        for _ in range(min(size, 500)):
+            option_index = 0 if linear.type == "options" else None
+            linear = _linear_next_node(nodes, edges, linear.id, option_index) or graph.start
+            compiled = find_next_node(workflow_id, compiled.id, option_index) or graph.start
+            assert linear is compiled, "grafo compilado divergiu da busca linear"
+
+        timings = {}
+        for name, next_node in (
+            ("linear", lambda node_id, option: _linear_next_node(nodes, edges, node_id, option)),
+            ("graph", lambda node_id, option: find_next_node(workflow_id, node_id, option)),
+        ):
+            best = min(timeit.repeat(lambda: _walk(next_node, graph.start, steps), number=1, repeat=5))
+            timings[name] = 1e6 * best / steps
+        print(f"  {size:>6} {timings['linear']:>14.2f} {timings['graph']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
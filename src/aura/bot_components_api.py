@@ -6,7 +6,8 @@ LÊ 100% DO JSON REAL - SEM MOCK!
 
 import logging
 import json
-from typing import Dict, List, Optional, Any, Tuple
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Any, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime, timezone, timedelta
 import random
@@ -69,6 +70,40 @@ class FlowEdge:
     sourceHandle: Optional[str] = None
     targetHandle: Optional[str] = None
 
+@dataclass(frozen=True)
+class WorkflowGraph:
+    """
+    Workflow compilado no registro: nós por id, conexões agrupadas pelo nó de
+    origem (na ordem do JSON) e indexadas por (origem, sourceHandle), e o nó START.
+    Imutável; cada passo da navegação é uma consulta de dicionário.
+    """
+    nodes: Mapping[str, FlowNode]
+    outgoing: Mapping[str, Tuple[FlowEdge, ...]]
+    handles: Mapping[Tuple[str, Optional[str]], FlowEdge]
+    start: Optional[FlowNode]
+
+def compile_workflow_graph(nodes: List[FlowNode], edges: List[FlowEdge]) -> WorkflowGraph:
+    """
+    Monta o grafo de um workflow. Em ids repetidos vale a primeira ocorrência,
+    como nas buscas lineares que o grafo substitui
+    """
+    nodes_by_id: Dict[str, FlowNode] = {}
+    for node in nodes:
+        nodes_by_id.setdefault(node.id, node)
+
+    outgoing: Dict[str, List[FlowEdge]] = {}
+    handles: Dict[Tuple[str, Optional[str]], FlowEdge] = {}
+    for edge in edges:
+        outgoing.setdefault(edge.source, []).append(edge)
+        handles.setdefault((edge.source, edge.sourceHandle), edge)
+
+    return WorkflowGraph(
+        nodes=MappingProxyType(nodes_by_id),
+        outgoing=MappingProxyType({source: tuple(group) for source, group in outgoing.items()}),
+        handles=MappingProxyType(handles),
+        start=next((n for n in nodes if n.type == "start"), None),
+    )
+
 @dataclass
 class WorkflowExecution:
     """Estado de execução de um workflow"""
@@ -101,6 +136,21 @@ class WorkflowExecution:
 # Armazenamento em memória (dados REAIS do JSON)
 _published_workflows: Dict[str, Dict] = {}
 _active_executions: Dict[str, WorkflowExecution] = {}
+# Grafos compilados por workflow (fora de _published_workflows, que é serializado na API)
+_workflow_graphs: Dict[str, WorkflowGraph] = {}
+# Workflow que atende as mensagens (ativo mais recente), recalculado só quando
+# um workflow é registrado ou muda de status
+_active_workflow: Optional[Dict] = None
+
+def _refresh_active_workflow() -> None:
+    """Recalcula o workflow ativo: o habilitado com updated_at (ou created_at) mais recente"""
+    global _active_workflow
+    active = [w for w in _published_workflows.values() if w.get('enabled', True)]
+    _active_workflow = max(active, key=lambda w: w.get('updated_at', w.get('created_at', '')), default=None)
+    if _active_workflow:
+        logger.info(f"Workflow ativo: {_active_workflow['id']} (tag: {_active_workflow.get('tag', 'Sem tag')})")
+    else:
+        logger.info("Nenhum workflow ativo")
 
 def parse_workflow_data(workflow_data: Dict) -> Tuple[List[FlowNode], List[FlowEdge]]:
     """
@@ -176,6 +226,8 @@ def register_workflow(workflow_data: Dict) -> bool:
             logger.error("Workflow sem nós")
             return False
 
+        graph = compile_workflow_graph(nodes, edges)
+
         is_update = workflow_id in _published_workflows
         if is_update:
             logger.info(f"Workflow {workflow_id} JÁ EXISTE - Atualizando com novo JSON")
@@ -208,6 +260,9 @@ def register_workflow(workflow_data: Dict) -> bool:
             "created_at": workflow_data.get("_insertedAt", datetime.now(BRASIL_TZ).isoformat()),
             "updated_at": datetime.now(BRASIL_TZ).isoformat()  # Add updated_at timestamp
         }
+        _workflow_graphs[workflow_id] = graph
+
+        _refresh_active_workflow()
 
         logger.info(f"Workflow REAL {'ATUALIZADO' if is_update else 'REGISTRADO'}: {workflow_id}")
         logger.info(f"    Nós: {len(nodes)}")
@@ -238,6 +293,7 @@ def set_workflow_status(workflow_id: str, enabled: bool) -> bool:
             return False
 
         _published_workflows[workflow_id]["enabled"] = enabled
+        _refresh_active_workflow()
         logger.info(f"Workflow {workflow_id} {'ativado' if enabled else 'desativado'}")
         return True
 
@@ -250,16 +306,13 @@ def find_next_node(workflow_id: str, current_node_id: str, option_index: Optiona
     Encontra o próximo nó no fluxo REAL baseado nas conexões do JSON
     """
     try:
-        workflow = _published_workflows.get(workflow_id)
-        if not workflow:
+        graph = _workflow_graphs.get(workflow_id)
+        if not graph:
             logger.error(f"Workflow não encontrado: {workflow_id}")
             return None
 
-        edges: List[FlowEdge] = workflow["edges"]
-        nodes: List[FlowNode] = workflow["nodes"]
-
-        # Filtrar edges que saem do nó atual
-        outgoing_edges = [e for e in edges if e.source == current_node_id]
+        # Edges que saem do nó atual
+        outgoing_edges = graph.outgoing.get(current_node_id)
 
         if not outgoing_edges:
             logger.info(f"Nenhuma conexão de saída do nó {current_node_id}")
@@ -267,8 +320,7 @@ def find_next_node(workflow_id: str, current_node_id: str, option_index: Optiona
 
         # Se option_index foi fornecido, procurar pela edge específica
         if option_index is not None:
-            target_handle = f"output-{option_index}"
-            target_edge = next((e for e in outgoing_edges if e.sourceHandle == target_handle), None)
+            target_edge = graph.handles.get((current_node_id, f"output-{option_index}"))
 
             if not target_edge:
                 logger.warning(f"Edge não encontrada para opção {option_index}")
@@ -278,7 +330,7 @@ def find_next_node(workflow_id: str, current_node_id: str, option_index: Optiona
             target_edge = outgoing_edges[0]
 
         # Encontrar o nó de destino
-        next_node = next((n for n in nodes if n.id == target_edge.target), None)
+        next_node = graph.nodes.get(target_edge.target)
 
         if next_node:
             logger.info(f"Próximo nó: {next_node.id} ({next_node.type})")
@@ -333,6 +385,373 @@ def get_execution(user_id: str, workflow_id: str) -> Optional[WorkflowExecution]
     execution_key = f"{user_id}:{workflow_id}"
     return _active_executions.get(execution_key)
 
+# --- Interpretador de nós ---
+# Todo caminho que percorre o fluxo (início, escolha de opção, fim de agente, agendamento,
+# cancelamento e vendas) usa _run_nodes com uma tabela tipo do nó -> handler. As tabelas
+# de cada caminho reproduzem o comportamento que cada um já tinha. As mensagens e as
+# respostas do turno, dentro ou fora dos nós, passam por _Turn.
+
+_SEPARATOR = "━━━━━━━━━━━━━━━━━━━━"
+
+class _Turn:
+    """Um turno de process_user_message: execução do usuário e mensagens a enviar"""
+
+    __slots__ = ("user_id", "workflow_id", "execution", "messages")
+
+    def __init__(self, user_id: str, workflow_id: str, execution: WorkflowExecution):
+        self.user_id = user_id
+        self.workflow_id = workflow_id
+        self.execution = execution
+        self.messages: List[Dict[str, Any]] = []
+
+    def say(self, text: str, record: bool = True, **extra: Any) -> None:
+        """Adiciona uma mensagem a enviar e, se ``record``, ao histórico da execução"""
+        self.messages.append({"text": text, "options": [], **extra})
+        if record:
+            self.execution.conversation_history.append({
+                "role": "assistant",
+                "content": text,
+                "timestamp": datetime.now(BRASIL_TZ).isoformat()
+            })
+
+    def respond(
+        self,
+        requires_input: bool,
+        is_final: bool,
+        success: bool = True,
+        node_type: Optional[str] = None,
+        **extra: Any
+    ) -> Dict[str, Any]:
+        """Resposta do turno com as mensagens acumuladas"""
+        response = {
+            "success": success,
+            "messages": self.messages,
+            "requires_input": requires_input,
+            "is_final": is_final,
+            **extra
+        }
+        if node_type:
+            response["node_type"] = node_type
+        return response
+
+    def wait(self, node_type: Optional[str] = None) -> Dict[str, Any]:
+        """Resposta de um nó que aguarda a próxima mensagem do usuário"""
+        return self.respond(requires_input=True, is_final=False, node_type=node_type)
+
+    def fail(self) -> Dict[str, Any]:
+        return self.respond(requires_input=False, is_final=True, success=False)
+
+    def finish(self) -> Dict[str, Any]:
+        """Fim do fluxo: a conversa recomeça do START na próxima mensagem"""
+        reset_conversation(self.user_id, self.workflow_id)
+        return self.respond(requires_input=False, is_final=True, archive_conversation=True)
+
+class NodeHandler:
+    """
+    Executa um tipo de nó. ``run`` retorna a resposta do turno quando o nó aguarda o
+    usuário, ou None para seguir para o próximo nó (o que esta classe base faz)
+    """
+
+    def run(self, turn: _Turn, node: FlowNode) -> Optional[Dict[str, Any]]:
+        return None
+
+class SendMessageHandler(NodeHandler):
+    def run(self, turn: _Turn, node: FlowNode) -> Optional[Dict[str, Any]]:
+        turn.say(node.data.message or "Mensagem não configurada")
+        return None
+
+class OptionsHandler(NodeHandler):
+    def __init__(self, node_type: Optional[str] = None):
+        self.node_type = node_type
+
+    def run(self, turn: _Turn, node: FlowNode) -> Optional[Dict[str, Any]]:
+        msg_text = node.data.message or "Escolha uma opção:"
+        options = node.data.options or []
+        if options:
+            msg_text += "\n\n" + "\n".join([f"{i+1}. {opt.get('text', '')}" for i, opt in enumerate(options)])
+
+        turn.say(msg_text)
+        turn.execution.waiting_for_input = True
+        logger.info(f"Aguardando input do usuário no nó: {node.id}")
+        return turn.wait(self.node_type)
+
+class AgentHandler(NodeHandler):
+    def run(self, turn: _Turn, node: FlowNode) -> Optional[Dict[str, Any]]:
+        agent_id = node.data.agentId
+        if not agent_id:
+            turn.say("Erro: Agente não configurado.", record=False)
+            return turn.fail()
+
+        init_response = agent_manager.initialize_conversation(agent_id, turn.user_id)
+        if not init_response.get("success"):
+            turn.say(f"❌ {init_response.get('error', 'Erro ao inicializar agente')}", record=False)
+            return turn.fail()
+
+        turn.say(node.data.initialMessage or "Olá! Como posso ajudar você?")
+        turn.execution.waiting_for_input = True
+        logger.info(f"Aguardando input do usuário no nó de agente: {node.id}")
+        return turn.wait("agent")
+
+def _open_slots(node: FlowNode, workflow_id: str) -> List[Dict[str, Any]]:
+    """Horários disponíveis do nó de agendamento que ainda não foram reservados"""
+    return [
+        slot for slot in node.data.availableSlots or []
+        if slot.get("available", False)
+        and not booking_manager.is_slot_booked(slot.get("time", ""), slot.get("date", ""), workflow_id)
+    ]
+
+def _format_slots(node: FlowNode, slots: List[Dict[str, Any]]) -> str:
+    slots_text = f"\n\n{_SEPARATOR}\n📋 *Horários Disponíveis:*\n{_SEPARATOR}\n\n"
+
+    for idx, slot in enumerate(slots, start=1):
+        time = slot.get("time", "")
+        date = slot.get("date", "")
+
+        try:
+            date_formatted = datetime.strptime(date, "%Y-%m-%d").strftime("%d/%m/%Y")
+        except Exception:
+            date_formatted = date
+
+        slots_text += f"⏰ *{idx}.* {time} - 📅 {date_formatted}\n"
+
+    slots_text += f"\n{_SEPARATOR}\n\n💡 Digite o *número* do horário desejado\n❌ Digite *'cancelar'* para cancelar um agendamento"
+    return (node.data.message or "📅 Deseja agendar um horário?") + slots_text
+
+def _format_slots_compact(node: FlowNode, slots: List[Dict[str, Any]]) -> str:
+    slots_text = "\n\nHorários Disponíveis:\n"
+    for idx, slot in enumerate(slots, start=1):
+        date = slot.get("date", "")
+        date_str = f" - {date}" if date else ""
+        slots_text += f"{idx}. {slot.get('time', '')}{date_str}\n"
+
+    return (node.data.message or "📅 Deseja agendar um horário?") + slots_text + "\n\nDigite o número do horário desejado ou 'cancelar' para cancelar."
+
+class SchedulingHandler(NodeHandler):
+    """
+    Nó de agendamento: lista os horários livres e aguarda a escolha; sem horários,
+    avisa e segue. ``remember_slots`` guarda a lista mostrada para validar a escolha;
+    ``compact`` usa a listagem simples, sem formatação
+    """
+
+    def __init__(self, remember_slots: bool = False, compact: bool = False):
+        self.remember_slots = remember_slots
+        self.compact = compact
+
+    def run(self, turn: _Turn, node: FlowNode) -> Optional[Dict[str, Any]]:
+        filtered_slots = _open_slots(node, turn.workflow_id)
+
+        if not filtered_slots:
+            if self.compact:
+                default = "Não há horários disponíveis no momento."
+            else:
+                default = "😔 Não há horários disponíveis no momento.\n\nPor favor, tente novamente mais tarde."
+            turn.say(node.data.noSlotsMessage or default)
+            return None
+
+        format_slots = _format_slots_compact if self.compact else _format_slots
+        turn.say(format_slots(node, filtered_slots))
+
+        turn.execution.waiting_for_input = True
+        if self.remember_slots:
+            turn.execution.scheduling_state = {
+                "slots": filtered_slots,
+                "node_id": node.id,
+            }
+        logger.info(f"Aguardando resposta de agendamento no nó: {node.id}")
+        return turn.wait("agendamento")
+
+class SaleHandler(NodeHandler):
+    """Nó de vendas: mostra o estoque e aguarda o número do item (ou o nome, sem estoque)"""
+
+    def __init__(self, record_history: bool = False):
+        self.record_history = record_history
+
+    def run(self, turn: _Turn, node: FlowNode) -> Optional[Dict[str, Any]]:
+        intro = node.data.message or "Confira os itens disponíveis para venda:"
+
+        try:
+            available_items = _fetch_available_inventory()
+        except Exception:
+            logger.exception("Falha ao carregar inventário para o nó de vendas")
+            available_items = []
+
+        logger.info("Nó de vendas carregado (%s): %s itens elegíveis", node.id, len(available_items))
+
+        message_lines = [intro, ""]
+
+        if available_items:
+            for idx, item in enumerate(available_items, start=1):
+                price = _format_currency(item.get("unitPrice"))
+                stock = item.get("stockQuantity", 0)
+                message_lines.append(f"{idx}. {item.get('name', 'Item')} - {price} (estoque: {stock})")
+
+            message_lines.append("")
+            message_lines.append("0. Solicitar item que não está disponível")
+            message_lines.append("Digite o número do item desejado.")
+            stage = "selection"
+        else:
+            message_lines.append(
+                "No momento não há itens em estoque. Informe o nome do item que deseja e registraremos a solicitação."
+            )
+            stage = "customName"
+
+        turn.say("\n".join(message_lines), record=self.record_history)
+
+        turn.execution.waiting_for_input = True
+        turn.execution.sale_state = {
+            "stage": stage,
+            "items": available_items,
+            "selected": None,
+        }
+        return turn.wait("venda")
+
+class AwaitSaleHandler(NodeHandler):
+    """Para no nó de vendas sem mostrar o estoque; a próxima mensagem é tratada pelo nó"""
+
+    def run(self, turn: _Turn, node: FlowNode) -> Optional[Dict[str, Any]]:
+        turn.execution.waiting_for_input = True
+        return turn.wait("venda")
+
+class FinalizeHandler(NodeHandler):
+    """Nó finalizar: mensagem final e pesquisa de satisfação (nota de 0 a 5)"""
+
+    DEFAULT_LABELS = ["Péssimo", "Ruim", "Regular", "Bom", "Excelente", "Extremamente Satisfeito"]
+
+    def __init__(self, bold_title: bool = False, bold_ratings: bool = False):
+        self.bold_title = bold_title
+        self.bold_ratings = bold_ratings
+
+    def run(self, turn: _Turn, node: FlowNode) -> Optional[Dict[str, Any]]:
+        logger.info(f"[SURVEY] NÓ FINALIZAR ATINGIDO: {node.id}")
+
+        msg_text = node.data.finalMessage or node.data.message or ""
+        if msg_text.strip():
+            turn.say(msg_text)
+
+        survey_question = node.data.surveyQuestion or "Olá, diga de 0 a 5, qual é a nota do atendimento?"
+        rating_labels = node.data.surveyRatingLabels or self.DEFAULT_LABELS
+
+        title = "*Pesquisa de Satisfação*" if self.bold_title else "Pesquisa de Satisfação"
+        survey_text = f"\n\n{_SEPARATOR}\n📊 {title}\n{_SEPARATOR}\n\n{survey_question}\n\n"
+        for i, label in enumerate(rating_labels):
+            rating = f"*{i}*" if self.bold_ratings else str(i)
+            survey_text += f"{rating} - {label}\n"
+        survey_text += "\n💡 Digite o número correspondente à sua avaliação"
+
+        turn.say(survey_text, delay=2000)
+
+        turn.execution.survey_state = {
+            'waiting_response': True,
+            'question': survey_question,
+            'timestamp': datetime.now(BRASIL_TZ).isoformat()
+        }
+        turn.execution.waiting_for_input = True
+        logger.info(f"[SURVEY] Pesquisa adicionada ({len(turn.messages)} mensagens a enviar)")
+        return turn.wait()
+
+class HandoffHandler(NodeHandler):
+    """Nó agentes: transfere a conversa para um operador humano"""
+
+    def run(self, turn: _Turn, node: FlowNode) -> Optional[Dict[str, Any]]:
+        turn.say(node.data.initialMessage or "🔄 Encaminhando para o operador disponível... Por favor aguarde.")
+        agent_manager.start_agent_session(turn.user_id, node.id)
+        turn.execution.waiting_for_input = True
+        logger.info(f"Conversa transferida para operador - Nó: {node.id}")
+        return turn.wait("agent")
+
+class NodeTable:
+    """
+    Handlers por tipo de nó de um caminho do fluxo. Tipos sem handler usam
+    ``fallback``; com ``fallback=None`` o fluxo termina no primeiro tipo sem handler
+    """
+
+    __slots__ = ("handlers", "fallback")
+
+    def __init__(self, handlers: Dict[str, NodeHandler], fallback: Optional[NodeHandler] = NodeHandler()):
+        self.handlers = handlers
+        self.fallback = fallback
+
+_send_message = SendMessageHandler()
+_handoff = HandoffHandler()
+
+# Primeira mensagem: do START até o primeiro nó que aguarda o usuário
+_START_NODES = NodeTable({
+    "sendMessage": _send_message,
+    "options": OptionsHandler(),
+    "agent": AgentHandler(),
+    "agendamento": SchedulingHandler(),
+    "venda": SaleHandler(),
+    "finalizar": FinalizeHandler(),
+    "agentes": _handoff,
+})
+# Depois de uma opção escolhida
+_AFTER_OPTION_NODES = NodeTable({
+    "sendMessage": _send_message,
+    "options": OptionsHandler(),
+    "venda": SaleHandler(record_history=True),
+    "agentes": _handoff,
+    "agendamento": SchedulingHandler(compact=True),
+    "finalizar": FinalizeHandler(),
+})
+# Depois que o agente conclui a conversa
+_AFTER_AGENT_NODES = NodeTable({
+    "sendMessage": _send_message,
+    "options": OptionsHandler(),
+    "finalizar": FinalizeHandler(bold_ratings=True),
+    "agentes": _handoff,
+})
+# Depois de um agendamento confirmado
+_AFTER_BOOKING_NODES = NodeTable({
+    "sendMessage": _send_message,
+    "options": OptionsHandler(),
+    "finalizar": FinalizeHandler(),
+    "agentes": _handoff,
+    "venda": AwaitSaleHandler(),
+})
+# Depois de um cancelamento de agendamento: só mensagens, o resto encerra o fluxo
+_AFTER_CANCELLATION_NODES = NodeTable({
+    "sendMessage": _send_message,
+}, fallback=None)
+# Depois de uma solicitação de item sem estoque
+_AFTER_SALE_REQUEST_NODES = NodeTable({
+    "sendMessage": _send_message,
+    "options": OptionsHandler("options"),
+    "venda": SaleHandler(),
+    "agentes": _handoff,
+    "agendamento": SchedulingHandler(remember_slots=True),
+    "finalizar": FinalizeHandler(bold_title=True, bold_ratings=True),
+})
+# Depois de um pedido de item em estoque
+_AFTER_SALE_ORDER_NODES = NodeTable({
+    "sendMessage": _send_message,
+    "options": OptionsHandler("options"),
+    "venda": SaleHandler(),
+    "agentes": _handoff,
+    "agendamento": SchedulingHandler(remember_slots=True),
+    "finalizar": FinalizeHandler(),
+})
+
+def _run_nodes(turn: _Turn, node: Optional[FlowNode], table: NodeTable) -> Dict[str, Any]:
+    """
+    Executa os nós a partir de ``node`` até um que aguarde o usuário; se os nós
+    acabarem, encerra o fluxo
+    """
+    while node:
+        turn.execution.current_node_id = node.id
+        logger.info(f"Processando nó: {node.id} ({node.type})")
+
+        handler = table.handlers.get(node.type, table.fallback)
+        if handler is None:
+            break
+
+        response = handler.run(turn, node)
+        if response is not None:
+            return response
+        node = find_next_node(turn.workflow_id, node.id)
+
+    logger.info("Fim do fluxo - sem mais nós")
+    return turn.finish()
+
 def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[str, Any]:
     """
     Processa mensagem do usuário e retorna resposta do bot
@@ -413,23 +832,13 @@ def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[s
             "timestamp": datetime.now(BRASIL_TZ).isoformat()
         })
 
+        turn = _Turn(user_id, workflow_id, execution)
         workflow = _published_workflows.get(workflow_id)
         if not workflow:
-            return {
-                "success": False,
-                "messages": [{
-                    "text": "Workflow não encontrado",
-                    "options": []
-                }],
-                "requires_input": False,
-                "is_final": True
-            }
+            turn.say("Workflow não encontrado", record=False)
+            return turn.fail()
 
-        nodes: List[FlowNode] = workflow["nodes"]
-        messages_to_send = []
-        requires_input = False
-        is_final = False
-        node_type = None # To keep track of current node type
+        graph = _workflow_graphs[workflow_id]
 
         if hasattr(execution, 'survey_state') and execution.survey_state and execution.survey_state.get('waiting_response'):
             user_input = message.strip()
@@ -453,732 +862,67 @@ def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[s
                     logger.error(f"[SURVEY] ❌ ERRO ao salvar resposta!")
 
                 # Thank you message
-                thank_you_msg = "✅ Obrigado pelo seu feedback! Sua opinião é muito importante para nós."
-
-                messages_to_send.append({
-                    "text": thank_you_msg,
-                    "options": []
-                })
-
-                execution.conversation_history.append({
-                    "role": "assistant",
-                    "content": thank_you_msg,
-                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                })
+                turn.say("✅ Obrigado pelo seu feedback! Sua opinião é muito importante para nós.")
 
                 # Clear survey state
                 execution.survey_state = {}
                 execution.waiting_for_input = False
 
                 logger.info(f"[SURVEY] Estado da pesquisa limpo. Resetando conversa...")
-
-                # Reset conversation
-                reset_conversation(user_id, workflow_id)
-
-                logger.info(f"[SURVEY] Processo de pesquisa finalizado com sucesso!")
-
-                return {
-                    "success": True,
-                    "messages": messages_to_send,
-                    "requires_input": False,
-                    "is_final": True,
-                    "archive_conversation": True
-                }
+                return turn.finish()
             else:
                 # Invalid rating
                 logger.warning(f"[SURVEY] Nota inválida recebida: '{user_input}'")
-                error_msg = "❌ Por favor, digite apenas um número de 0 a 5 para avaliar o atendimento."
-
-                return {
-                    "success": True,
-                    "messages": [{
-                        "text": error_msg,
-                        "options": []
-                    }],
-                    "requires_input": True,
-                    "is_final": False
-                }
+                turn.say("❌ Por favor, digite apenas um número de 0 a 5 para avaliar o atendimento.", record=False)
+                return turn.wait()
         # </CHANGE>
 
         if execution.current_node_id:
-            current_node = next((n for n in nodes if n.id == execution.current_node_id), None)
+            current_node = graph.nodes.get(execution.current_node_id)
             if current_node and current_node.type == "agent":
                 agent_id = current_node.data.agentId
 
                 if not agent_id:
-                    return {
-                        "success": False,
-                        "messages": [{
-                            "text": "Erro: Agente não configurado.",
-                            "options": []
-                        }],
-                        "requires_input": False,
-                        "is_final": True
-                    }
+                    turn.say("Erro: Agente não configurado.", record=False)
+                    return turn.fail()
 
                 # Process message with agent
                 response = agent_manager.process_message(agent_id, user_id, message)
 
                 if not response.get("success"):
-                    error_msg = response.get("error", "Erro ao processar mensagem com agente")
-                    return {
-                        "success": True,
-                        "messages": [{
-                            "text": f"❌ {error_msg}",
-                            "options": []
-                        }],
-                        "requires_input": False, # Bot is not waiting, agent is
-                        "is_final": False
-                    }
-
-                agent_message = response.get("message", "")
-
-                messages_to_send.append({
-                    "text": agent_message,
-                    "options": []
-                })
+                    turn.say(f"❌ {response.get('error', 'Erro ao processar mensagem com agente')}", record=False)
+                    # Bot is not waiting, agent is
+                    return turn.respond(requires_input=False, is_final=False)
 
-                execution.conversation_history.append({
-                    "role": "assistant",
-                    "content": agent_message,
-                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                })
+                turn.say(response.get("message", ""))
 
                 # Check if agent conversation is complete
                 if response.get("is_complete"):
                     execution.waiting_for_input = False
 
-                    # Move to next node
-                    next_node = find_next_node(workflow_id, current_node.id)
-                    if next_node:
-                        execution.current_node_id = next_node.id
-                        # Continue processing from next node
-                        current_node = next_node
-                        while current_node:
-                            logger.info(f"Processando nó: {current_node.id} ({current_node.type})")
-
-                            if current_node.type == "sendMessage":
-                                msg_text = current_node.data.message or "Mensagem não configurada"
-                                messages_to_send.append({
-                                    "text": msg_text,
-                                    "options": []
-                                })
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": msg_text,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                })
-
-                                execution.current_node_id = current_node.id
-                                current_node = find_next_node(workflow_id, current_node.id)
-
-                            elif current_node.type == "options":
-                                msg_text = current_node.data.message or "Escolha uma opção:"
-                                options = current_node.data.options or []
-
-                                if options:
-                                    options_text = "\n\n" + "\n".join([f"{i+1}. {opt.get('text', '')}"for i, opt in enumerate(options)])
-                                    full_message = msg_text + options_text
-                                else:
-                                    full_message = msg_text
-
-                                messages_to_send.append({
-                                    "text": full_message,
-                                    "options": []
-                                })
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": full_message,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                })
-
-                                execution.current_node_id = current_node.id
-                                execution.waiting_for_input = True
-
-                                return {
-                                    "success": True,
-                                    "messages": messages_to_send,
-                                    "requires_input": True,
-                                    "is_final": False
-                                }
-
-                            elif current_node.type == "finalizar":
-                                logger.info(f"[SURVEY] ========================================")
-                                logger.info(f"[SURVEY] NÓ FINALIZAR ATINGIDO: {current_node.id}")
-                                logger.info(f"[SURVEY] ========================================")
-
-                                msg_text = current_node.data.finalMessage or current_node.data.message or ""
-
-                                if msg_text.strip():
-                                    logger.info(f"[SURVEY] Adicionando mensagem final: {msg_text[:50]}...")
-                                    messages_to_send.append({
-                                        "text": msg_text,
-                                        "options": []
-                                    })
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": msg_text,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                    })
-                                else:
-                                    logger.info(f"[SURVEY] Nenhuma mensagem final configurada")
-
-                                # SEMPRE enviar pesquisa de satisfação
-                                logger.info(f"[SURVEY] Preparando pesquisa de satisfação...")
-                                logger.info(f"[SURVEY] enableSatisfactionSurvey: {current_node.data.enableSatisfactionSurvey}")
-
-                                # Get survey configuration or use defaults
-                                survey_question = current_node.data.surveyQuestion or "Olá, diga de 0 a 5, qual é a nota do atendimento?"
-                                rating_labels = current_node.data.surveyRatingLabels or [
-                                    "Péssimo",
-                                    "Ruim",
-                                    "Regular",
-                                    "Bom",
-                                    "Excelente",
-                                    "Extremamente Satisfeito"
-                                ]
-
-                                logger.info(f"[SURVEY] Pergunta: {survey_question}")
-                                logger.info(f"[SURVEY] Labels configurados: {len(rating_labels)} labels")
-
-                                # Build survey message with better formatting
-                                survey_text = f"\n\n━━━━━━━━━━━━━━━━━━━━\n📊 Pesquisa de Satisfação\n━━━━━━━━━━━━━━━━━━━━\n\n{survey_question}\n\n"
-
-                                for i, label in enumerate(rating_labels):
-                                    survey_text += f"*{i}* - {label}\n"
-
-                                survey_text += "\n💡 Digite o número correspondente à sua avaliação"
-
-                                logger.info(f"[SURVEY] Texto da pesquisa montado ({len(survey_text)} caracteres)")
-                                logger.info(f"[SURVEY] Preview: {survey_text[:100]}...")
-
-                                messages_to_send.append({
-                                    "text": survey_text,
-                                    "options": [],
-                                    "delay": 2000  # 2 seconds delay
-                                })
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": survey_text,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                })
-
-                                # Set survey state to wait for user response
-                                execution.survey_state = {
-                                    'waiting_response': True,
-                                    'question': survey_question,
-                                    'timestamp': datetime.now(BRASIL_TZ).isoformat()
-                                }
-                                execution.waiting_for_input = True
-
-                                logger.info(f"[SURVEY] ✅ Pesquisa ADICIONADA às mensagens!")
-                                logger.info(f"[SURVEY] Total de mensagens a enviar: {len(messages_to_send)}")
-                                logger.info(f"[SURVEY] Estado configurado: waiting_response=True")
-                                logger.info(f"[SURVEY] ========================================")
-
-                                return {
-                                    "success": True,
-                                    "messages": messages_to_send,
-                                    "requires_input": True,
-                                    "is_final": False
-                                }
-                                # </CHANGE>
-
-                            elif current_node.type == "agentes":
-                                initial_message = current_node.data.initialMessage or "🔄 Encaminhando para o operador disponível... Por favor aguarde."
-
-                                # Enviar mensagem de transferência
-                                messages_to_send.append({
-                                    "text": initial_message,
-                                    "options": []
-                                })
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": initial_message,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                })
-
-                                # Iniciar sessão de agente
-                                agent_manager.start_agent_session(user_id, current_node.id)
-
-                                # Marcar que o fluxo está com o operador humano
-                                execution.waiting_for_input = True
-                                execution.current_node_id = current_node.id
-
-                                logger.info(f"Conversa transferida para operador - Nó: {current_node.id}")
-
-                                # Return immediately - don't process next nodes
-                                return {
-                                    "success": True,
-                                    "messages": messages_to_send,
-                                    "requires_input": True,
-                                    "is_final": False,
-                                    "node_type": "agent"
-                                }
-
-                            else:
-                                execution.current_node_id = current_node.id
-                                current_node = find_next_node(workflow_id, current_node.id)
-
-                        # End of flow
-                        reset_conversation(user_id, workflow_id)
-                        return {
-                            "success": True,
-                            "messages": messages_to_send,
-                            "requires_input": False,
-                            "is_final": True,
-                            "archive_conversation": True
-                        }
-                    else:
-                        reset_conversation(user_id, workflow_id)
-                        return {
-                            "success": True,
-                            "messages": messages_to_send,
-                            "requires_input": False,
-                            "is_final": True,
-                            "archive_conversation": True
-                        }
+                    return _run_nodes(turn, find_next_node(workflow_id, current_node.id), _AFTER_AGENT_NODES)
 
                 # Continue agent conversation
-                return {
-                    "success": True,
-                    "messages": messages_to_send,
-                    "requires_input": True, # Bot is not waiting, agent is
-                    "is_final": False,
-                    "node_type": "agent"
-                }
+                return turn.wait("agent")
 
         # Se não há nó atual, começar pelo START
         if not execution.current_node_id:
-            start_node = next((n for n in nodes if n.type == "start"), None)
+            start_node = graph.start
             if not start_node:
-                return {
-                    "success": False,
-                    "messages": [{
-                        "text": "Nó de início não encontrado",
-                        "options": []
-                    }],
-                    "requires_input": False,
-                    "is_final": True
-                }
+                turn.say("Nó de início não encontrado", record=False)
+                return turn.fail()
 
             execution.current_node_id = start_node.id
             logger.info(f"Iniciando do nó START: {start_node.id}")
 
-            # Avançar automaticamente do START
-            current_node = find_next_node(workflow_id, start_node.id)
-
-            # Processar todos os nós até encontrar um que requer input ou é final
-            while current_node:
-                execution.current_node_id = current_node.id
-                logger.info(f"Processando nó: {current_node.id} ({current_node.type})")
-
-                if current_node.type == "sendMessage":
-                    # Coletar mensagem para enviar
-                    msg_text = current_node.data.message or "Mensagem não configurada"
-                    messages_to_send.append({
-                        "text": msg_text,
-                        "options": []
-                    })
-                    logger.info(f"Mensagem coletada: {msg_text[:50]}...")
-
-                    # Adicionar ao histórico
-                    execution.conversation_history.append({
-                        "role": "assistant",
-                        "content": msg_text,
-                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                    })
-
-                    # Avançar para próximo nó
-                    current_node = find_next_node(workflow_id, current_node.id)
-
-                elif current_node.type == "options":
-                    # Nó de opções - requer input do usuário
-                    msg_text = current_node.data.message or "Escolha uma opção:"
-                    options = current_node.data.options or []
-
-                    # Build the full message with numbered options
-                    if options:
-                        options_text = "\n\n" + "\n".join([f"{i+1}. {opt.get('text', '')}"for i, opt in enumerate(options)])
-                        full_message = msg_text + options_text
-                    else:
-                        full_message = msg_text
-
-                    messages_to_send.append({
-                        "text": full_message,
-                        "options": []
-                    })
-
-                    execution.conversation_history.append({
-                        "role": "assistant",
-                        "content": full_message,
-                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                    })
-
-                    execution.current_node_id = current_node.id
-                    execution.waiting_for_input = True
-                    logger.info(f"Aguardando input do usuário no nó: {current_node.id}")
-
-                    return {
-                        "success": True,
-                        "messages": messages_to_send,
-                        "requires_input": True,
-                        "is_final": False
-                    }
-
-                elif current_node.type == "agent":
-                    agent_id = current_node.data.agentId
-                    initial_message = current_node.data.initialMessage or "Olá! Como posso ajudar você?"
-
-                    if not agent_id:
-                        messages_to_send.append({
-                            "text": "Erro: Agente não configurado.",
-                            "options": []
-                        })
-                        return {
-                            "success": False,
-                            "messages": messages_to_send,
-                            "requires_input": False,
-                            "is_final": True
-                        }
-
-                    # Initialize agent conversation
-                    init_response = agent_manager.initialize_conversation(agent_id, user_id)
-
-                    if not init_response.get("success"):
-                        error_msg = init_response.get("error", "Erro ao inicializar agente")
-                        messages_to_send.append({
-                            "text": f"❌ {error_msg}",
-                            "options": []
-                        })
-                        return {
-                            "success": False,
-                            "messages": messages_to_send,
-                            "requires_input": False,
-                            "is_final": True
-                        }
-
-                    messages_to_send.append({
-                        "text": initial_message,
-                        "options": []
-                    })
-
-                    execution.conversation_history.append({
-                        "role": "assistant",
-                        "content": initial_message,
-                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                    })
-
-                    execution.waiting_for_input = True
-                    logger.info(f"Aguardando input do usuário no nó de agente: {current_node.id}")
-
-                    return {
-                        "success": True,
-                        "messages": messages_to_send,
-                        "requires_input": True,
-                        "is_final": False,
-                        "node_type": "agent"
-                    }
-
-                elif current_node.type == "agendamento":
-                    msg_text = current_node.data.message or "📅 Deseja agendar um horário?"
-                    available_slots = current_node.data.availableSlots or []
-
-                    # Filter out booked slots
-                    filtered_slots = []
-                    for slot in available_slots:
-                        if slot.get("available", False):
-                            time = slot.get("time", "")
-                            date = slot.get("date", "")
-                            if not booking_manager.is_slot_booked(time, date, workflow_id):
-                                filtered_slots.append(slot)
-
-                    if not filtered_slots:
-                        no_slots_msg = current_node.data.noSlotsMessage or "😔 Não há horários disponíveis no momento.\n\nPor favor, tente novamente mais tarde."
-                        messages_to_send.append({
-                            "text": no_slots_msg,
-                            "options": []
-                        })
-
-                        execution.conversation_history.append({
-                            "role": "assistant",
-                            "content": no_slots_msg,
-                            "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                        })
-
-                        # Move to next node
-                        current_node = find_next_node(workflow_id, current_node.id)
-                        continue
-
-                    slots_text = "\n\n━━━━━━━━━━━━━━━━━━━━\n📋 *Horários Disponíveis:*\n━━━━━━━━━━━━━━━━━━━━\n\n"
-
-                    for idx, slot in enumerate(filtered_slots, start=1):
-                        time = slot.get("time", "")
-                        date = slot.get("date", "")
-
-                        try:
-                            date_obj = datetime.strptime(date, "%Y-%m-%d")
-                            date_formatted = date_obj.strftime("%d/%m/%Y")
-                        except Exception:
-                            date_formatted = date
-
-                        slots_text += f"⏰ *{idx}.* {time} - 📅 {date_formatted}\n"
-
-                    slots_text += "\n━━━━━━━━━━━━━━━━━━━━\n\n💡 Digite o *número* do horário desejado\n❌ Digite *'cancelar'* para cancelar um agendamento"
-
-                    full_message = msg_text + slots_text
-
-                    messages_to_send.append({
-                        "text": full_message,
-                        "options": []
-                    })
-
-                    execution.conversation_history.append({
-                        "role": "assistant",
-                        "content": full_message,
-                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                    })
-
-                    execution.waiting_for_input = True
-                    logger.info(f"Aguardando resposta de agendamento no nó: {current_node.id}")
-
-                    return {
-                        "success": True,
-                        "messages": messages_to_send,
-                        "requires_input": True,
-                        "is_final": False,
-                        "node_type": "agendamento"
-                    }
-
-                elif current_node.type == "venda":
-                    intro = current_node.data.message or "Confira os itens disponíveis para venda:"
-
-                    try:
-                        available_items = _fetch_available_inventory()
-                    except Exception:
-                        logger.exception("Falha ao carregar inventário para o nó de vendas")
-                        available_items = []
-
-                    logger.info(
-                        "Nó de vendas carregado (%s): %s itens elegíveis",
-                        current_node.id,
-                        len(available_items),
-                    )
-
-                    message_lines = [intro, ""]
-
-                    if available_items:
-                        for idx, item in enumerate(available_items, start=1):
-                            price = _format_currency(item.get("unitPrice"))
-                            stock = item.get("stockQuantity", 0)
-                            message_lines.append(f"{idx}. {item.get('name', 'Item')} - {price} (estoque: {stock})")
-
-                        message_lines.append("")
-                        message_lines.append("0. Solicitar item que não está disponível")
-                        message_lines.append("Digite o número do item desejado.")
-
-                        messages_to_send.append({
-                            "text": "\n".join(message_lines),
-                            "options": [],
-                        })
-
-                        execution.current_node_id = current_node.id
-                        execution.waiting_for_input = True
-                        execution.sale_state = {
-                            "stage": "selection",
-                            "items": available_items,
-                            "selected": None,
-                        }
-
-                        return {
-                            "success": True,
-                            "messages": messages_to_send,
-                            "requires_input": True,
-                            "is_final": False,
-                            "node_type": "venda",
-                        }
-
-                    message_lines.append(
-                        "No momento não há itens em estoque. Informe o nome do item que deseja e registraremos a solicitação."
-                    )
-
-                    messages_to_send.append(
-                        {
-                            "text": "\n".join(message_lines),
-                            "options": [],
-                        }
-                    )
-
-                    execution.current_node_id = current_node.id
-                    execution.waiting_for_input = True
-                    execution.sale_state = {
-                        "stage": "customName",
-                        "items": [],
-                        "selected": None,
-                    }
-
-                    return {
-                        "success": True,
-                        "messages": messages_to_send,
-                        "requires_input": True,
-                        "is_final": False,
-                        "node_type": "venda",
-                    }
-
-                elif current_node.type == "finalizar":
-                    logger.info(f"[SURVEY] ========================================")
-                    logger.info(f"[SURVEY] NÓ FINALIZAR ATINGIDO: {current_node.id}")
-                    logger.info(f"[SURVEY] ========================================")
-
-                    msg_text = current_node.data.finalMessage or current_node.data.message or ""
-
-                    if msg_text.strip():
-                        logger.info(f"[SURVEY] Adicionando mensagem final: {msg_text[:50]}...")
-                        messages_to_send.append({
-                            "text": msg_text,
-                            "options": []
-                        })
-
-                        execution.conversation_history.append({
-                            "role": "assistant",
-                            "content": msg_text,
-                            "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                        })
-                    else:
-                        logger.info(f"[SURVEY] Nenhuma mensagem final configurada")
-
-                    # SEMPRE enviar pesquisa de satisfação
-                    logger.info(f"[SURVEY] Preparando pesquisa de satisfação...")
-                    logger.info(f"[SURVEY] enableSatisfactionSurvey: {current_node.data.enableSatisfactionSurvey}")
-
-                    # Get survey configuration or use defaults
-                    survey_question = current_node.data.surveyQuestion or "Olá, diga de 0 a 5, qual é a nota do atendimento?"
-                    rating_labels = current_node.data.surveyRatingLabels or [
-                        "Péssimo",
-                        "Ruim",
-                        "Regular",
-                        "Bom",
-                        "Excelente",
-                        "Extremamente Satisfeito"
-                    ]
-
-                    logger.info(f"[SURVEY] Pergunta: {survey_question}")
-                    logger.info(f"[SURVEY] Labels configurados: {len(rating_labels)} labels")
-
-                    # Build survey message with better formatting
-                    survey_text = f"\n\n━━━━━━━━━━━━━━━━━━━━\n📊 Pesquisa de Satisfação\n━━━━━━━━━━━━━━━━━━━━\n\n{survey_question}\n\n"
-
-                    for i, label in enumerate(rating_labels):
-                        survey_text += f"{i} - {label}\n"
-
-                    survey_text += "\n💡 Digite o número correspondente à sua avaliação"
-
-                    logger.info(f"[SURVEY] Texto da pesquisa montado ({len(survey_text)} caracteres)")
-                    logger.info(f"[SURVEY] Preview: {survey_text[:100]}...")
-
-                    messages_to_send.append({
-                        "text": survey_text,
-                        "options": [],
-                        "delay": 2000  # 2 seconds delay
-                    })
-
-                    execution.conversation_history.append({
-                        "role": "assistant",
-                        "content": survey_text,
-                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                    })
-
-                    # Set survey state to wait for user response
-                    execution.survey_state = {
-                        'waiting_response': True,
-                        'question': survey_question,
-                        'timestamp': datetime.now(BRASIL_TZ).isoformat()
-                    }
-                    execution.waiting_for_input = True
-
-                    logger.info(f"[SURVEY] ✅ Pesquisa ADICIONADA às mensagens!")
-                    logger.info(f"[SURVEY] Total de mensagens a enviar: {len(messages_to_send)}")
-                    logger.info(f"[SURVEY] Estado configurado: waiting_response=True")
-                    logger.info(f"[SURVEY] ========================================")
-
-                    return {
-                        "success": True,
-                        "messages": messages_to_send,
-                        "requires_input": True,
-                        "is_final": False
-                    }
-                    # </CHANGE>
-
-                # START: Code added from updates
-                elif current_node.type == "agentes":
-                    initial_message = current_node.data.initialMessage or "🔄 Encaminhando para o operador disponível... Por favor aguarde."
-
-                    # Enviar mensagem de transferência
-                    messages_to_send.append({
-                        "text": initial_message,
-                        "options": []
-                    })
-
-                    execution.conversation_history.append({
-                        "role": "assistant",
-                        "content": initial_message,
-                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                    })
-
-                    # Iniciar sessão de agente
-                    agent_manager.start_agent_session(user_id, current_node.id)
-
-                    # Marcar que o fluxo está com o operador humano
-                    execution.waiting_for_input = True
-                    execution.current_node_id = current_node.id
-
-                    logger.info(f"Conversa transferida para operador - Nó: {current_node.id}")
-
-                    # Return immediately - don't process next nodes
-                    return {
-                        "success": True,
-                        "messages": messages_to_send,
-                        "requires_input": True,
-                        "is_final": False,
-                        "node_type": "agent"
-                    }
-                # END: Code added from updates
-
-                else:
-                    # Outros tipos de nó - avançar automaticamente
-                    logger.info(f"Pulando nó do tipo: {current_node.type}")
-                    current_node = find_next_node(workflow_id, current_node.id)
-
-            # Se chegou aqui, não há mais nós - finalizar
-            logger.info(f"Fim do fluxo - sem mais nós")
-            reset_conversation(user_id, workflow_id)
-
-            return {
-                "success": True,
-                "messages": messages_to_send,
-                "requires_input": False,
-                "is_final": True,
-                "archive_conversation": True
-            }
+            return _run_nodes(turn, find_next_node(workflow_id, start_node.id), _START_NODES)
 
         # Se estamos aguardando input do usuário
         if execution.waiting_for_input:
-            current_node = next((n for n in nodes if n.id == execution.current_node_id), None)
+            current_node = graph.nodes.get(execution.current_node_id)
             if not current_node:
-                return {
-                    "success": False,
-                    "messages": [{
-                        "text": "Nó atual não encontrado",
-                        "options": []
-                    }],
-                    "requires_input": False,
-                    "is_final": True
-                }
+                turn.say("Nó atual não encontrado", record=False)
+                return turn.fail()
 
             # Prioridade: se estamos aguardando código ou motivo de cancelamento, tratar antes de qualquer outra lógica
             cancellation_state = getattr(execution, "cancellation_state", {}) or {}
@@ -1201,209 +945,49 @@ def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[s
                         f"Por favor, descreva com detalhes o motivo do cancelamento:"
                     )
 
-                    messages_to_send.append({
-                        "text": reason_request_msg,
-                        "options": []
-                    })
-
-                    execution.conversation_history.append({
-                        "role": "assistant",
-                        "content": reason_request_msg,
-                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                    })
-
-                    return {
-                        "success": True,
-                        "messages": messages_to_send,
-                        "requires_input": True,
-                        "is_final": False,
-                        "node_type": "agendamento_cancellation"
-                    }
+                    turn.say(reason_request_msg)
+                    return turn.wait("agendamento_cancellation")
                 else:
-                    error_msg = "❌ Código inválido ou agendamento não encontrado.\n\nPor favor, verifique o código e tente novamente:"
-
-                    return {
-                        "success": True,
-                        "messages": [{
-                            "text": error_msg,
-                            "options": []
-                        }],
-                        "requires_input": True,
-                        "is_final": False,
-                        "node_type": "agendamento_cancellation"
-                    }
+                    turn.say(
+                        "❌ Código inválido ou agendamento não encontrado.\n\nPor favor, verifique o código e tente novamente:",
+                        record=False,
+                    )
+                    return turn.wait("agendamento_cancellation")
 
             if cancellation_state.get('waiting_reason'):
                 reason = message.strip()
 
                 if len(reason) < 10:
-                    return {
-                        "success": True,
-                        "messages": [{
-                            "text": "Por favor, forneça uma descrição mais detalhada do motivo do cancelamento (mínimo 10 caracteres):",
-                            "options": []
-                        }],
-                        "requires_input": True,
-                        "is_final": False,
-                        "node_type": "agendamento_cancellation"
-                    }
+                    turn.say(
+                        "Por favor, forneça uma descrição mais detalhada do motivo do cancelamento (mínimo 10 caracteres):",
+                        record=False,
+                    )
+                    return turn.wait("agendamento_cancellation")
 
                 # Cancel the booking
                 code = execution.cancellation_state['code']
                 success = booking_manager.cancel_booking(code, user_id, reason)
 
                 if success:
-                    cancellation_msg = (
+                    turn.say(
                         "✅ Cancelamento concluído com sucesso!\n\n"
                         "Seu agendamento foi cancelado e o horário está novamente disponível."
                     )
 
-                    messages_to_send.append({
-                        "text": cancellation_msg,
-                        "options": []
-                    })
-
-                    execution.conversation_history.append({
-                        "role": "assistant",
-                        "content": cancellation_msg,
-                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                    })
-
                     execution.waiting_for_input = False
                     execution.cancellation_state = {}
                     execution.scheduling_state = {}
 
-                    # Move to next node
-                    next_node = find_next_node(workflow_id, current_node.id)
-                    if next_node:
-                        execution.current_node_id = next_node.id
-                        current_node = next_node
-                        while current_node:
-                            logger.info(f"Processando nó: {current_node.id} ({current_node.type})")
-
-                            if current_node.type == "sendMessage":
-                                msg_text = current_node.data.message or "Mensagem não configurada"
-                                messages_to_send.append({
-                                    "text": msg_text,
-                                    "options": []
-                                })
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": msg_text,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                })
-
-                                execution.current_node_id = current_node.id
-                                current_node = find_next_node(workflow_id, current_node.id)
-                                continue
-
-                            if current_node.type == "ai":
-                                ai_response = current_node.data.aiResponse or ""
-                                messages_to_send.append({
-                                    "text": ai_response,
-                                    "options": []
-                                })
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": ai_response,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                })
-
-                                execution.current_node_id = current_node.id
-                                current_node = find_next_node(workflow_id, current_node.id)
-                                continue
-
-                            if current_node.type == "whatsappContact":
-                                contact_data = current_node.data
-                                whatsapp_message = contact_data.contactMessage or ""
-                                whatsapp_number = contact_data.contactNumber or ""
-
-                                if whatsapp_message:
-                                    messages_to_send.append({
-                                        "text": whatsapp_message,
-                                        "options": []
-                                    })
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": whatsapp_message,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                    })
-
-                                if whatsapp_number:
-                                    contact_message = f"Deseja entrar em contato pelo WhatsApp? {whatsapp_number}"
-                                    messages_to_send.append({
-                                        "text": contact_message,
-                                        "options": []
-                                    })
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": contact_message,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                    })
-
-                                execution.current_node_id = current_node.id
-                                current_node = find_next_node(workflow_id, current_node.id)
-                                continue
-
-                            if current_node.type == "media":
-                                media_message = current_node.data.url or ""
-                                messages_to_send.append({
-                                    "text": media_message,
-                                    "options": []
-                                })
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": media_message,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                })
-
-                                execution.current_node_id = current_node.id
-                                current_node = find_next_node(workflow_id, current_node.id)
-                                continue
-
-                            # Stop processing if node type not handled
-                            break
-
-                    reset_conversation(user_id, workflow_id)
-                    return {
-                        "success": True,
-                        "messages": messages_to_send,
-                        "requires_input": False,
-                        "is_final": True,
-                        "archive_conversation": True
-                    }
+                    return _run_nodes(turn, find_next_node(workflow_id, current_node.id), _AFTER_CANCELLATION_NODES)
 
-                reset_conversation(user_id, workflow_id)
-                return {
-                    "success": True,
-                    "messages": messages_to_send,
-                    "requires_input": False,
-                    "is_final": True,
-                    "archive_conversation": True
-                }
+                return turn.finish()
 
             if current_node.type == "agendamento":
                 user_input = message.strip().lower()
 
                 if user_input in ["cancelar", "cancel", "não", "nao", "no", "n"]:
                     # Ask for cancellation code
-                    code_request_msg = "🔐 Para cancelar seu agendamento, por favor informe o código de confirmação que você recebeu:"
-
-                    messages_to_send.append({
-                        "text": code_request_msg,
-                        "options": []
-                    })
-
-                    execution.conversation_history.append({
-                        "role": "assistant",
-                        "content": code_request_msg,
-                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                    })
+                    turn.say("🔐 Para cancelar seu agendamento, por favor informe o código de confirmação que você recebeu:")
 
                     # Set state to wait for cancellation code
                     execution.waiting_for_input = True
@@ -1412,25 +996,13 @@ def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[s
                         execution.cancellation_state = {}
                     execution.cancellation_state['waiting_code'] = True
 
-                    return {
-                        "success": True,
-                        "messages": messages_to_send,
-                        "requires_input": True,
-                        "is_final": False,
-                        "node_type": "agendamento_cancellation"
-                    }
+                    return turn.wait("agendamento_cancellation")
 
                 scheduling_state = getattr(execution, "scheduling_state", {}) or {}
                 filtered_slots = scheduling_state.get("slots", [])
 
                 if not filtered_slots:
-                    available_slots = current_node.data.availableSlots or []
-                    for slot in available_slots:
-                        if slot.get("available", False):
-                            time = slot.get("time", "")
-                            date = slot.get("date", "")
-                            if not booking_manager.is_slot_booked(time, date, workflow_id):
-                                filtered_slots.append(slot)
+                    filtered_slots = _open_slots(current_node, workflow_id)
 
                     execution.scheduling_state = {
                         "slots": filtered_slots,
@@ -1438,50 +1010,8 @@ def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[s
                     }
 
                 if not filtered_slots:
-                    no_slots_msg = current_node.data.noSlotsMessage or "😔 Não há horários disponíveis no momento.\n\nPor favor, tente novamente mais tarde."
-
-                    messages_to_send.append({"text": no_slots_msg, "options": []})
-                    execution.conversation_history.append({
-                        "role": "assistant",
-                        "content": no_slots_msg,
-                        "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                    })
-
-                    execution.waiting_for_input = False
-                    execution.scheduling_state = {}
-
-                    next_node = find_next_node(workflow_id, current_node.id)
-                    if next_node:
-                        execution.current_node_id = next_node.id
-                        current_node = next_node
-
-                    reset_conversation(user_id, workflow_id)
-                    return {
-                        "success": True,
-                        "messages": messages_to_send,
-                        "requires_input": False,
-                        "is_final": True,
-                        "archive_conversation": True,
-                    }
-
-                def _format_slots(slots: List[Dict[str, Any]]) -> str:
-                    slots_text = "\n\n━━━━━━━━━━━━━━━━━━━━\n📋 *Horários Disponíveis:*\n━━━━━━━━━━━━━━━━━━━━\n\n"
-
-                    for idx, slot in enumerate(slots, start=1):
-                        time = slot.get("time", "")
-                        date = slot.get("date", "")
-
-                        try:
-                            date_obj = datetime.strptime(date, "%Y-%m-%d")
-                            date_formatted = date_obj.strftime("%d/%m/%Y")
-                        except Exception:
-                            date_formatted = date
-
-                        slots_text += f"⏰ *{idx}.* {time} - 📅 {date_formatted}\n"
-
-                    slots_text += "\n━━━━━━━━━━━━━━━━━━━━\n\n💡 Digite o *número* do horário desejado\n❌ Digite *'cancelar'* para cancelar um agendamento"
-                    base_message = current_node.data.message or "📅 Deseja agendar um horário?"
-                    return base_message + slots_text
+                    turn.say(current_node.data.noSlotsMessage or "😔 Não há horários disponíveis no momento.\n\nPor favor, tente novamente mais tarde.")
+                    return turn.finish()
 
                 import re
 
@@ -1506,200 +1036,26 @@ def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[s
                         confirmation_msg = confirmation_msg.replace("{time}", slot.get("time", ""))
                         confirmation_msg = confirmation_msg.replace("{date}", slot.get("date", ""))
 
-                        messages_to_send.append({"text": confirmation_msg, "options": []})
-                        execution.conversation_history.append({
-                            "role": "assistant",
-                            "content": confirmation_msg,
-                            "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                        })
+                        turn.say(confirmation_msg)
 
                         execution.waiting_for_input = False
                         execution.scheduling_state = {}
 
-                        next_node = find_next_node(workflow_id, current_node.id)
-                        if next_node:
-                            execution.current_node_id = next_node.id
-                            current_node = next_node
-                            while current_node:
-                                logger.info(f"Processando nó: {current_node.id} ({current_node.type})")
-
-                                if current_node.type == "sendMessage":
-                                    msg_text = current_node.data.message or "Mensagem não configurada"
-                                    messages_to_send.append({"text": msg_text, "options": []})
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": msg_text,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                                    })
-
-                                    execution.current_node_id = current_node.id
-                                    current_node = find_next_node(workflow_id, current_node.id)
-
-                                elif current_node.type == "options":
-                                    msg_text = current_node.data.message or "Escolha uma opção:"
-                                    options = current_node.data.options or []
-
-                                    if options:
-                                        options_text = "\n\n" + "\n".join([f"{i+1}. {opt.get('text', '')}"for i, opt in enumerate(options)])
-                                        full_message = msg_text + options_text
-                                    else:
-                                        full_message = msg_text
-
-                                    messages_to_send.append({"text": full_message, "options": []})
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": full_message,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                                    })
-
-                                    execution.current_node_id = current_node.id
-                                    execution.waiting_for_input = True
-
-                                    return {
-                                        "success": True,
-                                        "messages": messages_to_send,
-                                        "requires_input": True,
-                                        "is_final": False,
-                                    }
-
-                                elif current_node.type == "finalizar":
-                                    logger.info(f"[SURVEY] ========================================")
-                                    logger.info(f"[SURVEY] NÓ FINALIZAR ATINGIDO (APÓS AGENDAMENTO): {current_node.id}")
-                                    logger.info(f"[SURVEY] ========================================")
-
-                                    msg_text = current_node.data.finalMessage or current_node.data.message or ""
-
-                                    if msg_text.strip():
-                                        messages_to_send.append({"text": msg_text, "options": []})
-
-                                        execution.conversation_history.append({
-                                            "role": "assistant",
-                                            "content": msg_text,
-                                            "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                                        })
-
-                                    survey_question = current_node.data.surveyQuestion or "Olá, diga de 0 a 5, qual é a nota do atendimento?"
-                                    rating_labels = current_node.data.surveyRatingLabels or [
-                                        "Péssimo",
-                                        "Ruim",
-                                        "Regular",
-                                        "Bom",
-                                        "Excelente",
-                                        "Extremamente Satisfeito",
-                                    ]
-
-                                    survey_text = f"\n\n━━━━━━━━━━━━━━━━━━━━\n📊 Pesquisa de Satisfação\n━━━━━━━━━━━━━━━━━━━━\n\n{survey_question}\n\n"
-
-                                    for i, label in enumerate(rating_labels):
-                                        survey_text += f"{i} - {label}\n"
-
-                                    survey_text += "\n💡 Digite o número correspondente à sua avaliação"
-
-                                    messages_to_send.append({"text": survey_text, "options": [], "delay": 2000})
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": survey_text,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                                    })
-
-                                    execution.survey_state = {
-                                        'waiting_response': True,
-                                        'question': survey_question,
-                                        'timestamp': datetime.now(BRASIL_TZ).isoformat(),
-                                    }
-                                    execution.waiting_for_input = True
-
-                                    return {
-                                        "success": True,
-                                        "messages": messages_to_send,
-                                        "requires_input": True,
-                                        "is_final": False,
-                                    }
-
-                                elif current_node.type == "agentes":
-                                    initial_message = current_node.data.initialMessage or "🔄 Encaminhando para o operador disponível... Por favor aguarde."
-
-                                    messages_to_send.append({"text": initial_message, "options": []})
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": initial_message,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                                    })
-
-                                    agent_manager.start_agent_session(user_id, current_node.id)
-
-                                    execution.waiting_for_input = True
-                                    execution.current_node_id = current_node.id
-
-                                    return {
-                                        "success": True,
-                                        "messages": messages_to_send,
-                                        "requires_input": True,
-                                        "is_final": False,
-                                        "node_type": "agent",
-                                    }
-
-                                elif current_node.type == "venda":
-                                    # Preserve sale flow behaviour by reusing existing handler on next user message
-                                    execution.current_node_id = current_node.id
-                                    execution.waiting_for_input = True
-                                    return {
-                                        "success": True,
-                                        "messages": messages_to_send,
-                                        "requires_input": True,
-                                        "is_final": False,
-                                        "node_type": "venda",
-                                    }
-
-                                else:
-                                    execution.current_node_id = current_node.id
-                                    current_node = find_next_node(workflow_id, current_node.id)
-
-                            reset_conversation(user_id, workflow_id)
-                            return {
-                                "success": True,
-                                "messages": messages_to_send,
-                                "requires_input": False,
-                                "is_final": True,
-                                "archive_conversation": True,
-                            }
-
-                        reset_conversation(user_id, workflow_id)
-                        return {
-                            "success": True,
-                            "messages": messages_to_send,
-                            "requires_input": False,
-                            "is_final": True,
-                            "archive_conversation": True,
-                        }
+                        return _run_nodes(turn, find_next_node(workflow_id, current_node.id), _AFTER_BOOKING_NODES)
 
-                    retry_message = _format_slots(filtered_slots)
-                    return {
-                        "success": True,
-                        "messages": [{
-                            "text": f"❌ Opção inválida. Escolha um número entre 1 e {len(filtered_slots)}.\n" + retry_message,
-                            "options": [],
-                        }],
-                        "requires_input": True,
-                        "is_final": False,
-                        "node_type": "agendamento",
-                    }
+                    turn.say(
+                        f"❌ Opção inválida. Escolha um número entre 1 e {len(filtered_slots)}.\n"
+                        + _format_slots(current_node, filtered_slots),
+                        record=False,
+                    )
+                    return turn.wait("agendamento")
 
-                retry_message = _format_slots(filtered_slots)
-                return {
-                    "success": True,
-                    "messages": [{
-                        "text": "❌ Opção inválida.\n\nPor favor, digite o número do horário desejado ou 'cancelar' para cancelar.\n" + retry_message,
-                        "options": [],
-                    }],
-                    "requires_input": True,
-                    "is_final": False,
-                    "node_type": "agendamento",
-                }
+                turn.say(
+                    "❌ Opção inválida.\n\nPor favor, digite o número do horário desejado ou 'cancelar' para cancelar.\n"
+                    + _format_slots(current_node, filtered_slots),
+                    record=False,
+                )
+                return turn.wait("agendamento")
 
             if current_node.type == "venda":
                 sale_state = getattr(execution, "sale_state", {}) or {}
@@ -1709,16 +1065,8 @@ def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[s
 
                 if stage == "selection":
                     if not user_input.isdigit():
-                        return {
-                            "success": True,
-                            "messages": [{
-                                "text": "Digite apenas o número do item desejado ou 0 para solicitar um item ausente.",
-                                "options": [],
-                            }],
-                            "requires_input": True,
-                            "is_final": False,
-                            "node_type": "venda",
-                        }
+                        turn.say("Digite apenas o número do item desejado ou 0 para solicitar um item ausente.", record=False)
+                        return turn.wait("venda")
 
                     option = int(user_input)
 
@@ -1729,16 +1077,8 @@ def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[s
                             "selected": None,
                         }
 
-                        return {
-                            "success": True,
-                            "messages": [{
-                                "text": "Você deseja algum item que não está disponível? Informe o nome para registrarmos a solicitação.",
-                                "options": [],
-                            }],
-                            "requires_input": True,
-                            "is_final": False,
-                            "node_type": "venda",
-                        }
+                        turn.say("Você deseja algum item que não está disponível? Informe o nome para registrarmos a solicitação.", record=False)
+                        return turn.wait("venda")
 
                     if 1 <= option <= len(sale_items):
                         selected = sale_items[option - 1]
@@ -1749,16 +1089,8 @@ def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[s
                             stock = 0
 
                         if stock <= 0:
-                            return {
-                                "success": True,
-                                "messages": [{
-                                    "text": "Este item está sem estoque no momento. Escolha outro número ou digite 0 para solicitar o item.",
-                                    "options": [],
-                                }],
-                                "requires_input": True,
-                                "is_final": False,
-                                "node_type": "venda",
-                            }
+                            turn.say("Este item está sem estoque no momento. Escolha outro número ou digite 0 para solicitar o item.", record=False)
+                            return turn.wait("venda")
 
                         execution.sale_state = {
                             "stage": "phone",
@@ -1772,37 +1104,17 @@ def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[s
                             "O pagamento e a retirada devem ser feitos na loja em até 3 dias."
                         )
 
-                        return {
-                            "success": True,
-                            "messages": [
-                                {"text": summary, "options": []},
-                                {"text": prompt, "options": []},
-                            ],
-                            "requires_input": True,
-                            "is_final": False,
-                            "node_type": "venda",
-                        }
+                        turn.say(summary, record=False)
+                        turn.say(prompt, record=False)
+                        return turn.wait("venda")
 
-                    return {
-                        "success": True,
-                        "messages": [{
-                            "text": "Opção inválida. Digite um número listado acima ou 0 para solicitar um item não disponível.",
-                            "options": [],
-                        }],
-                        "requires_input": True,
-                        "is_final": False,
-                        "node_type": "venda",
-                    }
+                    turn.say("Opção inválida. Digite um número listado acima ou 0 para solicitar um item não disponível.", record=False)
+                    return turn.wait("venda")
 
                 if stage == "customName":
                     if not user_input:
-                        return {
-                            "success": True,
-                            "messages": [{"text": "Informe o nome do item desejado para registrar a solicitação.", "options": []}],
-                            "requires_input": True,
-                            "is_final": False,
-                            "node_type": "venda",
-                        }
+                        turn.say("Informe o nome do item desejado para registrar a solicitação.", record=False)
+                        return turn.wait("venda")
 
                     try:
                         request = _register_sale_request(
@@ -1815,13 +1127,8 @@ def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[s
                         )
                     except Exception:
                         logger.exception("Falha ao registrar solicitação de item")
-                        return {
-                            "success": True,
-                            "messages": [{"text": "Não foi possível registrar a solicitação agora. Tente novamente em instantes.", "options": []}],
-                            "requires_input": True,
-                            "is_final": False,
-                            "node_type": "venda",
-                        }
+                        turn.say("Não foi possível registrar a solicitação agora. Tente novamente em instantes.", record=False)
+                        return turn.wait("venda")
 
                     contact_by = request.get("contactBy", "")
                     message = "Adicionado o item desejado como solicitação. Entraremos em contato em até 7 dias referente o item."
@@ -1832,308 +1139,12 @@ def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[s
                             "sobre o item."
                         )
 
-                    messages_to_send.append({"text": message, "options": []})
-
-                    execution.conversation_history.append({
-                        "role": "assistant",
-                        "content": message,
-                        "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                    })
+                    turn.say(message)
 
                     execution.waiting_for_input = False
                     execution.sale_state = {}
 
-                    next_node = find_next_node(workflow_id, current_node.id)
-                    if next_node:
-                        execution.current_node_id = next_node.id
-                        current_node = next_node
-                        # Continue processing chain from next node
-                        while current_node:
-                            logger.info(f"Processando nó: {current_node.id} ({current_node.type})")
-
-                            if current_node.type == "sendMessage":
-                                msg_text = current_node.data.message or "Mensagem não configurada"
-                                messages_to_send.append({"text": msg_text, "options": []})
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": msg_text,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                                })
-
-                                execution.current_node_id = current_node.id
-                                current_node = find_next_node(workflow_id, current_node.id)
-                                continue
-
-                            if current_node.type == "options":
-                                msg_text = current_node.data.message or "Escolha uma opção:"
-                                options = current_node.data.options or []
-
-                                if options:
-                                    options_text = "\n\n" + "\n".join([
-                                        f"{i+1}. {opt.get('text', '')}" for i, opt in enumerate(options)
-                                    ])
-                                    full_message = msg_text + options_text
-                                else:
-                                    full_message = msg_text
-
-                                messages_to_send.append({"text": full_message, "options": []})
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": full_message,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                                })
-
-                                execution.current_node_id = current_node.id
-                                execution.waiting_for_input = True
-
-                                return {
-                                    "success": True,
-                                    "messages": messages_to_send,
-                                    "requires_input": True,
-                                    "is_final": False,
-                                    "node_type": "options",
-                                }
-
-                            if current_node.type == "venda":
-                                intro = current_node.data.message or "Confira os itens disponíveis para venda:"
-
-                                try:
-                                    available_items = _fetch_available_inventory()
-                                except Exception:
-                                    logger.exception("Falha ao carregar inventário para o nó de vendas")
-                                    available_items = []
-
-                                message_lines = [intro, ""]
-
-                                if available_items:
-                                    for idx, item in enumerate(available_items, start=1):
-                                        price = _format_currency(item.get("unitPrice"))
-                                        stock = item.get("stockQuantity", 0)
-                                        message_lines.append(f"{idx}. {item.get('name', 'Item')} - {price} (estoque: {stock})")
-
-                                    message_lines.append("")
-                                    message_lines.append("0. Solicitar item que não está disponível")
-                                    message_lines.append("Digite o número do item desejado.")
-
-                                    messages_to_send.append({
-                                        "text": "\n".join(message_lines),
-                                        "options": [],
-                                    })
-
-                                    execution.current_node_id = current_node.id
-                                    execution.waiting_for_input = True
-                                    execution.sale_state = {
-                                        "stage": "selection",
-                                        "items": available_items,
-                                        "selected": None,
-                                    }
-
-                                    return {
-                                        "success": True,
-                                        "messages": messages_to_send,
-                                        "requires_input": True,
-                                        "is_final": False,
-                                        "node_type": "venda",
-                                    }
-
-                                message_lines.append(
-                                    "No momento não há itens em estoque. Informe o nome do item que deseja e registraremos a solicitação."
-                                )
-
-                                messages_to_send.append({
-                                    "text": "\n".join(message_lines),
-                                    "options": [],
-                                })
-
-                                execution.current_node_id = current_node.id
-                                execution.waiting_for_input = True
-                                execution.sale_state = {
-                                    "stage": "customName",
-                                    "items": [],
-                                    "selected": None,
-                                }
-
-                                return {
-                                    "success": True,
-                                    "messages": messages_to_send,
-                                    "requires_input": True,
-                                    "is_final": False,
-                                    "node_type": "venda",
-                                }
-                            # </CHANGE>
-
-                            if current_node.type == "agentes":
-                                initial_message = current_node.data.initialMessage or "🔄 Encaminhando para o operador disponível... Por favor aguarde."
-
-                                messages_to_send.append({
-                                    "text": initial_message,
-                                    "options": []
-                                })
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": initial_message,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                })
-
-                                agent_manager.start_agent_session(user_id, current_node.id)
-
-                                execution.waiting_for_input = True
-                                execution.current_node_id = current_node.id
-
-                                return {
-                                    "success": True,
-                                    "messages": messages_to_send,
-                                    "requires_input": True,
-                                    "is_final": False,
-                                    "node_type": "agent"
-                                }
-                            # </CHANGE>
-
-                            if current_node.type == "agendamento":
-                                msg_text = current_node.data.message or "📅 Deseja agendar um horário?"
-                                available_slots = current_node.data.availableSlots or []
-
-                                filtered_slots = []
-                                for slot in available_slots:
-                                    if slot.get("available", False):
-                                        time = slot.get("time", "")
-                                        date = slot.get("date", "")
-                                        if not booking_manager.is_slot_booked(time, date, workflow_id):
-                                            filtered_slots.append(slot)
-
-                                if not filtered_slots:
-                                    no_slots_msg = current_node.data.noSlotsMessage or "😔 Não há horários disponíveis no momento.\n\nPor favor, tente novamente mais tarde."
-                                    messages_to_send.append({"text": no_slots_msg, "options": []})
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": no_slots_msg,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                                    })
-
-                                    execution.current_node_id = current_node.id
-                                    current_node = find_next_node(workflow_id, current_node.id)
-                                    continue
-
-                                slots_text = "\n\n━━━━━━━━━━━━━━━━━━━━\n📋 *Horários Disponíveis:*\n━━━━━━━━━━━━━━━━━━━━\n\n"
-
-                                for idx, slot in enumerate(filtered_slots, start=1):
-                                    time = slot.get("time", "")
-                                    date = slot.get("date", "")
-
-                                    try:
-                                        date_obj = datetime.strptime(date, "%Y-%m-%d")
-                                        date_formatted = date_obj.strftime("%d/%m/%Y")
-                                    except Exception:
-                                        date_formatted = date
-
-                                    slots_text += f"⏰ *{idx}.* {time} - 📅 {date_formatted}\n"
-
-                                slots_text += "\n━━━━━━━━━━━━━━━━━━━━\n\n💡 Digite o *número* do horário desejado\n❌ Digite *'cancelar'* para cancelar um agendamento"
-
-                                full_message = msg_text + slots_text
-
-                                messages_to_send.append({"text": full_message, "options": []})
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": full_message,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                                })
-
-                                execution.current_node_id = current_node.id
-                                execution.waiting_for_input = True
-                                execution.scheduling_state = {
-                                    "slots": filtered_slots,
-                                    "node_id": current_node.id,
-                                }
-
-                                return {
-                                    "success": True,
-                                    "messages": messages_to_send,
-                                    "requires_input": True,
-                                    "is_final": False,
-                                    "node_type": "agendamento",
-                                }
-
-                            if current_node.type == "finalizar":
-                                logger.info(f"[SURVEY] ========================================")
-                                logger.info(f"[SURVEY] NÓ FINALIZAR ATINGIDO (APÓS VENDAS): {current_node.id}")
-                                logger.info(f"[SURVEY] ========================================")
-
-                                msg_text = current_node.data.finalMessage or current_node.data.message or ""
-
-                                if msg_text.strip():
-                                    messages_to_send.append({"text": msg_text, "options": []})
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": msg_text,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                                    })
-
-                                survey_question = current_node.data.surveyQuestion or "Olá, diga de 0 a 5, qual é a nota do atendimento?"
-                                rating_labels = current_node.data.surveyRatingLabels or [
-                                    "Péssimo",
-                                    "Ruim",
-                                    "Regular",
-                                    "Bom",
-                                    "Excelente",
-                                    "Extremamente Satisfeito",
-                                ]
-
-                                survey_text = f"\n\n━━━━━━━━━━━━━━━━━━━━\n📊 *Pesquisa de Satisfação*\n━━━━━━━━━━━━━━━━━━━━\n\n{survey_question}\n\n"
-
-                                for i, label in enumerate(rating_labels):
-                                    survey_text += f"*{i}* - {label}\n"
-
-                                survey_text += "\n💡 Digite o número correspondente à sua avaliação"
-
-                                messages_to_send.append({"text": survey_text, "options": [], "delay": 2000})
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": survey_text,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                                })
-
-                                execution.survey_state = {
-                                    "waiting_response": True,
-                                    "question": survey_question,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                                }
-                                execution.waiting_for_input = True
-
-                                return {
-                                    "success": True,
-                                    "messages": messages_to_send,
-                                    "requires_input": True,
-                                    "is_final": False,
-                                }
-
-                            execution.current_node_id = current_node.id
-                            current_node = find_next_node(workflow_id, current_node.id)
-
-                        reset_conversation(user_id, workflow_id)
-                        return {
-                            "success": True,
-                            "messages": messages_to_send,
-                            "requires_input": False,
-                            "is_final": True,
-                            "archive_conversation": True,
-                        }
-
-                    reset_conversation(user_id, workflow_id)
-                    return {
-                        "success": True,
-                        "messages": messages_to_send,
-                        "requires_input": False,
-                        "is_final": True,
-                        "archive_conversation": True,
-                    }
+                    return _run_nodes(turn, find_next_node(workflow_id, current_node.id), _AFTER_SALE_REQUEST_NODES)
 
                 if stage == "phone":
                     selected = sale_state.get("selected", {})
@@ -2154,13 +1165,8 @@ def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[s
                     _register_sale_transaction(item=selected, customer_contact=contact)
                 except Exception:
                     logger.exception("Falha ao registrar pedido de estoque")
-                    return {
-                        "success": True,
-                        "messages": [{"text": "Não foi possível registrar o pedido agora. Tente novamente em instantes.", "options": []}],
-                        "requires_input": True,
-                        "is_final": False,
-                        "node_type": "venda",
-                    }
+                    turn.say("Não foi possível registrar o pedido agora. Tente novamente em instantes.", record=False)
+                    return turn.wait("venda")
 
                 deadline = request.get("pickupDeadline", "")
                 confirmation = (
@@ -2173,904 +1179,12 @@ def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[s
 
                 confirmation += " ou cancelaremos o pedido. Estaremos aguardando a retirada!"
 
-                messages_to_send.append({"text": confirmation, "options": []})
-
-                execution.conversation_history.append({
-                    "role": "assistant",
-                    "content": confirmation,
-                    "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                })
+                turn.say(confirmation)
 
                 execution.waiting_for_input = False
                 execution.sale_state = {}
 
-                next_node = find_next_node(workflow_id, current_node.id)
-                if next_node:
-                    execution.current_node_id = next_node.id
-                    current_node = next_node
-
-                    while current_node:
-                        logger.info(f"Processando nó: {current_node.id} ({current_node.type})")
-
-                        if current_node.type == "sendMessage":
-                            msg_text = current_node.data.message or "Mensagem não configurada"
-                            messages_to_send.append({"text": msg_text, "options": []})
-
-                            execution.conversation_history.append({
-                                "role": "assistant",
-                                "content": msg_text,
-                                "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                            })
-
-                            execution.current_node_id = current_node.id
-                            current_node = find_next_node(workflow_id, current_node.id)
-                            continue
-
-                        if current_node.type == "options":
-                            msg_text = current_node.data.message or "Escolha uma opção:"
-                            options = current_node.data.options or []
-
-                            if options:
-                                options_text = "\n\n" + "\n".join([
-                                    f"{i+1}. {opt.get('text', '')}" for i, opt in enumerate(options)
-                                ])
-                                full_message = msg_text + options_text
-                            else:
-                                full_message = msg_text
-
-                            messages_to_send.append({"text": full_message, "options": []})
-
-                            execution.conversation_history.append({
-                                "role": "assistant",
-                                "content": full_message,
-                                "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                            })
-
-                            execution.current_node_id = current_node.id
-                            execution.waiting_for_input = True
-
-                            return {
-                                "success": True,
-                                "messages": messages_to_send,
-                                "requires_input": True,
-                                "is_final": False,
-                                "node_type": "options",
-                            }
-
-                        if current_node.type == "venda":
-                            intro = current_node.data.message or "Confira os itens disponíveis para venda:"
-
-                            try:
-                                available_items = _fetch_available_inventory()
-                            except Exception:
-                                logger.exception("Falha ao carregar inventário para o nó de vendas")
-                                available_items = []
-
-                            message_lines = [intro, ""]
-
-                            if available_items:
-                                for idx, item in enumerate(available_items, start=1):
-                                    price = _format_currency(item.get("unitPrice"))
-                                    stock = item.get("stockQuantity", 0)
-                                    message_lines.append(f"{idx}. {item.get('name', 'Item')} - {price} (estoque: {stock})")
-
-                                message_lines.append("")
-                                message_lines.append("0. Solicitar item que não está disponível")
-                                message_lines.append("Digite o número do item desejado.")
-
-                                messages_to_send.append({
-                                    "text": "\n".join(message_lines),
-                                    "options": [],
-                                })
-
-                                execution.current_node_id = current_node.id
-                                execution.waiting_for_input = True
-                                execution.sale_state = {
-                                    "stage": "selection",
-                                    "items": available_items,
-                                    "selected": None,
-                                }
-
-                                return {
-                                    "success": True,
-                                    "messages": messages_to_send,
-                                    "requires_input": True,
-                                    "is_final": False,
-                                    "node_type": "venda",
-                                }
-
-                            message_lines.append(
-                                "No momento não há itens em estoque. Informe o nome do item que deseja e registraremos a solicitação."
-                            )
-
-                            messages_to_send.append({
-                                "text": "\n".join(message_lines),
-                                "options": [],
-                            })
-
-                            execution.current_node_id = current_node.id
-                            execution.waiting_for_input = True
-                            execution.sale_state = {
-                                "stage": "customName",
-                                "items": [],
-                                "selected": None,
-                            }
-
-                            return {
-                                "success": True,
-                                "messages": messages_to_send,
-                                "requires_input": True,
-                                "is_final": False,
-                                "node_type": "venda",
-                            }
-                        # </CHANGE>
-
-                        if current_node.type == "agentes":
-                            initial_message = current_node.data.initialMessage or "🔄 Encaminhando para o operador disponível... Por favor aguarde."
-
-                            messages_to_send.append({
-                                "text": initial_message,
-                                "options": []
-                            })
-
-                            execution.conversation_history.append({
-                                "role": "assistant",
-                                "content": initial_message,
-                                "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                            })
-
-                            agent_manager.start_agent_session(user_id, current_node.id)
-
-                            execution.waiting_for_input = True
-                            execution.current_node_id = current_node.id
-
-                            return {
-                                "success": True,
-                                "messages": messages_to_send,
-                                "requires_input": True,
-                                "is_final": False,
-                                "node_type": "agent"
-                            }
-                        # </CHANGE>
-
-                        if current_node.type == "agendamento":
-                            msg_text = current_node.data.message or "📅 Deseja agendar um horário?"
-                            available_slots = current_node.data.availableSlots or []
-
-                            filtered_slots = []
-                            for slot in available_slots:
-                                if slot.get("available", False):
-                                    time = slot.get("time", "")
-                                    date = slot.get("date", "")
-                                    if not booking_manager.is_slot_booked(time, date, workflow_id):
-                                        filtered_slots.append(slot)
-
-                            if not filtered_slots:
-                                no_slots_msg = current_node.data.noSlotsMessage or "😔 Não há horários disponíveis no momento.\n\nPor favor, tente novamente mais tarde."
-                                messages_to_send.append({"text": no_slots_msg, "options": []})
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": no_slots_msg,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                                })
-
-                                execution.current_node_id = current_node.id
-                                current_node = find_next_node(workflow_id, current_node.id)
-                                continue
-
-                            slots_text = "\n\n━━━━━━━━━━━━━━━━━━━━\n📋 *Horários Disponíveis:*\n━━━━━━━━━━━━━━━━━━━━\n\n"
-
-                            for idx, slot in enumerate(filtered_slots, start=1):
-                                time = slot.get("time", "")
-                                date = slot.get("date", "")
-
-                                try:
-                                    date_obj = datetime.strptime(date, "%Y-%m-%d")
-                                    date_formatted = date_obj.strftime("%d/%m/%Y")
-                                except Exception:
-                                    date_formatted = date
-
-                                slots_text += f"⏰ *{idx}.* {time} - 📅 {date_formatted}\n"
-
-                            slots_text += "\n━━━━━━━━━━━━━━━━━━━━\n\n💡 Digite o *número* do horário desejado\n❌ Digite *'cancelar'* para cancelar um agendamento"
-
-                            full_message = msg_text + slots_text
-
-                            messages_to_send.append({"text": full_message, "options": []})
-
-                            execution.conversation_history.append({
-                                "role": "assistant",
-                                "content": full_message,
-                                "timestamp": datetime.now(BRASIL_TZ).isoformat(),
-                            })
-
-                            execution.current_node_id = current_node.id
-                            execution.waiting_for_input = True
-                            execution.scheduling_state = {
-                                "slots": filtered_slots,
-                                "node_id": current_node.id,
-                            }
-
-                            return {
-                                "success": True,
-                                "messages": messages_to_send,
-                                "requires_input": True,
-                                "is_final": False,
-                                "node_type": "agendamento",
-                            }
-
-                        if current_node.type == "finalizar":
-                            logger.info(f"[SURVEY] ========================================")
-                            logger.info(f"[SURVEY] NÓ FINALIZAR ATINGIDO (APÓS OPÇÕES): {current_node.id}")
-                            logger.info(f"[SURVEY] ========================================")
-
-                            msg_text = current_node.data.finalMessage or current_node.data.message or ""
-
-                            if msg_text.strip():
-                                logger.info(f"[SURVEY] Adicionando mensagem final: {msg_text[:50]}...")
-                                messages_to_send.append({
-                                    "text": msg_text,
-                                    "options": []
-                                })
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": msg_text,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                })
-                            else:
-                                logger.info(f"[SURVEY] Nenhuma mensagem final configurada")
-
-                            # SEMPRE enviar pesquisa de satisfação
-                            logger.info(f"[SURVEY] Preparando pesquisa de satisfação...")
-                            logger.info(f"[SURVEY] enableSatisfactionSurvey: {current_node.data.enableSatisfactionSurvey}")
-
-                            # Get survey configuration or use defaults
-                            survey_question = current_node.data.surveyQuestion or "Olá, diga de 0 a 5, qual é a nota do atendimento?"
-                            rating_labels = current_node.data.surveyRatingLabels or [
-                                "Péssimo",
-                                "Ruim",
-                                "Regular",
-                                "Bom",
-                                "Excelente",
-                                "Extremamente Satisfeito"
-                            ]
-
-                            logger.info(f"[SURVEY] Pergunta: {survey_question}")
-                            logger.info(f"[SURVEY] Labels configurados: {len(rating_labels)} labels")
-
-                            # Build survey message with better formatting
-                            survey_text = f"\n\n━━━━━━━━━━━━━━━━━━━━\n📊 Pesquisa de Satisfação\n━━━━━━━━━━━━━━━━━━━━\n\n{survey_question}\n\n"
-
-                            for i, label in enumerate(rating_labels):
-                                survey_text += f"{i} - {label}\n"
-
-                            survey_text += "\n💡 Digite o número correspondente à sua avaliação"
-
-                            logger.info(f"[SURVEY] Texto da pesquisa montado ({len(survey_text)} caracteres)")
-                            logger.info(f"[SURVEY] Preview: {survey_text[:100]}...")
-
-                            messages_to_send.append({
-                                "text": survey_text,
-                                "options": [],
-                                "delay": 2000  # 2 seconds delay
-                            })
-
-                            execution.conversation_history.append({
-                                "role": "assistant",
-                                "content": survey_text,
-                                "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                            })
-
-                            # Set survey state to wait for user response
-                            execution.survey_state = {
-                                'waiting_response': True,
-                                'question': survey_question,
-                                'timestamp': datetime.now(BRASIL_TZ).isoformat()
-                            }
-                            execution.waiting_for_input = True
-
-                            logger.info(f"[SURVEY] ✅ Pesquisa ADICIONADA às mensagens!")
-                            logger.info(f"[SURVEY] Total de mensagens a enviar: {len(messages_to_send)}")
-                            logger.info(f"[SURVEY] Estado configurado: waiting_response=True")
-                            logger.info(f"[SURVEY] ========================================")
-
-                            return {
-                                "success": True,
-                                "messages": messages_to_send,
-                                "requires_input": True,
-                                "is_final": False
-                            }
-
-
-                        execution.current_node_id = current_node.id
-                        current_node = find_next_node(workflow_id, current_node.id)
-
-                    reset_conversation(user_id, workflow_id)
-                    return {
-                        "success": True,
-                        "messages": messages_to_send,
-                        "requires_input": False,
-                        "is_final": True,
-                        "archive_conversation": True
-                    }
-
-                reset_conversation(user_id, workflow_id)
-                return {
-                    "success": True,
-                    "messages": messages_to_send,
-                    "requires_input": False,
-                    "is_final": True,
-                    "archive_conversation": True
-                }
-
-                if hasattr(execution, 'cancellation_state') and execution.cancellation_state.get('waiting_code'):
-                    code = message.strip().upper()
-                    booking = booking_manager.get_booking_by_code(code, user_id)
-
-                    if booking:
-                        # Valid code - ask for reason
-                        execution.cancellation_state['waiting_code'] = False
-                        execution.cancellation_state['waiting_reason'] = True
-                        execution.cancellation_state['code'] = code
-
-                        reason_request_msg = f"✅ Código validado com sucesso!\n\n📋 Agendamento encontrado:\n⏰ Horário: {booking['time']}\n📅 Data: {booking['date']}\n\nPor favor, descreva com detalhes o motivo do cancelamento:"
-
-                        messages_to_send.append({
-                            "text": reason_request_msg,
-                            "options": []
-                        })
-
-                        execution.conversation_history.append({
-                            "role": "assistant",
-                            "content": reason_request_msg,
-                            "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                        })
-
-                        return {
-                            "success": True,
-                            "messages": messages_to_send,
-                            "requires_input": True,
-                            "is_final": False,
-                            "node_type": "agendamento_cancellation"
-                        }
-                    else:
-                        error_msg = "❌ Código inválido ou agendamento não encontrado.\n\nPor favor, verifique o código e tente novamente:"
-
-                        return {
-                            "success": True,
-                            "messages": [{
-                                "text": error_msg,
-                                "options": []
-                            }],
-                            "requires_input": True,
-                            "is_final": False,
-                            "node_type": "agendamento_cancellation"
-                        }
-
-                if hasattr(execution, 'cancellation_state') and execution.cancellation_state.get('waiting_reason'):
-                    reason = message.strip()
-
-                    if len(reason) < 10:
-                        return {
-                            "success": True,
-                            "messages": [{
-                                "text": "Por favor, forneça uma descrição mais detalhada do motivo do cancelamento (mínimo 10 caracteres):",
-                                "options": []
-                            }],
-                            "requires_input": True,
-                            "is_final": False,
-                            "node_type": "agendamento_cancellation"
-                        }
-
-                    # Cancel the booking
-                    code = execution.cancellation_state['code']
-                    success = booking_manager.cancel_booking(code, user_id, reason)
-
-                    if success:
-                        cancellation_msg = "✅ Cancelamento concluído com sucesso!\n\nSeu agendamento foi cancelado e o horário está novamente disponível."
-
-                        messages_to_send.append({
-                            "text": cancellation_msg,
-                            "options": []
-                        })
-
-                        execution.conversation_history.append({
-                            "role": "assistant",
-                            "content": cancellation_msg,
-                            "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                        })
-
-                        execution.waiting_for_input = False
-                        execution.cancellation_state = {}
-                        execution.scheduling_state = {}
-
-                        # Move to next node
-                        next_node = find_next_node(workflow_id, current_node.id)
-                        if next_node:
-                            execution.current_node_id = next_node.id
-                            # Continue processing
-                            current_node = next_node
-                            while current_node:
-                                logger.info(f"Processando nó: {current_node.id} ({current_node.type})")
-
-                                if current_node.type == "sendMessage":
-                                    msg_text = current_node.data.message or "Mensagem não configurada"
-                                    messages_to_send.append({
-                                        "text": msg_text,
-                                        "options": []
-                                    })
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": msg_text,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                    })
-
-                                    execution.current_node_id = current_node.id
-                                    current_node = find_next_node(workflow_id, current_node.id)
-
-                                elif current_node.type == "options":
-                                    msg_text = current_node.data.message or "Escolha uma opção:"
-                                    options = current_node.data.options or []
-
-                                    if options:
-                                        options_text = "\n\n" + "\n".join([f"{i+1}. {opt.get('text', '')}"for i, opt in enumerate(options)])
-                                        full_message = msg_text + options_text
-                                    else:
-                                        full_message = msg_text
-
-                                    messages_to_send.append({
-                                        "text": full_message,
-                                        "options": []
-                                    })
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": full_message,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                    })
-
-                                    execution.current_node_id = current_node.id
-                                    execution.waiting_for_input = True
-
-                                    return {
-                                        "success": True,
-                                        "messages": messages_to_send,
-                                        "requires_input": True,
-                                        "is_final": False
-                                    }
-
-                                elif current_node.type == "finalizar":
-                                    logger.info(f"[SURVEY] ========================================")
-                                    logger.info(f"[SURVEY] NÓ FINALIZAR ATINGIDO (APÓS OPÇÕES): {current_node.id}")
-                                    logger.info(f"[SURVEY] ========================================")
-
-                                    msg_text = current_node.data.finalMessage or current_node.data.message or ""
-
-                                    if msg_text.strip():
-                                        logger.info(f"[SURVEY] Adicionando mensagem final: {msg_text[:50]}...")
-                                        messages_to_send.append({
-                                            "text": msg_text,
-                                            "options": []
-                                        })
-
-                                        execution.conversation_history.append({
-                                            "role": "assistant",
-                                            "content": msg_text,
-                                            "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                        })
-                                    else:
-                                        logger.info(f"[SURVEY] Nenhuma mensagem final configurada")
-
-                                    # SEMPRE enviar pesquisa de satisfação
-                                    logger.info(f"[SURVEY] Preparando pesquisa de satisfação...")
-                                    logger.info(f"[SURVEY] enableSatisfactionSurvey: {current_node.data.enableSatisfactionSurvey}")
-
-                                    # Get survey configuration or use defaults
-                                    survey_question = current_node.data.surveyQuestion or "Olá, diga de 0 a 5, qual é a nota do atendimento?"
-                                    rating_labels = current_node.data.surveyRatingLabels or [
-                                        "Péssimo",
-                                        "Ruim",
-                                        "Regular",
-                                        "Bom",
-                                        "Excelente",
-                                        "Extremamente Satisfeito"
-                                    ]
-
-                                    logger.info(f"[SURVEY] Pergunta: {survey_question}")
-                                    logger.info(f"[SURVEY] Labels configurados: {len(rating_labels)} labels")
-
-                                    # Build survey message with better formatting
-                                    survey_text = f"\n\n━━━━━━━━━━━━━━━━━━━━\n📊 Pesquisa de Satisfação\n━━━━━━━━━━━━━━━━━━━━\n\n{survey_question}\n\n"
-
-                                    for i, label in enumerate(rating_labels):
-                                        survey_text += f"{i} - {label}\n"
-
-                                    survey_text += "\n💡 Digite o número correspondente à sua avaliação"
-
-                                    logger.info(f"[SURVEY] Texto da pesquisa montado ({len(survey_text)} caracteres)")
-                                    logger.info(f"[SURVEY] Preview: {survey_text[:100]}...")
-
-                                    messages_to_send.append({
-                                        "text": survey_text,
-                                        "options": [],
-                                        "delay": 2000  # 2 seconds delay
-                                    })
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": survey_text,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                    })
-
-                                    # Set survey state to wait for user response
-                                    execution.survey_state = {
-                                        'waiting_response': True,
-                                        'question': survey_question,
-                                        'timestamp': datetime.now(BRASIL_TZ).isoformat()
-                                    }
-                                    execution.waiting_for_input = True
-
-                                    logger.info(f"[SURVEY] ✅ Pesquisa ADICIONADA às mensagens!")
-                                    logger.info(f"[SURVEY] Total de mensagens a enviar: {len(messages_to_send)}")
-                                    logger.info(f"[SURVEY] Estado configurado: waiting_response=True")
-                                    logger.info(f"[SURVEY] ========================================")
-
-                                    return {
-                                        "success": True,
-                                        "messages": messages_to_send,
-                                        "requires_input": True,
-                                        "is_final": False
-                                    }
-                                    # </CHANGE>
-
-                                elif current_node.type == "agentes":
-                                    initial_message = current_node.data.initialMessage or "🔄 Encaminhando para o operador disponível... Por favor aguarde."
-
-                                    # Enviar mensagem de transferência
-                                    messages_to_send.append({
-                                        "text": initial_message,
-                                        "options": []
-                                    })
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": initial_message,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                    })
-
-                                    # Iniciar sessão de agente
-                                    agent_manager.start_agent_session(user_id, current_node.id)
-
-                                    # Marcar que o fluxo está com o operador humano
-                                    execution.waiting_for_input = True
-                                    execution.current_node_id = current_node.id
-
-                                    logger.info(f"Conversa transferida para operador - Nó: {current_node.id}")
-
-                                    # Return immediately - don't process next nodes or archive
-                                    return {
-                                        "success": True,
-                                        "messages": messages_to_send,
-                                        "requires_input": True,
-                                        "is_final": False,
-                                        "node_type": "agent"
-                                    }
-
-                                else:
-                                    execution.current_node_id = current_node.id
-                                    current_node = find_next_node(workflow_id, current_node.id)
-
-                            # End of flow
-                            reset_conversation(user_id, workflow_id)
-                            return {
-                                "success": True,
-                                "messages": messages_to_send,
-                                "requires_input": False,
-                                "is_final": True,
-                                "archive_conversation": True
-                            }
-                        else:
-                            reset_conversation(user_id, workflow_id)
-                            return {
-                                "success": True,
-                                "messages": messages_to_send,
-                                "requires_input": False,
-                                "is_final": True,
-                                "archive_conversation": True
-                            }
-                    else:
-                        error_msg = "❌ Houve um erro ao tentar cancelar o agendamento. Por favor, tente novamente mais tarde."
-
-                        return {
-                            "success": True,
-                            "messages": [{
-                                "text": error_msg,
-                                "options": []
-                            }],
-                            "requires_input": False, # User can't retry cancellation immediately
-                            "is_final": False,
-                            "node_type": "agendamento" # Go back to scheduling options if possible
-                        }
-
-
-                available_slots = current_node.data.availableSlots or []
-
-                # Filter out booked slots
-                filtered_slots = []
-                for slot in available_slots:
-                    if slot.get("available", False):
-                        time = slot.get("time", "")
-                        date = slot.get("date", "")
-                        if not booking_manager.is_slot_booked(time, date, workflow_id):
-                            filtered_slots.append(slot)
-
-                if user_input.isdigit():
-                    slot_index = int(user_input) - 1
-
-                    if 0 <= slot_index < len(filtered_slots):
-                        selected_slot = filtered_slots[slot_index]
-
-                        # Generate confirmation code
-                        code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=6))
-
-                        booking_manager.create_booking(
-                            user_id=user_id,
-                            code=code,
-                            time=selected_slot.get("time", ""),
-                            date=selected_slot.get("date", ""),
-                            workflow_id=workflow_id
-                        )
-
-                        confirmation_msg = current_node.data.confirmationMessage or "✅ Agendamento confirmado!\n\n🎫 Seu código é: {code}\n⏰ Horário: {time}\n📅 Data: {date}\n\n⚠️ Guarde este código para cancelamentos futuros!"
-                        confirmation_msg = confirmation_msg.replace("{code}", code)
-                        confirmation_msg = confirmation_msg.replace("{time}", selected_slot.get("time", ""))
-                        confirmation_msg = confirmation_msg.replace("{date}", selected_slot.get("date", ""))
-
-                        messages_to_send.append({
-                            "text": confirmation_msg,
-                            "options": []
-                        })
-
-                        execution.conversation_history.append({
-                            "role": "assistant",
-                            "content": confirmation_msg,
-                            "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                        })
-
-                        execution.waiting_for_input = False
-
-                        # Move to next node
-                        next_node = find_next_node(workflow_id, current_node.id)
-                        if next_node:
-                            execution.current_node_id = next_node.id
-                            # Continue processing
-                            current_node = next_node
-                            while current_node:
-                                logger.info(f"Processando nó: {current_node.id} ({current_node.type})")
-
-                                if current_node.type == "sendMessage":
-                                    msg_text = current_node.data.message or "Mensagem não configurada"
-                                    messages_to_send.append({
-                                        "text": msg_text,
-                                        "options": []
-                                    })
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": msg_text,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                    })
-
-                                    execution.current_node_id = current_node.id
-                                    current_node = find_next_node(workflow_id, current_node.id)
-
-                                elif current_node.type == "options":
-                                    msg_text = current_node.data.message or "Escolha uma opção:"
-                                    options = current_node.data.options or []
-
-                                    if options:
-                                        options_text = "\n\n" + "\n".join([f"{i+1}. {opt.get('text', '')}"for i, opt in enumerate(options)])
-                                        full_message = msg_text + options_text
-                                    else:
-                                        full_message = msg_text
-
-                                    messages_to_send.append({
-                                        "text": full_message,
-                                        "options": []
-                                    })
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": full_message,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                    })
-
-                                    execution.current_node_id = current_node.id
-                                    execution.waiting_for_input = True
-
-                                    return {
-                                        "success": True,
-                                        "messages": messages_to_send,
-                                        "requires_input": True,
-                                        "is_final": False
-                                    }
-
-                                elif current_node.type == "agendamento":
-                                    msg_text = current_node.data.message or "Deseja agendar um horário?"
-                                    available_slots = current_node.data.availableSlots or []
-
-                                    # Filter out booked slots
-                                    filtered_slots = []
-                                    for slot in available_slots:
-                                        if slot.get("available", False):
-                                            time = slot.get("time", "")
-                                            date = slot.get("date", "")
-                                            if not booking_manager.is_slot_booked(time, date, workflow_id):
-                                                filtered_slots.append(slot)
-
-                                    if not filtered_slots:
-                                        no_slots_msg = current_node.data.noSlotsMessage or "Não há horários disponíveis no momento."
-                                        messages_to_send.append({
-                                            "text": no_slots_msg,
-                                            "options": []
-                                        })
-
-                                        execution.conversation_history.append({
-                                            "role": "assistant",
-                                            "content": no_slots_msg,
-                                            "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                        })
-
-                                        execution.current_node_id = current_node.id
-                                        current_node = find_next_node(workflow_id, current_node.id)
-                                        continue
-
-                                    # Build message with available slots
-                                    slots_text = "\n\nHorários Disponíveis:\n"
-                                    slot_number = 1
-                                    for slot in filtered_slots:
-                                        if slot.get("available", False): # Redundant check, but for clarity
-                                            time = slot.get("time", "")
-                                            date = slot.get("date", "")
-                                            date_str = f" - {date}" if date else ""
-                                            slots_text += f"{slot_number}. {time}{date_str}\n"
-                                            slot_number += 1
-
-                                    full_message = msg_text + slots_text + "\n\nDigite o número do horário desejado ou 'cancelar' para cancelar."
-
-                                    messages_to_send.append({
-                                        "text": full_message,
-                                        "options": []
-                                    })
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": full_message,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                    })
-
-                                    execution.current_node_id = current_node.id
-                                    execution.waiting_for_input = True
-
-                                    return {
-                                        "success": True,
-                                        "messages": messages_to_send,
-                                        "requires_input": True,
-                                        "is_final": False,
-                                        "node_type": "agendamento"
-                                    }
-
-                                elif current_node.type == "finalizar":
-                                    logger.info(f"[SURVEY] ========================================")
-                                    logger.info(f"[SURVEY] NÓ FINALIZAR ATINGIDO (APÓS OPÇÕES): {current_node.id}")
-                                    logger.info(f"[SURVEY] ========================================")
-
-                                    msg_text = current_node.data.finalMessage or current_node.data.message or ""
-
-                                    if msg_text.strip():
-                                        logger.info(f"[SURVEY] Adicionando mensagem final: {msg_text[:50]}...")
-                                        messages_to_send.append({
-                                            "text": msg_text,
-                                            "options": []
-                                        })
-
-                                        execution.conversation_history.append({
-                                            "role": "assistant",
-                                            "content": msg_text,
-                                            "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                        })
-                                    else:
-                                        logger.info(f"[SURVEY] Nenhuma mensagem final configurada")
-
-                                    # SEMPRE enviar pesquisa de satisfação
-                                    logger.info(f"[SURVEY] Preparando pesquisa de satisfação...")
-                                    logger.info(f"[SURVEY] enableSatisfactionSurvey: {current_node.data.enableSatisfactionSurvey}")
-
-                                    # Get survey configuration or use defaults
-                                    survey_question = current_node.data.surveyQuestion or "Olá, diga de 0 a 5, qual é a nota do atendimento?"
-                                    rating_labels = current_node.data.surveyRatingLabels or [
-                                        "Péssimo",
-                                        "Ruim",
-                                        "Regular",
-                                        "Bom",
-                                        "Excelente",
-                                        "Extremamente Satisfeito"
-                                    ]
-
-                                    logger.info(f"[SURVEY] Pergunta: {survey_question}")
-                                    logger.info(f"[SURVEY] Labels configurados: {len(rating_labels)} labels")
-
-                                    # Build survey message with better formatting
-                                    survey_text = f"\n\n━━━━━━━━━━━━━━━━━━━━\n📊 Pesquisa de Satisfação\n━━━━━━━━━━━━━━━━━━━━\n\n{survey_question}\n\n"
-
-                                    for i, label in enumerate(rating_labels):
-                                        survey_text += f"{i} - {label}\n"
-
-                                    survey_text += "\n💡 Digite o número correspondente à sua avaliação"
-
-                                    logger.info(f"[SURVEY] Texto da pesquisa montado ({len(survey_text)} caracteres)")
-                                    logger.info(f"[SURVEY] Preview: {survey_text[:100]}...")
-
-                                    messages_to_send.append({
-                                        "text": survey_text,
-                                        "options": [],
-                                        "delay": 2000  # 2 seconds delay
-                                    })
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": survey_text,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                    })
-
-                                    # Set survey state to wait for user response
-                                    execution.survey_state = {
-                                        'waiting_response': True,
-                                        'question': survey_question,
-                                        'timestamp': datetime.now(BRASIL_TZ).isoformat()
-                                    }
-                                    execution.waiting_for_input = True
-
-                                    logger.info(f"[SURVEY] ✅ Pesquisa ADICIONADA às mensagens!")
-                                    logger.info(f"[SURVEY] Total de mensagens a enviar: {len(messages_to_send)}")
-                                    logger.info(f"[SURVEY] Estado configurado: waiting_response=True")
-                                    logger.info(f"[SURVEY] ========================================")
-
-                                    return {
-                                        "success": True,
-                                        "messages": messages_to_send,
-                                        "requires_input": True,
-                                        "is_final": False
-                                    }
-
-                                else:
-                                    execution.current_node_id = current_node.id
-                                    current_node = find_next_node(workflow_id, current_node.id)
-
-                            # End of flow
-                            reset_conversation(user_id, workflow_id)
-                            return {
-                                "success": True,
-                                "messages": messages_to_send,
-                                "requires_input": False,
-                                "is_final": True,
-                                "archive_conversation": True
-                            }
-
-                # Invalid input for booking
-                error_msg = "Opção inválida. Por favor, digite o número do horário desejado ou 'cancelar' para cancelar."
-                return {
-                    "success": True,
-                    "messages": [{
-                        "text": error_msg,
-                        "options": []
-                    }],
-                    "requires_input": True,
-                    "is_final": False
-                }
+                return _run_nodes(turn, find_next_node(workflow_id, current_node.id), _AFTER_SALE_ORDER_NODES)
 
             # Se é um nó de opções, processar a escolha
             if current_node.type == "options":
@@ -3086,383 +1200,25 @@ def process_user_message(user_id: str, workflow_id: str, message: str) -> Dict[s
                         if not next_node:
                             # Fim do fluxo
                             logger.info(f"Fim do fluxo após opção {option_index + 1}")
-                            reset_conversation(user_id, workflow_id)
-                            return {
-                                "success": True,
-                                "messages": [],
-                                "requires_input": False,
-                                "is_final": True,
-                                "archive_conversation": True
-                            }
+                            return turn.finish()
 
                         execution.current_node_id = next_node.id
                         execution.waiting_for_input = False
 
-                        # Processar todos os nós até encontrar um que requer input ou é final
-                        current_node = next_node
-                        while current_node:
-                            logger.info(f"Processando nó: {current_node.id} ({current_node.type})")
-
-                            if current_node.type == "sendMessage":
-                                msg_text = current_node.data.message or "Mensagem não configurada"
-                                messages_to_send.append({
-                                    "text": msg_text,
-                                    "options": []
-                                })
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": msg_text,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                })
-
-                                execution.current_node_id = current_node.id
-                                current_node = find_next_node(workflow_id, current_node.id)
-
-                            elif current_node.type == "options":
-                                msg_text = current_node.data.message or "Escolha uma opção:"
-                                options = current_node.data.options or []
-
-                                if options:
-                                    options_text = "\n\n" + "\n".join([f"{i+1}. {opt.get('text', '')}"for i, opt in enumerate(options)])
-                                    full_message = msg_text + options_text
-                                else:
-                                    full_message = msg_text
-
-                                messages_to_send.append({
-                                    "text": full_message,
-                                    "options": []
-                                })
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": full_message,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                })
-
-                                execution.current_node_id = current_node.id
-                                execution.waiting_for_input = True
-
-                                return {
-                                    "success": True,
-                                    "messages": messages_to_send,
-                                    "requires_input": True,
-                                    "is_final": False
-                                }
-
-                            elif current_node.type == "venda":
-                                intro = current_node.data.message or "Confira os itens disponíveis para venda:"
-
-                                try:
-                                    available_items = _fetch_available_inventory()
-                                except Exception:
-                                    logger.exception("Falha ao carregar inventário para o nó de vendas")
-                                    available_items = []
-
-                                logger.info(
-                                    "Nó de vendas carregado (%s): %s itens elegíveis",
-                                    current_node.id,
-                                    len(available_items),
-                                )
-
-                                message_lines = [intro, ""]
-
-                                if available_items:
-                                    for idx, item in enumerate(available_items, start=1):
-                                        price = _format_currency(item.get("unitPrice"))
-                                        stock = item.get("stockQuantity", 0)
-                                        message_lines.append(f"{idx}. {item.get('name', 'Item')} - {price} (estoque: {stock})")
-
-                                    message_lines.append("")
-                                    message_lines.append("0. Solicitar item que não está disponível")
-                                    message_lines.append("Digite o número do item desejado.")
-
-                                    messages_to_send.append({
-                                        "text": "\n".join(message_lines),
-                                        "options": [],
-                                    })
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": "\n".join(message_lines),
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                    })
-
-                                    execution.current_node_id = current_node.id
-                                    execution.waiting_for_input = True
-                                    execution.sale_state = {
-                                        "stage": "selection",
-                                        "items": available_items,
-                                        "selected": None,
-                                    }
-
-                                    return {
-                                        "success": True,
-                                        "messages": messages_to_send,
-                                        "requires_input": True,
-                                        "is_final": False,
-                                        "node_type": "venda",
-                                    }
-
-                                message_lines.append(
-                                    "No momento não há itens em estoque. Informe o nome do item que deseja e registraremos a solicitação."
-                                )
-
-                                messages_to_send.append({
-                                    "text": "\n".join(message_lines),
-                                    "options": [],
-                                })
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": "\n".join(message_lines),
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                })
-
-                                execution.current_node_id = current_node.id
-                                execution.waiting_for_input = True
-                                execution.sale_state = {
-                                    "stage": "customName",
-                                    "items": [],
-                                    "selected": None,
-                                }
-
-                                return {
-                                    "success": True,
-                                    "messages": messages_to_send,
-                                    "requires_input": True,
-                                    "is_final": False,
-                                    "node_type": "venda",
-                                }
-                            # </CHANGE>
-
-                            elif current_node.type == "agentes":
-                                initial_message = current_node.data.initialMessage or "🔄 Encaminhando para o operador disponível... Por favor aguarde."
-
-                                messages_to_send.append({
-                                    "text": initial_message,
-                                    "options": []
-                                })
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": initial_message,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                })
-
-                                agent_manager.start_agent_session(user_id, current_node.id)
-
-                                execution.waiting_for_input = True
-                                execution.current_node_id = current_node.id
-
-                                logger.info(f"Conversa transferida para operador - Nó: {current_node.id}")
-
-                                return {
-                                    "success": True,
-                                    "messages": messages_to_send,
-                                    "requires_input": True,
-                                    "is_final": False,
-                                    "node_type": "agent"
-                                }
-                            # </CHANGE>
-
-                            elif current_node.type == "agendamento":
-                                msg_text = current_node.data.message or "📅 Deseja agendar um horário?"
-                                available_slots = current_node.data.availableSlots or []
-
-                                # Filter out booked slots
-                                filtered_slots = []
-                                for slot in available_slots:
-                                    if slot.get("available", False):
-                                        time = slot.get("time", "")
-                                        date = slot.get("date", "")
-                                        if not booking_manager.is_slot_booked(time, date, workflow_id):
-                                            filtered_slots.append(slot)
-
-                                if not filtered_slots:
-                                    no_slots_msg = current_node.data.noSlotsMessage or "Não há horários disponíveis no momento."
-                                    messages_to_send.append({
-                                        "text": no_slots_msg,
-                                        "options": []
-                                    })
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": no_slots_msg,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                    })
-
-                                    execution.current_node_id = current_node.id
-                                    current_node = find_next_node(workflow_id, current_node.id)
-                                    continue
-
-                                # Build message with available slots
-                                slots_text = "\n\nHorários Disponíveis:\n"
-                                slot_number = 1
-                                for slot in filtered_slots:
-                                    if slot.get("available", False): # Redundant check, but for clarity
-                                        time = slot.get("time", "")
-                                        date = slot.get("date", "")
-                                        date_str = f" - {date}" if date else ""
-                                        slots_text += f"{slot_number}. {time}{date_str}\n"
-                                        slot_number += 1
-
-                                full_message = msg_text + slots_text + "\n\nDigite o número do horário desejado ou 'cancelar' para cancelar."
-
-                                messages_to_send.append({
-                                    "text": full_message,
-                                    "options": []
-                                })
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": full_message,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                })
-
-                                execution.current_node_id = current_node.id
-                                execution.waiting_for_input = True
-
-                                return {
-                                    "success": True,
-                                    "messages": messages_to_send,
-                                    "requires_input": True,
-                                    "is_final": False,
-                                    "node_type": "agendamento"
-                                }
-
-                            elif current_node.type == "finalizar":
-                                logger.info(f"[SURVEY] ========================================")
-                                logger.info(f"[SURVEY] NÓ FINALIZAR ATINGIDO (APÓS OPÇÕES): {current_node.id}")
-                                logger.info(f"[SURVEY] ========================================")
-
-                                msg_text = current_node.data.finalMessage or current_node.data.message or ""
-
-                                if msg_text.strip():
-                                    logger.info(f"[SURVEY] Adicionando mensagem final: {msg_text[:50]}...")
-                                    messages_to_send.append({
-                                        "text": msg_text,
-                                        "options": []
-                                    })
-
-                                    execution.conversation_history.append({
-                                        "role": "assistant",
-                                        "content": msg_text,
-                                        "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                    })
-                                else:
-                                    logger.info(f"[SURVEY] Nenhuma mensagem final configurada")
-
-                                # SEMPRE enviar pesquisa de satisfação
-                                logger.info(f"[SURVEY] Preparando pesquisa de satisfação...")
-                                logger.info(f"[SURVEY] enableSatisfactionSurvey: {current_node.data.enableSatisfactionSurvey}")
-
-                                # Get survey configuration or use defaults
-                                survey_question = current_node.data.surveyQuestion or "Olá, diga de 0 a 5, qual é a nota do atendimento?"
-                                rating_labels = current_node.data.surveyRatingLabels or [
-                                    "Péssimo",
-                                    "Ruim",
-                                    "Regular",
-                                    "Bom",
-                                    "Excelente",
-                                    "Extremamente Satisfeito"
-                                ]
-
-                                logger.info(f"[SURVEY] Pergunta: {survey_question}")
-                                logger.info(f"[SURVEY] Labels configurados: {len(rating_labels)} labels")
-
-                                # Build survey message with better formatting
-                                survey_text = f"\n\n━━━━━━━━━━━━━━━━━━━━\n📊 Pesquisa de Satisfação\n━━━━━━━━━━━━━━━━━━━━\n\n{survey_question}\n\n"
-
-                                for i, label in enumerate(rating_labels):
-                                    survey_text += f"{i} - {label}\n"
-
-                                survey_text += "\n💡 Digite o número correspondente à sua avaliação"
-
-                                logger.info(f"[SURVEY] Texto da pesquisa montado ({len(survey_text)} caracteres)")
-                                logger.info(f"[SURVEY] Preview: {survey_text[:100]}...")
-
-                                messages_to_send.append({
-                                    "text": survey_text,
-                                    "options": [],
-                                    "delay": 2000  # 2 seconds delay
-                                })
-
-                                execution.conversation_history.append({
-                                    "role": "assistant",
-                                    "content": survey_text,
-                                    "timestamp": datetime.now(BRASIL_TZ).isoformat()
-                                })
-
-                                # Set survey state to wait for user response
-                                execution.survey_state = {
-                                    'waiting_response': True,
-                                    'question': survey_question,
-                                    'timestamp': datetime.now(BRASIL_TZ).isoformat()
-                                }
-                                execution.waiting_for_input = True
-
-                                logger.info(f"[SURVEY] ✅ Pesquisa ADICIONADA às mensagens!")
-                                logger.info(f"[SURVEY] Total de mensagens a enviar: {len(messages_to_send)}")
-                                logger.info(f"[SURVEY] Estado configurado: waiting_response=True")
-                                logger.info(f"[SURVEY] ========================================")
-
-                                return {
-                                    "success": True,
-                                    "messages": messages_to_send,
-                                    "requires_input": True,
-                                    "is_final": False
-                                }
-
-                            else:
-                                execution.current_node_id = current_node.id
-                                current_node = find_next_node(workflow_id, current_node.id)
-
-                        # Fim do fluxo
-                        reset_conversation(user_id, workflow_id)
-                        return {
-                            "success": True,
-                            "messages": messages_to_send,
-                            "requires_input": False,
-                            "is_final": True,
-                            "archive_conversation": True
-                        }
+                        return _run_nodes(turn, next_node, _AFTER_OPTION_NODES)
                     else:
                         options_list = "\n".join([f"{i+1}. {opt.get('text', '')}"for i, opt in enumerate(options)])
-                        error_msg = f"Opção inválida! Por favor, digite apenas o número da opção:\n\n{options_list}"
-
-                        return {
-                            "success": True,
-                            "messages": [{
-                                "text": error_msg,
-                                "options": []
-                            }],
-                            "requires_input": True,
-                            "is_final": False
-                        }
+                        turn.say(f"Opção inválida! Por favor, digite apenas o número da opção:\n\n{options_list}", record=False)
+                        return turn.wait()
                 except ValueError:
                     options = current_node.data.options
                     options_list = "\n".join([f"{i+1}. {opt.get('text', '')}"for i, opt in enumerate(options)])
-                    error_msg = f"Por favor, digite apenas o número da opção!\n\n{options_list}"
-
-                    return {
-                        "success": True,
-                        "messages": [{
-                            "text": error_msg,
-                            "options": []
-                        }],
-                        "requires_input": True,
-                        "is_final": False
-                    }
+                    turn.say(f"Por favor, digite apenas o número da opção!\n\n{options_list}", record=False)
+                    return turn.wait()
 
         # Caso padrão - não deveria chegar aqui
         logger.warning(f"Estado inesperado no processamento da mensagem")
-        return {
-            "success": True,
-            "messages": [],
-            "requires_input": False,
-            "is_final": False
-        }
+        return turn.respond(requires_input=False, is_final=False)
 
     except Exception as e:
         logger.error(f"[SURVEY] ❌ ERRO CRÍTICO ao processar mensagem: {e}")
@@ -3483,12 +1239,24 @@ def get_all_workflows() -> List[Dict]:
     """
     return list(_published_workflows.values())
 
+def get_active_workflow() -> Optional[Dict]:
+    """
+    Retorna o workflow ativo mais recente (o que atende as mensagens), ou None
+    """
+    return _active_workflow
+
 def get_workflow_by_id(workflow_id: str) -> Optional[Dict]:
     """
     Retorna um workflow específico (DADOS REAIS)
     """
     return _published_workflows.get(workflow_id)
 
+def get_workflow_graph(workflow_id: str) -> Optional[WorkflowGraph]:
+    """
+    Retorna o grafo compilado de um workflow
+    """
+    return _workflow_graphs.get(workflow_id)
+
 def reset_conversation(user_id: str, workflow_id: str) -> bool:
     """
     Reseta a conversa de um usuário
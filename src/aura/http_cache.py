@@ -0,0 +1,83 @@
+"""Cache de respostas JSON já codificadas, versionadas por conversa (ETag / 304)."""
+
+import threading
+import uuid
+import zlib
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# Chave da versão da lista de conversas, incrementada a cada alteração de qualquer conversa
+LIST_KEY = "__conversations__"
+
+
+class VersionedResponseCache:
+    """
+    Guarda corpos JSON prontos por (chave, variante), válidos enquanto a versão da
+    chave não muda. A versão é incrementada por ``bump`` após cada alteração; o ETag
+    combina um identificador do processo (versões recomeçam a cada inicialização),
+    a versão e a variante (query string), então um ``If-None-Match`` igual pode ser
+    respondido com 304 sem montar nem serializar nada.
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._boot = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        # (chave, variante) -> (versão, corpo codificado)
+        self._bodies: "OrderedDict[Tuple[str, str], Tuple[int, bytes]]" = OrderedDict()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "not_modified": 0,
+        }
+
+    def version(self, key: str) -> int:
+        with self._lock:
+            return self._versions.get(key, 0)
+
+    def bump(self, key: str) -> None:
+        """Invalida as respostas da chave e da lista de conversas"""
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            if key != LIST_KEY:
+                self._versions[LIST_KEY] = self._versions.get(LIST_KEY, 0) + 1
+
+    def forget(self, key: str) -> None:
+        """Descarta os corpos de uma chave removida; a versão continua crescendo"""
+        self.bump(key)
+        with self._lock:
+            for cache_key in [cache_key for cache_key in self._bodies if cache_key[0] == key]:
+                del self._bodies[cache_key]
+
+    def etag(self, key: str, variant: str, version: int) -> str:
+        return f"{self._boot}-{version}-{zlib.crc32(variant.encode('utf-8')):08x}"
+
+    def get(self, key: str, variant: str, version: int) -> Optional[bytes]:
+        with self._lock:
+            cached = self._bodies.get((key, variant))
+            if cached is None or cached[0] != version:
+                self._stats["misses"] += 1
+                return None
+            self._bodies.move_to_end((key, variant))
+            self._stats["hits"] += 1
+            return cached[1]
+
+    def put(self, key: str, variant: str, version: int, body: bytes) -> None:
+        with self._lock:
+            self._bodies[(key, variant)] = (version, body)
+            self._bodies.move_to_end((key, variant))
+            while len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self._stats["not_modified"] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                **self._stats,
+                "entries": len(self._bodies),
+                "versioned_keys": len(self._versions),
+            }
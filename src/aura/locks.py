@@ -0,0 +1,84 @@
+"""Locks com métricas de espera e tabela de locks por chave (striping)."""
+
+import threading
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+
+class InstrumentedLock:
+    """
+    Envolve um lock (RLock por padrão) contando aquisições, quantas precisaram
+    esperar e o tempo de espera. Aquisições sem disputa custam só uma tentativa
+    não bloqueante; os contadores são atualizados com o próprio lock adquirido.
+    """
+
+    __slots__ = ("_lock", "acquisitions", "contended", "wait_total", "wait_max")
+
+    def __init__(self, lock: Optional[Any] = None):
+        self._lock = lock if lock is not None else threading.RLock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        if self._lock.acquire(False):
+            self.acquisitions += 1
+            return True
+        if not blocking:
+            return False
+
+        started = time.perf_counter()
+        if not self._lock.acquire(True, timeout):
+            return False
+        waited = time.perf_counter() - started
+        self.acquisitions += 1
+        self.contended += 1
+        self.wait_total += waited
+        if waited > self.wait_max:
+            self.wait_max = waited
+        return True
+
+    def release(self) -> None:
+        self._lock.release()
+
+    def __enter__(self) -> bool:
+        return self.acquire()
+
+    def __exit__(self, *exc_info) -> None:
+        self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return _format_stats(self.acquisitions, self.contended, self.wait_total, self.wait_max)
+
+
+class LockStripes:
+    """
+    Tabela fixa de ``stripes`` locks; cada chave usa sempre o mesmo. Chaves
+    diferentes podem compartilhar um lock, mas nunca esperam por um lock global.
+    Quem precisar de dois locks da tabela ao mesmo tempo deve usar
+    ``acquire(blocking=False)`` no segundo, para não haver deadlock.
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._locks: List[InstrumentedLock] = [InstrumentedLock() for _ in range(max(1, stripes))]
+
+    def for_key(self, key: Hashable) -> InstrumentedLock:
+        return self._locks[hash(key) % len(self._locks)]
+
+    def stats(self) -> Dict[str, Any]:
+        acquisitions = sum(lock.acquisitions for lock in self._locks)
+        contended = sum(lock.contended for lock in self._locks)
+        wait_total = sum(lock.wait_total for lock in self._locks)
+        wait_max = max(lock.wait_max for lock in self._locks)
+        return dict(_format_stats(acquisitions, contended, wait_total, wait_max), stripes=len(self._locks))
+
+
+def _format_stats(acquisitions: int, contended: int, wait_total: float, wait_max: float) -> Dict[str, Any]:
+    return {
+        "acquisitions": acquisitions,
+        "contended": contended,
+        "wait_total_ms": round(1000 * wait_total, 1),
+        "wait_avg_ms": round(1000 * wait_total / contended, 3) if contended else 0.0,
+        "wait_max_ms": round(1000 * wait_max, 1),
+    }
@@ -0,0 +1,5 @@
+"""Entrega em tempo real (Server-Sent Events) para o painel do Aura."""
+
+from .changes import ChangeLog  # noqa: F401
+from .sidebar import SIDEBAR_TOPIC, SidebarFeed  # noqa: F401
+from .sse import SubscriberHub  # noqa: F401
@@ -0,0 +1,88 @@
+"""Log de mudanças com sequência global monotônica, para sincronização por delta."""
+
+import threading
+import uuid
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+CHANGE_CONVERSATION = "conversation"
+CHANGE_CONVERSATION_DELETED = "conversation_deleted"
+CHANGE_MESSAGE = "message"
+
+
+class ChangeLog:
+    """
+    Guarda as últimas ``capacity`` mutações de conversas e mensagens, cada uma com
+    um número de sequência global crescente. ``since(seq)`` devolve o que mudou
+    depois de ``seq``; se o cliente ficou para trás do que ainda está guardado (ou
+    vem de outra execução do servidor, ver ``epoch``), a resposta pede recarga total.
+    """
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        # Identifica esta execução: as sequências recomeçam a cada inicialização
+        self.epoch = uuid.uuid4().hex[:8]
+        self._lock = threading.Lock()
+        self._changes: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+        self._seq = 0
+        # Último estado registrado de cada conversa, para não repetir mudanças iguais
+        self._last_conversation: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def seq(self) -> int:
+        with self._lock:
+            return self._seq
+
+    def _append(self, change_type: str, conversation_id: str, data: Optional[Dict[str, Any]]) -> int:
+        self._seq += 1
+        self._changes.append({
+            "seq": self._seq,
+            "type": change_type,
+            "conversationId": conversation_id,
+            "data": data,
+        })
+        return self._seq
+
+    def conversation_changed(self, conversation: Dict[str, Any]) -> Optional[int]:
+        conversation_id = conversation["id"]
+        with self._lock:
+            if self._last_conversation.get(conversation_id) == conversation:
+                return None
+            self._last_conversation[conversation_id] = dict(conversation)
+            return self._append(CHANGE_CONVERSATION, conversation_id, conversation)
+
+    def conversation_deleted(self, conversation_id: str) -> int:
+        with self._lock:
+            self._last_conversation.pop(conversation_id, None)
+            return self._append(CHANGE_CONVERSATION_DELETED, conversation_id, None)
+
+    def message_added(self, conversation_id: str, message: Dict[str, Any]) -> int:
+        with self._lock:
+            return self._append(CHANGE_MESSAGE, conversation_id, message)
+
+    def since(self, seq: int, limit: int = 500, epoch: Optional[str] = None) -> Tuple[List[Dict[str, Any]], int, bool, bool]:
+        """
+        Mudanças com sequência maior que ``seq``, no máximo ``limit``.
+        Retorna (mudanças, nova marca d'água, há mais, recarga necessária).
+        """
+        with self._lock:
+            oldest = self._changes[0]["seq"] if self._changes else self._seq + 1
+            stale_epoch = epoch is not None and epoch != self.epoch
+            if stale_epoch or seq > self._seq or seq < oldest - 1:
+                return [], self._seq, False, True
+
+            # Sequências são contíguas: a posição de seq + 1 no deque é direta
+            start = seq + 1 - oldest
+            changes = list(islice(self._changes, start, start + limit))
+            high_water = changes[-1]["seq"] if changes else seq
+            return changes, high_water, high_water < self._seq, False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "epoch": self.epoch,
+                "seq": self._seq,
+                "retained": len(self._changes),
+                "capacity": self.capacity,
+            }
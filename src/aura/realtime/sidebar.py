@@ -0,0 +1,76 @@
+"""Feed global de mudanças da lista de conversas (deltas compactos para a barra lateral)."""
+
+import threading
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from .sse import SubscriberHub
+
+SIDEBAR_TOPIC = "__sidebar__"
+
+# Campos da conversa que aparecem na barra lateral
+_SIDEBAR_FIELDS = ("title", "lastMessage", "lastAt", "isArchived")
+
+
+class SidebarFeed:
+    """
+    Converte alterações de conversas em deltas para a barra lateral e os publica em
+    um único tópico SSE. Cada delta traz id, título, lastMessage, lastAt, isArchived
+    e ``unreadDelta`` (mensagens não lidas novas desde o delta anterior). Alterações
+    que não mudam nada visível (ex.: gravação após a mudança já publicada) não geram
+    evento.
+    """
+
+    def __init__(self, hub: SubscriberHub):
+        self.hub = hub
+        self._lock = threading.Lock()
+        # id -> (campos visíveis publicados, mensagens já contadas)
+        self._published: Dict[str, Tuple[Tuple[Any, ...], int]] = {}
+
+    def prime(self, conversation: Dict[str, Any], message_count: int) -> None:
+        """Registra o estado já conhecido de uma conversa (catálogo, na inicialização), sem publicar"""
+        fields = tuple(conversation.get(name) for name in _SIDEBAR_FIELDS)
+        with self._lock:
+            self._published[conversation["id"]] = (fields, message_count)
+
+    def conversation_changed(self, conversation: Dict[str, Any], messages: Optional[Sequence[Any]] = None) -> bool:
+        """Publica o delta da conversa, se houver; ``messages`` é a lista residente, quando houver"""
+        conversation_id = conversation["id"]
+        if conversation.get("is_bot_conversation"):
+            return False
+
+        fields = tuple(conversation.get(name) for name in _SIDEBAR_FIELDS)
+        with self._lock:
+            # Conversa ainda desconhecida (nova): todas as mensagens contam como novas
+            previous_fields, counted = self._published.get(conversation_id, (None, 0))
+            unread_delta = 0
+            total = counted
+            if messages is not None:
+                total = len(messages)
+                if counted < total:
+                    unread_delta = sum(1 for msg in messages[counted:] if not msg.read)
+
+            if fields == previous_fields and unread_delta == 0:
+                self._published[conversation_id] = (fields, total)
+                return False
+
+            self._published[conversation_id] = (fields, total)
+            delta = {
+                "type": "upsert",
+                "id": conversation_id,
+                **dict(zip(_SIDEBAR_FIELDS, fields)),
+                "unreadDelta": unread_delta,
+            }
+            # Publica dentro do lock: os deltas de uma conversa saem na ordem em que foram calculados
+            self.hub.publish(SIDEBAR_TOPIC, delta)
+            return True
+
+    def conversation_removed(self, conversation_id: str) -> None:
+        with self._lock:
+            self._published.pop(conversation_id, None)
+            self.hub.publish(SIDEBAR_TOPIC, {"type": "delete", "id": conversation_id})
+
+    def stream(self, last_event_id: Optional[int] = None, heartbeat: float = 15.0) -> Iterator[str]:
+        return self.hub.stream(SIDEBAR_TOPIC, last_event_id, heartbeat)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.hub.stats()
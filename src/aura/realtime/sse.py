@@ -0,0 +1,314 @@
+"""Assinantes SSE por tópico, com filas limitadas, heartbeat e replay por Last-Event-ID."""
+
+import json
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Intervalo sugerido ao navegador para reconectar após uma queda
+RECONNECT_DELAY_MS = 3000
+
+# Sinal colocado na fila para encerrar o stream de um assinante (ou o despachante)
+_CLOSE = object()
+# Evento de controle: descarta o buffer de replay de um tópico, na ordem dos demais
+_DROP_TOPIC = object()
+
+
+OVERFLOW_DISCONNECT = "disconnect"
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+
+
+class Subscriber:
+    """Um cliente SSE conectado a um tópico"""
+
+    __slots__ = ("topic", "queue", "closed", "dropped", "last_sent", "connected_at")
+
+    def __init__(self, topic: str, max_queue: int):
+        self.topic = topic
+        self.queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self.closed = False
+        self.dropped = 0
+        # Id do último evento escrito na resposta HTTP
+        self.last_sent = 0
+        self.connected_at = time.monotonic()
+
+
+def format_event(event_id: Optional[int], data: Any, event: Optional[str] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class SubscriberHub:
+    """
+    Distribui eventos por tópico (id da conversa) para assinantes SSE.
+
+    ``publish`` só entrega o evento a uma fila sem bloqueio (SimpleQueue) e retorna;
+    uma thread despachante numera os eventos, guarda os últimos ``replay_size`` de
+    cada tópico e faz o fan-out. Assim, quem publica segurando ``_conversation_lock``
+    nunca espera por um assinante. Cliente que reconecta com ``Last-Event-ID``
+    recebe o que perdeu. As filas dos assinantes são limitadas a ``max_queue``; quando
+    enchem, a política ``overflow`` decide: ``"disconnect"`` encerra o stream (o
+    navegador reconecta e recupera pelo replay) e ``"drop_oldest"`` descarta o evento
+    mais antigo da fila.
+
+    Buffers de replay de tópicos sem assinantes são descartados quando ficam sem
+    eventos por mais de ``idle_ttl`` segundos ou, do menos para o mais recentemente
+    publicado, quando há mais de ``max_topics`` buffers (None desliga cada limite).
+    """
+
+    def __init__(
+        self,
+        max_queue: int = 100,
+        replay_size: int = 50,
+        overflow: str = OVERFLOW_DISCONNECT,
+        max_topics: Optional[int] = None,
+        idle_ttl: Optional[float] = None,
+    ):
+        if overflow not in (OVERFLOW_DISCONNECT, OVERFLOW_DROP_OLDEST):
+            raise ValueError(f"política de overflow desconhecida: {overflow}")
+        self.max_queue = max_queue
+        self.replay_size = replay_size
+        self.overflow = overflow
+        self.max_topics = max_topics
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._outbox: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        # Do menos para o mais recentemente publicado (ordem usada no descarte)
+        self._recent: "OrderedDict[str, Deque[Tuple[int, Any]]]" = OrderedDict()
+        self._last_id: Dict[str, int] = {}
+        self._published_at: Dict[str, float] = {}
+        self._stats = {
+            "published": 0,
+            "delivered": 0,
+            "replayed": 0,
+            "dropped": 0,
+            "disconnected_slow": 0,
+            "pruned_topics": 0,
+        }
+
+    def publish(self, topic: str, data: Any) -> None:
+        """Enfileira o evento para o despachante; nunca bloqueia"""
+        if self._dispatcher is None:
+            self._start_dispatcher()
+        self._outbox.put((topic, data))
+
+    def _start_dispatcher(self) -> None:
+        with self._lock:
+            if self._dispatcher is not None:
+                return
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="sse-dispatcher", daemon=True)
+            self._dispatcher.start()
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            item = self._outbox.get()
+            if item is _CLOSE:
+                return
+            if isinstance(item, threading.Event):
+                item.set()
+                continue
+            try:
+                self._dispatch(*item)
+            except Exception as error:
+                logger.error(f"Erro no despacho de evento SSE: {error}")
+
+    def _dispatch(self, topic: str, data: Any) -> None:
+        if data is _DROP_TOPIC:
+            with self._lock:
+                self._forget_topic(topic)
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            event_id = self._last_id.get(topic, 0) + 1
+            self._last_id[topic] = event_id
+            recent = self._recent.get(topic)
+            if recent is None:
+                recent = self._recent[topic] = deque(maxlen=self.replay_size)
+            else:
+                self._recent.move_to_end(topic)
+            recent.append((event_id, data))
+            self._published_at[topic] = now
+            subscribers = list(self._subscribers.get(topic, ()))
+            self._stats["published"] += 1
+            self._prune_topics(now)
+
+        for subscriber in subscribers:
+            self._deliver(subscriber, (event_id, data))
+
+    def _forget_topic(self, topic: str) -> None:
+        self._recent.pop(topic, None)
+        self._last_id.pop(topic, None)
+        self._published_at.pop(topic, None)
+
+    def _prune_topics(self, now: float) -> None:
+        """Descarta buffers de tópicos sem assinantes, ociosos ou além de max_topics (com o lock)"""
+        if self.max_topics is None and self.idle_ttl is None:
+            return
+
+        victims = []
+        for topic in self._recent:
+            over_cap = self.max_topics is not None and len(self._recent) - len(victims) > self.max_topics
+            idle = self.idle_ttl is not None and now - self._published_at[topic] > self.idle_ttl
+            if not over_cap and not idle:
+                break
+            if topic not in self._subscribers:
+                victims.append(topic)
+
+        for topic in victims:
+            self._forget_topic(topic)
+        self._stats["pruned_topics"] += len(victims)
+
+    def _deliver(self, subscriber: Subscriber, item: Tuple[int, Any]) -> None:
+        try:
+            subscriber.queue.put_nowait(item)
+            with self._lock:
+                self._stats["delivered"] += 1
+            return
+        except queue.Full:
+            pass
+
+        if self.overflow == OVERFLOW_DROP_OLDEST:
+            try:
+                subscriber.queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                subscriber.queue.put_nowait(item)
+            except queue.Full:
+                pass
+            subscriber.dropped += 1
+            with self._lock:
+                self._stats["dropped"] += 1
+                self._stats["delivered"] += 1
+            return
+
+        logger.warning(f"Assinante SSE lento desconectado (tópico {subscriber.topic})")
+        with self._lock:
+            self._stats["disconnected_slow"] += 1
+        self._close(subscriber)
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Aguarda o despacho de tudo o que foi publicado até agora"""
+        if self._dispatcher is None:
+            return True
+        marker = threading.Event()
+        self._outbox.put(marker)
+        return marker.wait(timeout)
+
+    def stop(self) -> None:
+        if self._dispatcher is not None:
+            self._outbox.put(_CLOSE)
+            self._dispatcher.join(timeout=5)
+            self._dispatcher = None
+
+    def _close(self, subscriber: Subscriber) -> None:
+        self.unsubscribe(subscriber)
+        # Esvazia a fila para caber o sinal de encerramento
+        while True:
+            try:
+                subscriber.queue.get_nowait()
+            except queue.Empty:
+                break
+        try:
+            subscriber.queue.put_nowait(_CLOSE)
+        except queue.Full:
+            pass
+
+    def subscribe(self, topic: str, last_event_id: Optional[int] = None) -> Tuple[Subscriber, List[Tuple[int, Any]]]:
+        """Registra um assinante; retorna também os eventos a reenviar após ``last_event_id``"""
+        subscriber = Subscriber(topic, self.max_queue)
+        with self._lock:
+            self._subscribers.setdefault(topic, set()).add(subscriber)
+            replay: List[Tuple[int, Any]] = []
+            if last_event_id is not None:
+                recent = self._recent.get(topic, ())
+                if last_event_id > self._last_id.get(topic, 0):
+                    # Id de antes de um reinício do servidor: reenvia tudo o que há no buffer
+                    replay = list(recent)
+                else:
+                    replay = [item for item in recent if item[0] > last_event_id]
+                self._stats["replayed"] += len(replay)
+            subscriber.last_sent = replay[0][0] - 1 if replay else self._last_id.get(topic, 0)
+        return subscriber, replay
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            subscriber.closed = True
+            subscribers = self._subscribers.get(subscriber.topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[subscriber.topic]
+
+    def drop_topic(self, topic: str) -> None:
+        """Descarta o buffer de replay de um tópico removido (conversa apagada)"""
+        self.publish(topic, _DROP_TOPIC)
+
+    def stream(self, topic: str, last_event_id: Optional[int] = None, heartbeat: float = 15.0) -> Iterator[str]:
+        """
+        Gerador de texto SSE para uma resposta HTTP. A inscrição acontece na primeira
+        iteração e é desfeita quando o cliente desconecta (GeneratorExit) ou é
+        desconectado por lentidão.
+        """
+        subscriber, replay = self.subscribe(topic, last_event_id)
+        try:
+            yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+            for event_id, data in replay:
+                yield format_event(event_id, data)
+                subscriber.last_sent = event_id
+
+            while not subscriber.closed:
+                try:
+                    item = subscriber.queue.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Comentário SSE: mantém a conexão viva e detecta cliente desconectado
+                    yield ": heartbeat\n\n"
+                    continue
+                if item is _CLOSE:
+                    break
+                event_id, data = item
+                yield format_event(event_id, data)
+                subscriber.last_sent = event_id
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores do hub e, por assinante, fila, atraso em eventos (lag) e descartes"""
+        now = time.monotonic()
+        with self._lock:
+            subscribers = [
+                {
+                    "topic": subscriber.topic,
+                    "queued": subscriber.queue.qsize(),
+                    "lag": max(self._last_id.get(subscriber.topic, 0) - subscriber.last_sent, 0),
+                    "dropped": subscriber.dropped,
+                    "connected_seconds": round(now - subscriber.connected_at, 1),
+                }
+                for topic_subscribers in self._subscribers.values()
+                for subscriber in topic_subscribers
+            ]
+            return {
+                **self._stats,
+                "overflow_policy": self.overflow,
+                "outbox_backlog": self._outbox.qsize(),
+                "topics": len(self._subscribers),
+                "subscribers": len(subscribers),
+                "buffered_topics": len(self._recent),
+                "buffered_events": sum(len(recent) for recent in self._recent.values()),
+                "max_topics": self.max_topics,
+                "idle_ttl": self.idle_ttl,
+                "subscribers_detail": subscribers,
+            }
@@ -0,0 +1,14 @@
+"""Camada de persistência do histórico de conversas do Aura."""
+
+from .conversation_index import ConversationIndex  # noqa: F401
+from .history_store import JsonHistoryStore, MODE_APPEND, MODE_SNAPSHOT  # noqa: F401
+from .memory_budget import MemoryBudget  # noqa: F401
+from .message_columns import MessageColumns, MessageView  # noqa: F401
+from .repository import (  # noqa: F401
+    BACKEND_JSON,
+    BACKEND_SQLITE,
+    ConversationRepository,
+    create_repository,
+    window_bounds,
+)
+from .write_behind import WriteBehindWriter  # noqa: F401
@@ -0,0 +1,77 @@
+"""Índice das conversas ordenado por lastAt, mantido incrementalmente."""
+
+import threading
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional, Tuple
+
+Key = Tuple[str, str]
+
+
+def encode_cursor(key: Key) -> str:
+    last_at, conversation_id = key
+    return f"{last_at}|{conversation_id}"
+
+
+def decode_cursor(cursor: str) -> Key:
+    """Inverso de encode_cursor; ValueError se o cursor não tiver o formato esperado"""
+    last_at, separator, conversation_id = cursor.partition("|")
+    if not separator:
+        raise ValueError(f"cursor inválido: {cursor!r}")
+    return last_at, conversation_id
+
+
+class ConversationIndex:
+    """
+    Conversas (dicts de Conversation.to_dict()) ordenadas por (lastAt, id). Cada
+    alteração localiza a posição por busca binária, sem reordenar a lista inteira;
+    ``page`` devolve as mais recentes primeiro, a partir de um cursor opcional.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys: List[Key] = []
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._key_of: Dict[str, Key] = {}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._keys)
+
+    def upsert(self, conversation: Dict[str, Any]) -> None:
+        conversation_id = conversation["id"]
+        key = (conversation.get("lastAt") or "", conversation_id)
+        with self._lock:
+            old_key = self._key_of.get(conversation_id)
+            if old_key != key:
+                if old_key is not None:
+                    self._remove_key(old_key)
+                insort(self._keys, key)
+                self._key_of[conversation_id] = key
+            self._entries[conversation_id] = conversation
+
+    def remove(self, conversation_id: str) -> None:
+        with self._lock:
+            key = self._key_of.pop(conversation_id, None)
+            if key is not None:
+                self._remove_key(key)
+            self._entries.pop(conversation_id, None)
+
+    def _remove_key(self, key: Key) -> None:
+        position = bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            del self._keys[position]
+
+    def page(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Conversas da mais recente para a mais antiga, começando logo após ``cursor``
+        (valor de next_cursor de uma página anterior). Retorna (conversas, next_cursor),
+        com next_cursor None quando não há mais páginas.
+        """
+        with self._lock:
+            end = bisect_left(self._keys, decode_cursor(cursor)) if cursor else len(self._keys)
+            start = 0 if limit is None else max(end - limit, 0)
+            keys = self._keys[start:end]
+            conversations = [self._entries[key[1]] for key in reversed(keys)]
+
+        next_cursor = encode_cursor(keys[0]) if keys and start > 0 else None
+        return conversations, next_cursor
@@ -0,0 +1,450 @@
+"""
+Histórico das conversas do Telegram em arquivos JSON.
+
+Dois modos de gravação:
+- snapshot: cada save regrava ``<titulo>_<id>_telegram.json`` inteiro (comportamento original)
+- append: mensagens novas são anexadas em ``<id>_telegram.log`` (uma por linha) e os
+  metadados (título, arquivamento, lastAt...) ficam em ``<id>_telegram.meta.json``.
+  Uma thread de compactação incorpora periodicamente o log ao snapshot.
+
+Um índice persistente id -> arquivo de snapshot evita varrer o diretório a cada
+leitura/gravação; ele é reconciliado com o conteúdo do diretório na inicialização.
+O catálogo guarda só os metadados de cada conversa (to_dict(), total de mensagens e
+mensagens por dia) e é atualizado a cada gravação, para listagens sem abrir históricos.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from .journal import JournaledDict
+from .repository import ConversationRepository
+
+logger = logging.getLogger(__name__)
+
+MODE_SNAPSHOT = "snapshot"
+MODE_APPEND = "append"
+
+SNAPSHOT_SUFFIX = "_telegram.json"
+LOG_SUFFIX = "_telegram.log"
+COMPACTING_SUFFIX = "_telegram.log.compacting"
+META_SUFFIX = "_telegram.meta.json"
+INDEX_FILENAME = "_history_index.json"
+CATALOG_FILENAME = "_catalog.json"
+
+_FILENAME_SANITIZER = re.compile(r"[^a-z0-9_-]+")
+
+
+def sanitize_filename(value: str) -> str:
+    if not value:
+        return "contato"
+
+    normalized = value.strip().lower()
+    sanitized = _FILENAME_SANITIZER.sub("_", normalized)
+    sanitized = re.sub(r"_+", "_", sanitized).strip("_")
+    return sanitized or "contato"
+
+
+def _read_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with path.open("r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def _write_json_atomic(path: Path, data: Dict[str, Any], indent: Optional[int] = None) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("w", encoding="utf-8") as handle:
+        json.dump(data, handle, ensure_ascii=False, indent=indent)
+    tmp_path.replace(path)
+
+
+def _read_log(path: Path) -> List[Dict[str, Any]]:
+    """Lê um log de mensagens, ignorando uma última linha truncada por queda do processo"""
+    messages = []
+    try:
+        with path.open("r", encoding="utf-8") as handle:
+            for line in handle:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    messages.append(json.loads(line))
+                except ValueError:
+                    logger.warning(f"Linha inválida ignorada no log {path.name}")
+    except FileNotFoundError:
+        pass
+    return messages
+
+
+def _date_key(timestamp: Optional[str]) -> Optional[str]:
+    try:
+        return datetime.fromisoformat(timestamp).strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+
+def _count_by_date(messages_by_date: Dict[str, int], timestamps) -> Dict[str, int]:
+    for timestamp in timestamps:
+        key = _date_key(timestamp)
+        if key:
+            messages_by_date[key] = messages_by_date.get(key, 0) + 1
+    return messages_by_date
+
+
+def _merge_messages(messages: List[Dict[str, Any]], pending: List[Dict[str, Any]]) -> None:
+    if not pending:
+        return
+    known_ids = {msg.get("id") for msg in messages}
+    for msg in pending:
+        if msg.get("id") not in known_ids:
+            messages.append(msg)
+            known_ids.add(msg.get("id"))
+
+
+class JsonHistoryStore(ConversationRepository):
+    """Persistência do histórico em arquivos JSON (modo snapshot ou append-only)"""
+
+    def __init__(self, data_dir: Path, mode: str = MODE_SNAPSHOT, compact_threshold: int = 500):
+        if mode not in (MODE_SNAPSHOT, MODE_APPEND):
+            logger.warning(f"Modo de histórico desconhecido '{mode}', usando '{MODE_SNAPSHOT}'")
+            mode = MODE_SNAPSHOT
+
+        self.data_dir = data_dir
+        self.mode = mode
+        self.compact_threshold = max(1, compact_threshold)
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.RLock()
+        # Quantas mensagens de cada conversa já estão no disco (snapshot + log)
+        self._persisted: Dict[str, int] = {}
+        # Linhas acumuladas no log desde a última compactação (presente = há arquivos de append)
+        self._log_lines: Dict[str, int] = {}
+        self._stop_event = threading.Event()
+        self._compactor: Optional[threading.Thread] = None
+
+        # id da conversa -> nome do arquivo de snapshot ("" quando só há log/metadados)
+        self._index = JournaledDict(self.data_dir / INDEX_FILENAME)
+        self._reconcile_index()
+
+        # id da conversa -> {"conversation": to_dict(), "messageCount": n, "messagesByDate": {...}}
+        self._catalog = JournaledDict(self.data_dir / CATALOG_FILENAME)
+        self._reconcile_catalog()
+
+    # --- Caminhos ---
+    def snapshot_path(self, title: str, conversation_id: str) -> Path:
+        safe_title = sanitize_filename(title or conversation_id)
+        return self.data_dir / f"{safe_title}_{conversation_id}{SNAPSHOT_SUFFIX}"
+
+    def find_snapshot(self, conversation_id: str) -> Optional[Path]:
+        filename = self._index.get(conversation_id)
+        return self.data_dir / filename if filename else None
+
+    def _log_path(self, conversation_id: str) -> Path:
+        return self.data_dir / f"{conversation_id}{LOG_SUFFIX}"
+
+    def _compacting_path(self, conversation_id: str) -> Path:
+        return self.data_dir / f"{conversation_id}{COMPACTING_SUFFIX}"
+
+    def _meta_path(self, conversation_id: str) -> Path:
+        return self.data_dir / f"{conversation_id}{META_SUFFIX}"
+
+    # --- Índice ---
+    def _reconcile_index(self) -> None:
+        """Alinha o índice persistido com os arquivos realmente presentes no diretório"""
+        snapshot_files = set()
+        append_ids = set()
+        for entry in os.scandir(self.data_dir):
+            name = entry.name
+            if name.endswith(SNAPSHOT_SUFFIX):
+                snapshot_files.add(name)
+            elif name.endswith(META_SUFFIX):
+                append_ids.add(name[: -len(META_SUFFIX)])
+            elif name.endswith(LOG_SUFFIX):
+                append_ids.add(name[: -len(LOG_SUFFIX)])
+            elif name.endswith(COMPACTING_SUFFIX):
+                append_ids.add(name[: -len(COMPACTING_SUFFIX)])
+
+        indexed_files = set()
+        for conversation_id, filename in self._index.items():
+            if filename and filename in snapshot_files:
+                indexed_files.add(filename)
+            elif conversation_id in append_ids:
+                self._index.set(conversation_id, "")
+            else:
+                self._index.delete(conversation_id)
+
+        for filename in snapshot_files - indexed_files:
+            try:
+                data = _read_json(self.data_dir / filename) or {}
+            except Exception as error:
+                logger.error(f"Erro ao ler histórico em {filename}: {error}")
+                continue
+            conversation_id = str(data.get("id") or data.get("conversation_id") or "").strip()
+            if conversation_id and not self._index.get(conversation_id):
+                self._index.set(conversation_id, filename)
+
+        for conversation_id in append_ids:
+            if conversation_id not in self._index:
+                self._index.set(conversation_id, "")
+            # Contagem real das linhas é feita no primeiro load da conversa
+            self._log_lines.setdefault(conversation_id, 0)
+
+        self._index.compact()
+        logger.info(f"Índice de histórico carregado: {len(self._index)} conversas")
+
+    def _reconcile_catalog(self) -> None:
+        """Remove entradas órfãs e cataloga históricos que ainda não têm entrada"""
+        for conversation_id in self._catalog.keys():
+            if conversation_id not in self._index:
+                self._catalog.delete(conversation_id)
+
+        missing = [cid for cid in self._index.keys() if cid not in self._catalog]
+        for conversation_id in missing:
+            try:
+                data = self.load(conversation_id)
+            except Exception as error:
+                logger.error(f"Erro ao catalogar histórico da conversa {conversation_id}: {error}")
+                continue
+            if data is None:
+                continue
+            conversation = {key: value for key, value in data.items() if key != "messages"}
+            self._catalog.set(conversation_id, {
+                "conversation": conversation,
+                "messageCount": len(data["messages"]),
+                "messagesByDate": _count_by_date({}, (msg.get("timestamp") for msg in data["messages"])),
+            })
+
+        if missing:
+            self._catalog.compact()
+            logger.info(f"Catálogo de conversas: {len(missing)} históricos catalogados")
+
+    # --- Leitura ---
+    def get_metadata(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Entrada do catálogo da conversa, sem carregar as mensagens"""
+        return self._catalog.get(conversation_id)
+
+    def list_metadata(self) -> List[Dict[str, Any]]:
+        """Entradas do catálogo de todas as conversas persistidas"""
+        return [entry for _, entry in self._catalog.items()]
+
+    def list_conversations(self) -> List[str]:
+        """Lista os ids de todas as conversas com histórico em disco"""
+        return self._index.keys()
+
+    def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Carrega a conversa completa, aplicando metadados e log sobre o snapshot"""
+        with self._lock:
+            snapshot_path = self.find_snapshot(conversation_id)
+            data = _read_json(snapshot_path) if snapshot_path else None
+            meta, compacting, appended = None, [], []
+            if conversation_id in self._log_lines:
+                meta = _read_json(self._meta_path(conversation_id))
+                compacting = _read_log(self._compacting_path(conversation_id))
+                appended = _read_log(self._log_path(conversation_id))
+
+            if data is None and meta is None and not compacting and not appended:
+                return None
+
+            data = data or {"id": conversation_id}
+            if meta:
+                data.update(meta)
+            messages = data.setdefault("messages", [])
+            _merge_messages(messages, compacting)
+            _merge_messages(messages, appended)
+
+            self._persisted[conversation_id] = len(messages)
+            if conversation_id in self._log_lines:
+                self._log_lines[conversation_id] = len(compacting) + len(appended)
+            return data
+
+    # --- Escrita ---
+    def save(self, conversation: Dict[str, Any], messages: Sequence[Any]) -> None:
+        """
+        Persiste a conversa. ``conversation`` são os metadados (Conversation.to_dict())
+        e ``messages`` a lista de objetos com to_dict(); no modo append apenas as
+        mensagens ainda não gravadas são serializadas.
+        """
+        with self._lock:
+            conversation_id = conversation["id"]
+            persisted = self._persisted.get(conversation_id, 0)
+
+            if self.mode == MODE_SNAPSHOT or persisted > len(messages):
+                self._write_full(conversation, messages)
+                return
+
+            new_messages = messages[persisted:]
+            self._rename_snapshot(conversation)
+
+            if new_messages:
+                lines = "".join(
+                    json.dumps(msg.to_dict(), ensure_ascii=False) + "\n" for msg in new_messages
+                )
+                with self._log_path(conversation_id).open("a", encoding="utf-8") as handle:
+                    handle.write(lines)
+
+            _write_json_atomic(self._meta_path(conversation_id), conversation)
+            self._persisted[conversation_id] = persisted + len(new_messages)
+            self._log_lines[conversation_id] = self._log_lines.get(conversation_id, 0) + len(new_messages)
+
+            # Só os dias das mensagens novas, com o total atualizado de cada um
+            previous_days = (self._catalog.get(conversation_id) or {}).get("messagesByDate") or {}
+            new_days = _count_by_date({}, (msg.timestamp for msg in new_messages))
+            self._catalog.update(conversation_id, {
+                "conversation": conversation,
+                "messageCount": persisted + len(new_messages),
+                "messagesByDate": {day: previous_days.get(day, 0) + count for day, count in new_days.items()},
+            })
+
+    def _write_full(self, conversation: Dict[str, Any], messages: Sequence[Any]) -> None:
+        conversation_id = conversation["id"]
+        messages = list(messages)
+        new_path = self.snapshot_path(conversation["title"], conversation_id)
+        existing_path = self.find_snapshot(conversation_id)
+
+        data = dict(conversation)
+        data["messages"] = [msg.to_dict() for msg in messages]
+        _write_json_atomic(new_path, data, indent=2)
+        self._index.set(conversation_id, new_path.name)
+
+        if existing_path and existing_path != new_path:
+            try:
+                existing_path.unlink()
+            except OSError as remove_error:
+                logger.warning(f"Não foi possível remover histórico antigo {existing_path}: {remove_error}")
+
+        if self._log_lines.pop(conversation_id, None) is not None:
+            self._remove_append_files(conversation_id)
+        self._persisted[conversation_id] = len(messages)
+
+        entry = {
+            "conversation": conversation,
+            "messageCount": len(messages),
+            "messagesByDate": _count_by_date({}, (msg.get("timestamp") for msg in data["messages"])),
+        }
+        previous_days = (self._catalog.get(conversation_id) or {}).get("messagesByDate") or {}
+        if previous_days.keys() <= entry["messagesByDate"].keys():
+            # Lista só cresceu: o journal recebe apenas os dias cuja contagem mudou
+            self._catalog.update(conversation_id, entry)
+        else:
+            self._catalog.set(conversation_id, entry)
+
+    def _rename_snapshot(self, conversation: Dict[str, Any]) -> None:
+        conversation_id = conversation["id"]
+        existing_path = self.find_snapshot(conversation_id)
+        if not existing_path:
+            if conversation_id not in self._index:
+                self._index.set(conversation_id, "")
+            return
+
+        new_path = self.snapshot_path(conversation["title"], conversation_id)
+        if existing_path != new_path:
+            existing_path.replace(new_path)
+            self._index.set(conversation_id, new_path.name)
+
+    def _remove_append_files(self, conversation_id: str) -> None:
+        for path in (
+            self._log_path(conversation_id),
+            self._compacting_path(conversation_id),
+            self._meta_path(conversation_id),
+        ):
+            path.unlink(missing_ok=True)
+
+    def delete(self, conversation_id: str) -> None:
+        with self._lock:
+            history_path = self.find_snapshot(conversation_id)
+            if history_path:
+                history_path.unlink(missing_ok=True)
+            self._remove_append_files(conversation_id)
+            self._index.delete(conversation_id)
+            self._catalog.delete(conversation_id)
+            self._persisted.pop(conversation_id, None)
+            self._log_lines.pop(conversation_id, None)
+
+    # --- Compactação ---
+    def compact(self, conversation_id: str) -> bool:
+        """Incorpora o log de mensagens ao snapshot da conversa"""
+        log_path = self._log_path(conversation_id)
+        compacting_path = self._compacting_path(conversation_id)
+
+        with self._lock:
+            if not compacting_path.exists():
+                if not log_path.exists():
+                    return False
+                log_path.replace(compacting_path)
+            self._log_lines[conversation_id] = 0
+            snapshot_path = self.find_snapshot(conversation_id)
+
+        # A mesclagem e a escrita do novo snapshot acontecem fora do lock;
+        # novas mensagens continuam indo para um log novo enquanto isso.
+        data = _read_json(snapshot_path) if snapshot_path else {"id": conversation_id}
+        if data is None:
+            # Snapshot renomeado no meio do caminho; tenta de novo na próxima rodada
+            return False
+        messages = data.setdefault("messages", [])
+        _merge_messages(messages, _read_log(compacting_path))
+
+        tmp_path = self.data_dir / f"{conversation_id}{SNAPSHOT_SUFFIX}.compact.tmp"
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            json.dump(data, handle, ensure_ascii=False, indent=2)
+
+        with self._lock:
+            meta = _read_json(self._meta_path(conversation_id))
+            if meta is None or not compacting_path.exists():
+                # Conversa removida durante a compactação
+                tmp_path.unlink(missing_ok=True)
+                return False
+
+            new_path = self.snapshot_path(meta.get("title", ""), conversation_id)
+            current_path = self.find_snapshot(conversation_id)
+            tmp_path.replace(new_path)
+            self._index.set(conversation_id, new_path.name)
+            if current_path and current_path != new_path:
+                current_path.unlink(missing_ok=True)
+            compacting_path.unlink()
+
+        logger.info(f"Histórico compactado: {conversation_id} ({len(messages)} mensagens)")
+        return True
+
+    def compact_pending(self) -> int:
+        """Compacta as conversas cujo log atingiu o limite configurado"""
+        with self._lock:
+            candidates = [
+                conversation_id
+                for conversation_id, lines in self._log_lines.items()
+                if lines >= self.compact_threshold
+            ]
+
+        compacted = 0
+        for conversation_id in candidates:
+            try:
+                if self.compact(conversation_id):
+                    compacted += 1
+            except Exception as error:
+                logger.error(f"Erro ao compactar histórico da conversa {conversation_id}: {error}")
+        return compacted
+
+    def start_compactor(self, interval: float = 60.0) -> None:
+        """Inicia a thread de compactação em segundo plano (apenas no modo append)"""
+        if self.mode != MODE_APPEND or self._compactor is not None:
+            return
+
+        def _run():
+            while not self._stop_event.wait(interval):
+                self.compact_pending()
+
+        self._compactor = threading.Thread(target=_run, name="history-compactor", daemon=True)
+        self._compactor.start()
+        logger.info(f"Compactação de histórico iniciada (intervalo {interval}s, limite {self.compact_threshold} linhas)")
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._compactor is not None:
+            self._compactor.join(timeout=5)
+            self._compactor = None
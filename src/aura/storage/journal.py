@@ -0,0 +1,151 @@
+"""Dicionário persistente: snapshot JSON + journal append-only de alterações."""
+
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def _merge_fields(entry: Any, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Nova entrada com ``fields`` aplicados; campos dict são mesclados ao dict existente"""
+    merged = dict(entry) if isinstance(entry, dict) else {}
+    for field, value in fields.items():
+        previous = merged.get(field)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            value = {**previous, **value}
+        merged[field] = value
+    return merged
+
+
+def _changed_fields(entry: Dict[str, Any], fields: Dict[str, Any]) -> Dict[str, Any]:
+    """Só o que ``fields`` altera em ``entry`` (em campos dict, só as chaves alteradas)"""
+    changes = {}
+    for field, value in fields.items():
+        previous = entry.get(field, _MISSING)
+        if isinstance(value, dict) and isinstance(previous, dict):
+            value = {key: item for key, item in value.items() if previous.get(key, _MISSING) != item}
+            if value:
+                changes[field] = value
+        elif previous != value:
+            changes[field] = value
+    return changes
+
+
+class JournaledDict:
+    """
+    Mapa em memória cujas alterações são anexadas a um journal (O(1) por escrita).
+    ``update`` anota só os campos alterados de uma entrada, então o tamanho da linha
+    não cresce com a entrada. O journal é incorporado ao snapshot quando passa de
+    ``compact_every`` linhas.
+    Uma última linha truncada por queda do processo é ignorada na leitura.
+    """
+
+    def __init__(self, path: Path, compact_every: int = 1000):
+        self._snapshot_path = path
+        self._journal_path = path.with_suffix(".journal")
+        self._compact_every = max(1, compact_every)
+        self._lock = threading.Lock()
+        self._data: Dict[str, Any] = {}
+        self._journal_lines = 0
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with self._snapshot_path.open("r", encoding="utf-8") as handle:
+                self._data = json.load(handle)
+        except FileNotFoundError:
+            self._data = {}
+        except ValueError as error:
+            logger.warning(f"Snapshot inválido em {self._snapshot_path.name}, reconstruindo: {error}")
+            self._data = {}
+
+        try:
+            with self._journal_path.open("r", encoding="utf-8") as handle:
+                for line in handle:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    self._journal_lines += 1
+                    if entry.get("d"):
+                        self._data.pop(entry["k"], None)
+                    elif "u" in entry:
+                        self._data[entry["k"]] = _merge_fields(self._data.get(entry["k"]), entry["u"])
+                    else:
+                        self._data[entry["k"]] = entry.get("v")
+        except FileNotFoundError:
+            pass
+
+    # --- Leitura ---
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._data.get(key, default)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._data.keys())
+
+    def items(self) -> List[Tuple[str, Any]]:
+        with self._lock:
+            return list(self._data.items())
+
+    # --- Escrita ---
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            if key in self._data and self._data[key] == value:
+                return
+            self._data[key] = value
+            self._append({"k": key, "v": value})
+
+    def update(self, key: str, fields: Dict[str, Any]) -> None:
+        """
+        Altera campos de uma entrada dict. Campos cujo valor é dict são mesclados ao
+        existente (chaves ausentes continuam); o journal recebe só o que mudou.
+        A entrada é substituída por uma cópia, nunca alterada no lugar.
+        """
+        with self._lock:
+            current = self._data.get(key)
+            if not isinstance(current, dict):
+                current = {}
+            changes = _changed_fields(current, fields)
+            if not changes and key in self._data:
+                return
+            self._data[key] = _merge_fields(current, changes)
+            self._append({"k": key, "u": changes})
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key not in self._data:
+                return
+            del self._data[key]
+            self._append({"k": key, "d": 1})
+
+    def _append(self, entry: Dict[str, Any]) -> None:
+        with self._journal_path.open("a", encoding="utf-8") as handle:
+            handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._journal_lines += 1
+        if self._journal_lines >= self._compact_every:
+            self._compact_locked()
+
+    def compact(self) -> None:
+        with self._lock:
+            self._compact_locked()
+
+    def _compact_locked(self) -> None:
+        tmp_path = self._snapshot_path.with_name(self._snapshot_path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            json.dump(self._data, handle, ensure_ascii=False)
+        tmp_path.replace(self._snapshot_path)
+        # Só depois do snapshot estar no lugar o journal pode ser descartado
+        self._journal_path.unlink(missing_ok=True)
+        self._journal_lines = 0
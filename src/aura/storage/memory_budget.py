@@ -0,0 +1,137 @@
+"""Orçamento de memória das conversas residentes, com despejo LRU das listas de mensagens."""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Sequence
+
+# Custo fixo aproximado de uma mensagem residente em MessageColumns (id e entradas
+# das colunas; ver src/aura/benchmarks/message_memory.py)
+MESSAGE_OVERHEAD_BYTES = 160
+
+
+def estimate_message_bytes(message: Any) -> int:
+    """Estimativa do espaço ocupado por uma mensagem; o texto é a parte variável"""
+    return MESSAGE_OVERHEAD_BYTES + sys.getsizeof(getattr(message, "text", "") or "")
+
+
+class MemoryBudget:
+    """
+    Acompanha as conversas residentes em ordem de uso (LRU) e o tamanho de cada uma,
+    em mensagens e bytes estimados. Quando o total passa de ``max_messages`` ou
+    ``max_bytes`` (0 desliga o limite), ``eviction_candidates`` devolve as conversas
+    menos usadas, ignorando as fixadas e as usadas há menos de ``min_idle`` segundos.
+    Quem despeja deve chamar ``evicted`` para atualizar os totais.
+    """
+
+    def __init__(self, max_messages: int = 0, max_bytes: int = 0, min_idle: float = 30.0):
+        self.max_messages = max(0, max_messages)
+        self.max_bytes = max(0, max_bytes)
+        self.min_idle = max(0.0, min_idle)
+        self._lock = threading.Lock()
+        # id da conversa -> instante do último uso, do menos para o mais recente
+        self._recency: "OrderedDict[str, float]" = OrderedDict()
+        # id da conversa -> [mensagens contadas, bytes estimados]
+        self._sizes: Dict[str, List[int]] = {}
+        self._pins: Dict[str, int] = {}
+        self._messages = 0
+        self._bytes = 0
+        self._stats = {
+            "evictions": 0,
+            "evicted_messages": 0,
+            "evicted_bytes": 0,
+        }
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_messages or self.max_bytes)
+
+    def touch(self, conversation_id: str, messages: Sequence[Any]) -> None:
+        """Marca a conversa como usada agora e contabiliza mensagens novas"""
+        with self._lock:
+            self._recency[conversation_id] = time.monotonic()
+            self._recency.move_to_end(conversation_id)
+
+            size = self._sizes.setdefault(conversation_id, [0, 0])
+            count = len(messages)
+            if count < size[0]:
+                # Lista substituída (recarga do disco): recalcula do zero
+                self._messages -= size[0]
+                self._bytes -= size[1]
+                size[0] = size[1] = 0
+
+            added = sum(estimate_message_bytes(msg) for msg in messages[size[0]:count])
+            self._messages += count - size[0]
+            self._bytes += added
+            size[0] = count
+            size[1] += added
+
+    def forget(self, conversation_id: str) -> None:
+        """Remove a conversa da contabilidade (deleção ou despejo)"""
+        with self._lock:
+            self._forget(conversation_id)
+
+    def _forget(self, conversation_id: str) -> List[int]:
+        self._recency.pop(conversation_id, None)
+        size = self._sizes.pop(conversation_id, [0, 0])
+        self._messages -= size[0]
+        self._bytes -= size[1]
+        return size
+
+    def pin(self, conversation_id: str) -> None:
+        """Impede o despejo enquanto a conversa está em uso por uma requisição"""
+        with self._lock:
+            self._pins[conversation_id] = self._pins.get(conversation_id, 0) + 1
+
+    def unpin(self, conversation_id: str) -> None:
+        with self._lock:
+            remaining = self._pins.get(conversation_id, 0) - 1
+            if remaining > 0:
+                self._pins[conversation_id] = remaining
+            else:
+                self._pins.pop(conversation_id, None)
+
+    def over_budget(self) -> bool:
+        with self._lock:
+            return self._over_budget()
+
+    def _over_budget(self) -> bool:
+        return bool(
+            (self.max_messages and self._messages > self.max_messages)
+            or (self.max_bytes and self._bytes > self.max_bytes)
+        )
+
+    def eviction_candidates(self) -> Iterator[str]:
+        """Conversas despejáveis, da menos para a mais recentemente usada, enquanto o orçamento estiver estourado"""
+        with self._lock:
+            idle_before = time.monotonic() - self.min_idle
+            candidates = [
+                conversation_id
+                for conversation_id, last_used in self._recency.items()
+                if last_used <= idle_before and conversation_id not in self._pins
+            ]
+
+        for conversation_id in candidates:
+            if not self.over_budget():
+                return
+            yield conversation_id
+
+    def evicted(self, conversation_id: str) -> None:
+        with self._lock:
+            messages, estimated_bytes = self._forget(conversation_id)
+            self._stats["evictions"] += 1
+            self._stats["evicted_messages"] += messages
+            self._stats["evicted_bytes"] += estimated_bytes
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self._stats,
+                "resident_conversations": len(self._sizes),
+                "resident_messages": self._messages,
+                "resident_bytes_estimate": self._bytes,
+                "max_messages": self.max_messages,
+                "max_bytes": self.max_bytes,
+                "pinned": len(self._pins),
+            }
@@ -0,0 +1,222 @@
+"""Armazenamento colunar das mensagens de uma conversa residente em memória."""
+
+from array import array
+from collections.abc import Sequence
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EPOCH_NAIVE = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+_MINUTE = timedelta(minutes=1)
+# Deslocamento usado para timestamps sem fuso horário
+_NAIVE_OFFSET = -32768
+
+# Valores conhecidos de sender e platform, guardados como código de um byte. A tabela é
+# fechada: sender vem do corpo das requisições, e qualquer outro valor fica em texto no
+# dicionário da própria coluna (posição -> string) com o código _RAW_SYMBOL.
+_SYMBOLS = ("user", "bot", "operator", "telegram")
+_SYMBOL_CODES = {value: code for code, value in enumerate(_SYMBOLS)}
+_RAW_SYMBOL = 255
+
+
+@lru_cache(maxsize=None)
+def _tz(offset_minutes: int) -> timezone:
+    return timezone(offset_minutes * _MINUTE)
+
+
+def _decode_symbol(code: int, raw: Dict[int, str], index: int) -> str:
+    return raw[index] if code == _RAW_SYMBOL else _SYMBOLS[code]
+
+
+def encode_timestamp(timestamp: str) -> Optional[Tuple[int, int]]:
+    """
+    Converte um timestamp ISO em (microssegundos desde a época, deslocamento em minutos).
+    Retorna None quando a conversão de volta não reproduziria a string original.
+    """
+    try:
+        moment = datetime.fromisoformat(timestamp)
+    except (TypeError, ValueError):
+        return None
+    if moment.isoformat() != timestamp:
+        return None
+
+    offset = moment.utcoffset()
+    if offset is None:
+        return (moment - _EPOCH_NAIVE) // _MICROSECOND, _NAIVE_OFFSET
+    if offset % _MINUTE:
+        return None
+    return (moment - _EPOCH) // _MICROSECOND, offset // _MINUTE
+
+
+def decode_timestamp(micros: int, offset_minutes: int) -> str:
+    if offset_minutes == _NAIVE_OFFSET:
+        return (_EPOCH_NAIVE + micros * _MICROSECOND).isoformat()
+    return (_EPOCH + micros * _MICROSECOND).astimezone(_tz(offset_minutes)).isoformat()
+
+
+class MessageColumns(Sequence):
+    """
+    Lista de mensagens guardada em colunas: ids e textos em listas, sender e platform
+    como códigos de uma tabela fixa (valores fora dela em texto), timestamps em microssegundos desde a
+    época e ``read`` em um bytearray. Os itens devolvidos são objetos
+    ``message_type`` montados na leitura (cópias; alterá-los não altera a coluna).
+    Suporta o que o app usa de uma lista: len, índice, fatias, iteração, append,
+    extend, sort e clear.
+    """
+
+    __slots__ = (
+        "_message_type",
+        "_ids",
+        "_texts",
+        "_senders",
+        "_platforms",
+        "_raw_senders",
+        "_raw_platforms",
+        "_times",
+        "_offsets",
+        "_raw_times",
+        "_read",
+    )
+
+    def __init__(self, message_type: Callable[..., Any], messages: Iterable[Any] = ()):
+        self._message_type = message_type
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._senders = array("B")
+        self._platforms = array("B")
+        # sender/platform fora de _SYMBOLS (posição -> string)
+        self._raw_senders: Dict[int, str] = {}
+        self._raw_platforms: Dict[int, str] = {}
+        self._times = array("q")
+        self._offsets = array("h")
+        # Timestamps que não sobrevivem à conversão, guardados como texto (posição -> string)
+        self._raw_times: Dict[int, str] = {}
+        self._read = bytearray()
+        self.extend(messages)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _build(self, index: int) -> Any:
+        raw = self._raw_times.get(index) if self._raw_times else None
+        return self._message_type(
+            id=self._ids[index],
+            sender=_decode_symbol(self._senders[index], self._raw_senders, index),
+            text=self._texts[index],
+            timestamp=raw if raw is not None else decode_timestamp(self._times[index], self._offsets[index]),
+            read=bool(self._read[index]),
+            platform=_decode_symbol(self._platforms[index], self._raw_platforms, index),
+        )
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._build(position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("índice de mensagem fora do intervalo")
+        return self._build(index)
+
+    def __iter__(self) -> Iterator[Any]:
+        for index in range(len(self)):
+            yield self._build(index)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (MessageColumns, list)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"MessageColumns({len(self)} mensagens)"
+
+    def append(self, message: Any) -> None:
+        # Tudo é convertido antes de tocar nas colunas: uma falha aqui não deixa
+        # colunas com tamanhos diferentes
+        index = len(self._ids)
+        message_id, text, sender, platform = message.id, message.text, message.sender, message.platform
+        sender_code = _SYMBOL_CODES.get(sender, _RAW_SYMBOL)
+        platform_code = _SYMBOL_CODES.get(platform, _RAW_SYMBOL)
+        encoded = encode_timestamp(message.timestamp)
+        raw_time = None
+        if encoded is None:
+            raw_time = message.timestamp
+            encoded = (0, 0)
+        read = 1 if message.read else 0
+
+        if sender_code == _RAW_SYMBOL:
+            self._raw_senders[index] = sender
+        if platform_code == _RAW_SYMBOL:
+            self._raw_platforms[index] = platform
+        if raw_time is not None:
+            self._raw_times[index] = raw_time
+        self._texts.append(text)
+        self._senders.append(sender_code)
+        self._platforms.append(platform_code)
+        self._times.append(encoded[0])
+        self._offsets.append(encoded[1])
+        self._read.append(read)
+        # Por último: len() só passa a contar a mensagem com todas as colunas preenchidas
+        self._ids.append(message_id)
+
+    def extend(self, messages: Iterable[Any]) -> None:
+        for message in messages:
+            self.append(message)
+
+    def clear(self) -> None:
+        self._ids.clear()
+        self._texts.clear()
+        del self._senders[:]
+        del self._platforms[:]
+        self._raw_senders.clear()
+        self._raw_platforms.clear()
+        del self._times[:]
+        del self._offsets[:]
+        self._raw_times.clear()
+        self._read.clear()
+
+    def sort(self, key: Optional[Callable[[Any], Any]] = None, reverse: bool = False) -> None:
+        messages = list(self)
+        messages.sort(key=key, reverse=reverse)
+        self.clear()
+        self.extend(messages)
+
+    def view(self) -> "MessageView":
+        """Visão somente leitura das mensagens atuais (ver ``MessageView``)"""
+        return MessageView(self, len(self))
+
+
+class MessageView(Sequence):
+    """
+    Prefixo imutável de um ``MessageColumns``: as ``length`` primeiras mensagens no
+    momento em que a visão foi criada. Como as colunas só crescem por ``append``,
+    a visão pode ser lida sem lock enquanto outra thread acrescenta mensagens.
+    ``clear``/``sort`` invalidam visões existentes: quem precisa reordenar deve
+    montar um ``MessageColumns`` novo.
+    """
+
+    __slots__ = ("source", "_length")
+
+    def __init__(self, source: MessageColumns, length: int):
+        self.source = source
+        self._length = length
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.source._build(position) for position in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("índice de mensagem fora do intervalo")
+        return self.source._build(index)
+
+    def __iter__(self) -> Iterator[Any]:
+        for index in range(self._length):
+            yield self.source._build(index)
+
+    def __repr__(self) -> str:
+        return f"MessageView({self._length} mensagens)"
@@ -0,0 +1,122 @@
+"""Contrato comum dos backends de persistência de conversas."""
+
+import logging
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+BACKEND_JSON = "json"
+BACKEND_SQLITE = "sqlite"
+
+
+def window_bounds(total: int, before: Optional[int] = None, after: Optional[int] = None, limit: int = 50) -> Tuple[int, int, bool]:
+    """
+    Limites ``[início, fim)`` de uma janela paginada por cursor e se ainda há mensagens
+    na direção paginada. O cursor é o seq da mensagem: sua posição na ordem em que as
+    mensagens foram gravadas, igual em memória e em todos os backends.
+    ``after`` avança para mensagens mais novas, ``before`` (ou nenhum cursor, que
+    significa o fim da conversa) recua para as mais antigas.
+    """
+    if after is not None:
+        start = min(max(after + 1, 0), total)
+        end = min(start + limit, total)
+        return start, end, end < total
+
+    end = total if before is None else min(max(before, 0), total)
+    start = max(end - limit, 0)
+    return start, end, start > 0
+
+
+class ConversationRepository(ABC):
+    """
+    Persistência de conversas usada pelo app.
+
+    ``save`` recebe os metadados (Conversation.to_dict()) e a lista de mensagens
+    (objetos com to_dict()); cada backend grava apenas o que ainda não está salvo.
+    As entradas de metadados têm o formato
+    ``{"conversation": {...}, "messageCount": n, "messagesByDate": {"AAAA-MM-DD": n}}``.
+    """
+
+    mode: str = ""
+    # True quando get_messages consulta o armazenamento sem carregar a conversa inteira
+    supports_paging: bool = False
+
+    @abstractmethod
+    def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Conversa completa (metadados + "messages") ou None"""
+
+    @abstractmethod
+    def save(self, conversation: Dict[str, Any], messages: Sequence[Any]) -> None:
+        """Persiste metadados e mensagens novas"""
+
+    @abstractmethod
+    def delete(self, conversation_id: str) -> None:
+        """Remove a conversa e suas mensagens"""
+
+    @abstractmethod
+    def get_metadata(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        """Entrada de metadados da conversa, sem mensagens"""
+
+    @abstractmethod
+    def list_metadata(self) -> List[Dict[str, Any]]:
+        """Entradas de metadados de todas as conversas"""
+
+    @abstractmethod
+    def list_conversations(self) -> List[str]:
+        """Ids de todas as conversas persistidas"""
+
+    def get_messages(self, conversation_id: str, offset: int = 0, limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """Página de mensagens (dicts) na ordem de gravação, ou None se a conversa não existe"""
+        data = self.load(conversation_id)
+        if data is None:
+            return None
+        messages = data.get("messages", [])
+        return messages[offset : offset + limit] if limit is not None else messages[offset:]
+
+    def get_message_window(
+        self,
+        conversation_id: str,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        limit: int = 50,
+    ) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+        """Janela de mensagens por cursor (cada uma com "seq") e se há mais; None se a conversa não existe"""
+        data = self.load(conversation_id)
+        if data is None:
+            return None
+        messages = data.get("messages", [])
+        start, end, has_more = window_bounds(len(messages), before, after, limit)
+        return [dict(msg, seq=start + index) for index, msg in enumerate(messages[start:end])], has_more
+
+    def start_compactor(self, interval: float = 60.0) -> None:
+        """Inicia tarefas de manutenção em segundo plano, quando o backend tiver"""
+
+    def stop(self) -> None:
+        """Encerra as tarefas de manutenção"""
+
+
+def create_repository(
+    backend: str,
+    data_dir: Path,
+    history_mode: str = "snapshot",
+    compact_threshold: int = 500,
+    sqlite_path: Optional[Path] = None,
+) -> ConversationRepository:
+    """Cria o backend configurado; o SQLite importa o histórico JSON existente na primeira vez"""
+    from .history_store import JsonHistoryStore
+
+    if backend == BACKEND_SQLITE:
+        # Import tardio: SQLAlchemy só é necessário para o backend SQLite
+        from .sqlite_repository import SqliteConversationRepository
+
+        repository = SqliteConversationRepository(sqlite_path or data_dir.parent / "aura.db")
+        if repository.is_empty() and data_dir.exists() and any(data_dir.glob("*_telegram*")):
+            repository.import_from(JsonHistoryStore(data_dir, mode=history_mode))
+        return repository
+
+    if backend != BACKEND_JSON:
+        logger.warning(f"Backend de conversas desconhecido '{backend}', usando '{BACKEND_JSON}'")
+
+    return JsonHistoryStore(data_dir, mode=history_mode, compact_threshold=compact_threshold)
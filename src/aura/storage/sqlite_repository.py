@@ -0,0 +1,368 @@
+"""Backend SQLite (via SQLAlchemy) para conversas e mensagens."""
+
+import json
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    Text,
+    create_engine,
+    delete,
+    event,
+    func,
+    select,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .repository import BACKEND_SQLITE, ConversationRepository
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+conversations_table = Table(
+    "conversations",
+    metadata,
+    Column("id", String, primary_key=True),
+    Column("title", String, nullable=False, default=""),
+    Column("created_at", String),
+    Column("participants", Text, nullable=False, default="[]"),
+    Column("last_message", Text, nullable=False, default=""),
+    Column("last_at", String),
+    Column("is_archived", Boolean, nullable=False, default=False),
+    Column("platform", String, nullable=False, default="telegram"),
+    Column("chat_type", String, nullable=False, default="private"),
+    Column("is_bot_conversation", Boolean, nullable=False, default=False),
+    Column("message_count", Integer, nullable=False, default=0),
+    Index("ix_conversations_last_at", "last_at"),
+)
+
+messages_table = Table(
+    "messages",
+    metadata,
+    Column("conversation_id", String, primary_key=True),
+    Column("seq", Integer, primary_key=True),
+    Column("id", String, nullable=False),
+    Column("sender", String, nullable=False),
+    Column("text", Text, nullable=False, default=""),
+    Column("timestamp", String, nullable=False),
+    Column("read", Boolean, nullable=False, default=False),
+    Column("platform", String, nullable=False, default="telegram"),
+    Index("ix_messages_conversation_timestamp", "conversation_id", "timestamp"),
+)
+
+# Mensagens por conversa e dia, mantido a cada inserção para as estatísticas
+message_days_table = Table(
+    "message_days",
+    metadata,
+    Column("conversation_id", String, primary_key=True),
+    Column("day", String, primary_key=True),
+    Column("count", Integer, nullable=False, default=0),
+)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.close()
+
+
+def _day(timestamp: Optional[str]) -> Optional[str]:
+    try:
+        return datetime.fromisoformat(timestamp).strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None
+
+
+def _conversation_row(conversation: Dict[str, Any], message_count: int) -> Dict[str, Any]:
+    return {
+        "id": conversation["id"],
+        "title": conversation.get("title") or conversation["id"],
+        "created_at": conversation.get("createdAt"),
+        "participants": json.dumps(conversation.get("participants") or [], ensure_ascii=False),
+        "last_message": conversation.get("lastMessage") or "",
+        "last_at": conversation.get("lastAt"),
+        "is_archived": bool(conversation.get("isArchived", False)),
+        "platform": conversation.get("platform") or "telegram",
+        "chat_type": conversation.get("chat_type") or "private",
+        "is_bot_conversation": bool(conversation.get("is_bot_conversation", False)),
+        "message_count": message_count,
+    }
+
+
+def _conversation_dict(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "title": row.title,
+        "createdAt": row.created_at,
+        "participants": json.loads(row.participants or "[]"),
+        "lastMessage": row.last_message,
+        "lastAt": row.last_at,
+        "isArchived": row.is_archived,
+        "platform": row.platform,
+        "chat_type": row.chat_type,
+        "is_bot_conversation": row.is_bot_conversation,
+    }
+
+
+def _message_dict(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "sender": row.sender,
+        "text": row.text,
+        "timestamp": row.timestamp,
+        "read": row.read,
+        "platform": row.platform,
+    }
+
+
+class SqliteConversationRepository(ConversationRepository):
+    """Conversas e mensagens em SQLite (WAL), com consultas indexadas"""
+
+    mode = BACKEND_SQLITE
+    supports_paging = True
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self._engine = create_engine(
+            f"sqlite:///{db_path}",
+            connect_args={"check_same_thread": False},
+        )
+        event.listen(self._engine, "connect", _set_sqlite_pragmas)
+        metadata.create_all(self._engine)
+
+        # SQLite aceita um escritor por vez; leituras seguem concorrentes no WAL
+        self._write_lock = threading.Lock()
+        self._persisted: Dict[str, int] = {}
+        logger.info(f"Backend SQLite de conversas em {db_path}")
+
+    # --- Leitura ---
+    def is_empty(self) -> bool:
+        with self._engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(conversations_table)).scalar() == 0
+
+    def list_conversations(self) -> List[str]:
+        with self._engine.connect() as conn:
+            return list(conn.execute(select(conversations_table.c.id)).scalars())
+
+    def _days_by_conversation(self, conn, conversation_id: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        query = select(message_days_table)
+        if conversation_id is not None:
+            query = query.where(message_days_table.c.conversation_id == conversation_id)
+
+        days: Dict[str, Dict[str, int]] = {}
+        for row in conn.execute(query):
+            days.setdefault(row.conversation_id, {})[row.day] = row.count
+        return days
+
+    def get_metadata(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        with self._engine.connect() as conn:
+            row = conn.execute(
+                select(conversations_table).where(conversations_table.c.id == conversation_id)
+            ).first()
+            if row is None:
+                return None
+            days = self._days_by_conversation(conn, conversation_id)
+
+        return {
+            "conversation": _conversation_dict(row),
+            "messageCount": row.message_count,
+            "messagesByDate": days.get(conversation_id, {}),
+        }
+
+    def list_metadata(self) -> List[Dict[str, Any]]:
+        with self._engine.connect() as conn:
+            rows = conn.execute(
+                select(conversations_table).order_by(conversations_table.c.last_at.desc())
+            ).all()
+            days = self._days_by_conversation(conn)
+
+        return [
+            {
+                "conversation": _conversation_dict(row),
+                "messageCount": row.message_count,
+                "messagesByDate": days.get(row.id, {}),
+            }
+            for row in rows
+        ]
+
+    def load(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        with self._engine.connect() as conn:
+            row = conn.execute(
+                select(conversations_table).where(conversations_table.c.id == conversation_id)
+            ).first()
+            if row is None:
+                return None
+            message_rows = conn.execute(
+                select(messages_table)
+                .where(messages_table.c.conversation_id == conversation_id)
+                .order_by(messages_table.c.seq)
+            ).all()
+
+        data = _conversation_dict(row)
+        data["messages"] = [_message_dict(message_row) for message_row in message_rows]
+        # Sob o lock de escrita e sem diminuir: um save concluído depois da leitura
+        # já registrou uma contagem maior, e regravá-la menor repetiria seqs no próximo save
+        with self._write_lock:
+            self._persisted[conversation_id] = max(self._persisted.get(conversation_id, 0), len(message_rows))
+        return data
+
+    def get_messages(self, conversation_id: str, offset: int = 0, limit: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        with self._engine.connect() as conn:
+            exists = conn.execute(
+                select(conversations_table.c.id).where(conversations_table.c.id == conversation_id)
+            ).first()
+            if exists is None:
+                return None
+
+            query = (
+                select(messages_table)
+                .where(messages_table.c.conversation_id == conversation_id)
+                .order_by(messages_table.c.seq)
+                .offset(offset)
+            )
+            if limit is not None:
+                query = query.limit(limit)
+            return [_message_dict(row) for row in conn.execute(query)]
+
+    def get_message_window(
+        self,
+        conversation_id: str,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        limit: int = 50,
+    ) -> Optional[Tuple[List[Dict[str, Any]], bool]]:
+        seq = messages_table.c.seq
+        with self._engine.connect() as conn:
+            exists = conn.execute(
+                select(conversations_table.c.id).where(conversations_table.c.id == conversation_id)
+            ).first()
+            if exists is None:
+                return None
+
+            # Usa a chave primária (conversation_id, seq): custo proporcional ao tamanho da página
+            query = select(messages_table).where(messages_table.c.conversation_id == conversation_id)
+            if after is not None:
+                rows = conn.execute(query.where(seq > after).order_by(seq).limit(limit + 1)).all()
+            else:
+                if before is not None:
+                    query = query.where(seq < before)
+                rows = conn.execute(query.order_by(seq.desc()).limit(limit + 1)).all()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if after is None:
+            rows.reverse()
+        return [dict(_message_dict(row), seq=row.seq) for row in rows], has_more
+
+    # --- Escrita ---
+    def save(self, conversation: Dict[str, Any], messages: Sequence[Any]) -> None:
+        conversation_id = conversation["id"]
+
+        with self._write_lock:
+            with self._engine.begin() as conn:
+                persisted = self._persisted.get(conversation_id)
+                if persisted is None:
+                    persisted = conn.execute(
+                        select(func.count())
+                        .select_from(messages_table)
+                        .where(messages_table.c.conversation_id == conversation_id)
+                    ).scalar()
+
+                if persisted > len(messages):
+                    # Lista em memória foi substituída: regrava as mensagens da conversa
+                    self._delete_messages(conn, conversation_id)
+                    persisted = 0
+
+                new_messages = [msg.to_dict() for msg in messages[persisted:]]
+                total = persisted + len(new_messages)
+
+                row = _conversation_row(conversation, total)
+                upsert = sqlite_insert(conversations_table).values(**row)
+                conn.execute(upsert.on_conflict_do_update(
+                    index_elements=[conversations_table.c.id],
+                    set_={key: value for key, value in row.items() if key != "id"},
+                ))
+                self._insert_messages(conn, conversation_id, persisted, new_messages)
+
+            self._persisted[conversation_id] = total
+
+    def _insert_messages(self, conn, conversation_id: str, first_seq: int, new_messages: List[Dict[str, Any]]) -> None:
+        if not new_messages:
+            return
+
+        conn.execute(messages_table.insert(), [
+            {
+                "conversation_id": conversation_id,
+                "seq": first_seq + index,
+                "id": msg.get("id"),
+                "sender": msg.get("sender", "user"),
+                "text": msg.get("text", ""),
+                "timestamp": msg.get("timestamp"),
+                "read": bool(msg.get("read", False)),
+                "platform": msg.get("platform", "telegram"),
+            }
+            for index, msg in enumerate(new_messages)
+        ])
+
+        day_counts: Dict[str, int] = {}
+        for msg in new_messages:
+            day = _day(msg.get("timestamp"))
+            if day:
+                day_counts[day] = day_counts.get(day, 0) + 1
+
+        for day, count in day_counts.items():
+            upsert = sqlite_insert(message_days_table).values(
+                conversation_id=conversation_id, day=day, count=count
+            )
+            conn.execute(upsert.on_conflict_do_update(
+                index_elements=[message_days_table.c.conversation_id, message_days_table.c.day],
+                set_={"count": message_days_table.c.count + upsert.excluded.count},
+            ))
+
+    def _delete_messages(self, conn, conversation_id: str) -> None:
+        conn.execute(delete(messages_table).where(messages_table.c.conversation_id == conversation_id))
+        conn.execute(delete(message_days_table).where(message_days_table.c.conversation_id == conversation_id))
+
+    def delete(self, conversation_id: str) -> None:
+        with self._write_lock:
+            with self._engine.begin() as conn:
+                self._delete_messages(conn, conversation_id)
+                conn.execute(delete(conversations_table).where(conversations_table.c.id == conversation_id))
+            self._persisted.pop(conversation_id, None)
+
+    def import_from(self, source: ConversationRepository) -> int:
+        """Copia todas as conversas de outro backend (migração do histórico JSON)"""
+        imported = 0
+        for conversation_id in source.list_conversations():
+            data = source.load(conversation_id)
+            if data is None:
+                continue
+
+            conversation = {key: value for key, value in data.items() if key != "messages"}
+            conversation.setdefault("id", conversation_id)
+            messages = data.get("messages", [])
+            with self._write_lock, self._engine.begin() as conn:
+                self._delete_messages(conn, conversation_id)
+                conn.execute(delete(conversations_table).where(conversations_table.c.id == conversation_id))
+                conn.execute(conversations_table.insert().values(**_conversation_row(conversation, len(messages))))
+                self._insert_messages(conn, conversation_id, 0, messages)
+            imported += 1
+
+        logger.info(f"{imported} conversas importadas para o SQLite")
+        return imported
+
+    def stop(self) -> None:
+        self._engine.dispose()
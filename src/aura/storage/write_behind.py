@@ -0,0 +1,149 @@
+"""Gravação assíncrona (write-behind) do histórico, com coalescência por conversa."""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindWriter:
+    """
+    Marca conversas como sujas e as grava em uma thread de fundo, no máximo uma
+    vez por ``interval`` segundos cada. Marcações repetidas antes da gravação são
+    coalescidas em uma única escrita.
+    """
+
+    def __init__(self, flush: Callable[[str], None], interval: float = 1.0, name: str = "history-writer"):
+        self._flush = flush
+        self.interval = max(0.0, interval)
+        self.name = name
+        self._cond = threading.Condition()
+        # id da conversa -> instante a partir do qual pode ser gravada
+        self._dirty: Dict[str, float] = {}
+        self._last_flush: Dict[str, float] = {}
+        self._in_flight: Set[str] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._stopped = False
+        self._stats = {
+            "marked": 0,
+            "coalesced": 0,
+            "flushes": 0,
+            "errors": 0,
+        }
+
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        logger.info(f"Gravação write-behind {self.name} iniciada (intervalo {self.interval}s)")
+
+    def mark_dirty(self, conversation_id: str) -> None:
+        if self._stopped:
+            # Após o encerramento, grava de forma síncrona
+            with self._cond:
+                self._in_flight.add(conversation_id)
+            self._flush_one(conversation_id)
+            return
+
+        if not self._running:
+            self.start()
+
+        with self._cond:
+            self._stats["marked"] += 1
+            if conversation_id in self._dirty:
+                self._stats["coalesced"] += 1
+                return
+
+            due = self._last_flush.get(conversation_id, 0.0) + self.interval
+            self._dirty[conversation_id] = max(time.monotonic(), due)
+            self._cond.notify()
+
+    def discard(self, conversation_id: str) -> None:
+        """Descarta gravação pendente e aguarda uma gravação em andamento da conversa"""
+        with self._cond:
+            self._dirty.pop(conversation_id, None)
+            self._last_flush.pop(conversation_id, None)
+            while conversation_id in self._in_flight:
+                self._cond.wait()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._running:
+                    now = time.monotonic()
+                    ready = [cid for cid, due in self._dirty.items() if due <= now]
+                    if ready:
+                        break
+                    timeout = min(self._dirty.values()) - now if self._dirty else None
+                    self._cond.wait(timeout)
+
+                if not self._running:
+                    return
+
+                for conversation_id in ready:
+                    del self._dirty[conversation_id]
+                    self._in_flight.add(conversation_id)
+
+            for conversation_id in ready:
+                self._flush_one(conversation_id)
+
+    def _flush_one(self, conversation_id: str) -> None:
+        try:
+            self._flush(conversation_id)
+            with self._cond:
+                self._stats["flushes"] += 1
+        except Exception as error:
+            logger.error(f"Erro na gravação write-behind ({self.name}) de {conversation_id}: {error}")
+            with self._cond:
+                self._stats["errors"] += 1
+        finally:
+            with self._cond:
+                self._last_flush[conversation_id] = time.monotonic()
+                self._in_flight.discard(conversation_id)
+                self._cond.notify_all()
+
+    def is_dirty(self, conversation_id: str) -> bool:
+        with self._cond:
+            return conversation_id in self._dirty or conversation_id in self._in_flight
+
+    def flush_all(self) -> int:
+        """Grava imediatamente todas as conversas pendentes"""
+        with self._cond:
+            pending = list(self._dirty)
+            self._dirty.clear()
+            self._in_flight.update(pending)
+
+        for conversation_id in pending:
+            self._flush_one(conversation_id)
+        return len(pending)
+
+    def stop(self) -> None:
+        with self._cond:
+            self._running = False
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+        flushed = self.flush_all()
+        stats = self.stats()
+        logger.info(
+            f"Gravação write-behind {self.name} encerrada: {flushed} pendentes gravadas, "
+            f"{stats['flushes']} gravações, {stats['coalesced']} coalescidas"
+        )
+
+    def stats(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                **self._stats,
+                "pending": len(self._dirty),
+                "in_flight": len(self._in_flight),
+                "interval": self.interval,
+            }
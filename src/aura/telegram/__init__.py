@@ -0,0 +1,8 @@
+"""Integração com a Bot API do Telegram: ingestão de updates (webhook ou polling) e envio de mensagens."""
+
+from .client import TelegramBotClient, TelegramClientRegistry  # noqa: F401
+from .dedupe import UpdateDeduplicator  # noqa: F401
+from .ingest import ChatOrderedWorkerPool  # noqa: F401
+from .polling import PollingManager, UpdatePoller  # noqa: F401
+from .ratelimit import TelegramRateLimiter, TokenBucket  # noqa: F401
+from .scheduler import DelayedSendScheduler  # noqa: F401
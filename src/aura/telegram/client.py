@@ -0,0 +1,177 @@
+"""Cliente da Bot API do Telegram com conexões persistentes (keep-alive) por conta."""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+TELEGRAM_API_URL = "https://api.telegram.org"
+
+
+class TelegramBotClient:
+    """
+    Cliente de um bot: uma ``requests.Session`` com pool de conexões próprio, então
+    chamadas seguidas reaproveitam a mesma conexão TCP+TLS com a API em vez de abrir
+    uma nova a cada mensagem. Registra a latência de cada chamada.
+    """
+
+    def __init__(self, token: str, pool_size: int = 8, timeout: float = 10.0):
+        self.token = token
+        self.timeout = timeout
+        self._base_url = f"{TELEGRAM_API_URL}/bot{token}"
+        self._session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self._session.mount("https://", self._adapter)
+
+        self._lock = threading.Lock()
+        self._calls: Dict[str, int] = {}
+        self._errors = 0
+        self._latencies: Deque[float] = deque(maxlen=500)
+        self._max_latency = 0.0
+
+    def call(self, method: str, json: Optional[Dict[str, Any]] = None, data: Optional[Dict[str, Any]] = None, timeout: Optional[float] = None) -> requests.Response:
+        """Chama ``method`` da Bot API; exceções de rede são propagadas"""
+        started = time.perf_counter()
+        failed = True
+        try:
+            response = self._session.post(
+                f"{self._base_url}/{method}",
+                json=json,
+                data=data,
+                timeout=self.timeout if timeout is None else timeout,
+            )
+            failed = False
+            return response
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._calls[method] = self._calls.get(method, 0) + 1
+                self._latencies.append(elapsed)
+                self._max_latency = max(self._max_latency, elapsed)
+                if failed:
+                    self._errors += 1
+
+    def send_message(self, chat_id: str, text: str, parse_mode: str = "HTML") -> requests.Response:
+        return self.call("sendMessage", json={"chat_id": chat_id, "text": text, "parse_mode": parse_mode})
+
+    def set_webhook(self, url: str) -> requests.Response:
+        return self.call("setWebhook", data={"url": url})
+
+    def delete_webhook(self) -> requests.Response:
+        return self.call("deleteWebhook")
+
+    def close(self) -> None:
+        self._session.close()
+
+    def _connection_stats(self) -> Dict[str, int]:
+        opened = 0
+        sent = 0
+        # Pools do urllib3 contam conexões abertas e requisições feitas por elas
+        for key in list(self._adapter.poolmanager.pools.keys()):
+            pool = self._adapter.poolmanager.pools.get(key)
+            if pool is None:
+                continue
+            opened += pool.num_connections
+            sent += pool.num_requests
+        return {
+            "connections_opened": opened,
+            "requests_sent": sent,
+            "connections_reused": max(0, sent - opened),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            result = {
+                "calls": dict(self._calls),
+                "errors": self._errors,
+                "latency_avg_ms": round(1000 * sum(latencies) / len(latencies), 1) if latencies else 0.0,
+                "latency_p95_ms": round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 1) if latencies else 0.0,
+                "latency_max_ms": round(1000 * self._max_latency, 1),
+            }
+        result.update(self._connection_stats())
+        return result
+
+
+class TelegramClientRegistry:
+    """
+    Clientes por id de conta, resolvidos por dicionário. A lista de contas
+    (``accounts_provider``) só é consultada quando o id ainda não está no registro.
+    """
+
+    def __init__(self, accounts_provider: Callable[[], Iterable[Any]], pool_size: int = 8, timeout: float = 10.0):
+        self._accounts_provider = accounts_provider
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._clients: Dict[str, TelegramBotClient] = {}
+        # Clientes por token, para tokens sem conta (ex.: TELEGRAM_BOT_TOKEN)
+        self._token_clients: Dict[str, TelegramBotClient] = {}
+        self._bot_names: Dict[str, str] = {}
+
+    def _new_client(self, token: str) -> TelegramBotClient:
+        return TelegramBotClient(token, pool_size=self.pool_size, timeout=self.timeout)
+
+    def get(self, account_id: str) -> Optional[TelegramBotClient]:
+        """Cliente da conta ``account_id`` ou None se a conta não existe"""
+        client = self._clients.get(account_id)
+        if client is not None:
+            return client
+
+        account = next((acc for acc in self._accounts_provider() if acc.id == account_id), None)
+        if account is None:
+            return None
+
+        with self._lock:
+            client = self._clients.get(account_id)
+            if client is None or client.token != account.apiKey:
+                client = self._clients[account_id] = self._new_client(account.apiKey)
+                self._bot_names[account_id] = account.botName
+                logger.info(f"Cliente Telegram criado para a conta {account_id} - {account.botName}")
+        return client
+
+    def for_token(self, token: str) -> TelegramBotClient:
+        """Cliente para um token avulso, sem conta cadastrada"""
+        client = self._token_clients.get(token)
+        if client is None:
+            with self._lock:
+                client = self._token_clients.get(token)
+                if client is None:
+                    client = self._token_clients[token] = self._new_client(token)
+        return client
+
+    def bot_name(self, account_id: str) -> Optional[str]:
+        return self._bot_names.get(account_id)
+
+    def discard(self, account_id: str) -> None:
+        """Fecha e esquece o cliente de uma conta removida"""
+        with self._lock:
+            client = self._clients.pop(account_id, None)
+            self._bot_names.pop(account_id, None)
+        if client is not None:
+            client.close()
+
+    def close(self) -> None:
+        with self._lock:
+            clients = list(self._clients.values()) + list(self._token_clients.values())
+            self._clients.clear()
+            self._token_clients.clear()
+            self._bot_names.clear()
+        for client in clients:
+            client.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            clients = dict(self._clients)
+            token_clients = list(self._token_clients.values())
+        return {
+            "clients": len(clients) + len(token_clients),
+            "accounts": {account_id: client.stats() for account_id, client in clients.items()},
+            "token_clients": [client.stats() for client in token_clients],
+        }
@@ -0,0 +1,148 @@
+"""Idempotência dos updates do Telegram: update_ids recentes por conta, persistidos em disco."""
+
+import json
+import logging
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..storage import WriteBehindWriter
+
+logger = logging.getLogger(__name__)
+
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+class UpdateDeduplicator:
+    """
+    Guarda, por conta, os ``update_id`` processados nas últimas ``window`` segundos
+    (no máximo ``max_per_account`` por conta, descartando os mais antigos).
+
+    A consulta de duplicatas (``is_duplicate``) é uma leitura de dicionário sem lock,
+    para que reentregas do Telegram sejam descartadas antes de qualquer lock ou I/O.
+    O registro (``claim``) é atômico e a gravação em disco (um arquivo por conta em
+    ``directory``) acontece em segundo plano, coalescida por ``flush_interval``.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        window: float = 86400.0,
+        max_per_account: int = 5000,
+        flush_interval: float = 1.0,
+    ):
+        self.directory = directory
+        self.window = window
+        self.max_per_account = max(1, max_per_account)
+        self._lock = threading.Lock()
+        # conta -> {update_id: instante (epoch) do recebimento}, em ordem de chegada
+        self._seen: Dict[str, Dict[int, float]] = {}
+        self._stats = {
+            "checked": 0,
+            "duplicates": 0,
+            "expired": 0,
+        }
+        self._writer = None
+        if directory is not None:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._load()
+            self._writer = WriteBehindWriter(self._save_account, flush_interval, name="update-dedupe-writer")
+
+    def _path(self, account_id: str) -> Path:
+        return self.directory / f"updates_{_UNSAFE_FILENAME.sub('_', account_id)}.json"
+
+    def _load(self) -> None:
+        cutoff = time.time() - self.window
+        for path in self.directory.glob("updates_*.json"):
+            try:
+                with path.open("r", encoding="utf-8") as handle:
+                    data = json.load(handle)
+                entries = [(int(update_id), seen_at) for update_id, seen_at in data["updates"] if seen_at >= cutoff]
+                self._seen[data["account_id"]] = dict(entries[-self.max_per_account:])
+            except (OSError, ValueError, KeyError, TypeError) as error:
+                logger.warning(f"Ignorando arquivo de updates inválido {path.name}: {error}")
+        if self._seen:
+            total = sum(len(ids) for ids in self._seen.values())
+            logger.info(f"{total} update_ids recentes carregados de {len(self._seen)} contas")
+
+    def _save_account(self, account_id: str) -> None:
+        with self._lock:
+            entries = list(self._seen.get(account_id, {}).items())
+        path = self._path(account_id)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as handle:
+            json.dump({"account_id": account_id, "updates": entries}, handle)
+        tmp_path.replace(path)
+
+    def is_duplicate(self, account_id: str, update_id: int) -> bool:
+        """Consulta sem lock: o update já foi recebido dentro da janela?"""
+        # Contadores aproximados: incrementos concorrentes podem se perder, sem efeito no resultado
+        self._stats["checked"] += 1
+        seen_at = self._seen.get(account_id, {}).get(update_id)
+        if seen_at is None:
+            return False
+        if time.time() - seen_at > self.window:
+            return False
+        self._stats["duplicates"] += 1
+        return True
+
+    def claim(self, account_id: str, update_id: int) -> bool:
+        """Registra o update; retorna False se outro recebimento já o registrou"""
+        now = time.time()
+        with self._lock:
+            ids = self._seen.get(account_id)
+            if ids is None:
+                # is_duplicate só faz get() nestes dicionários, o que é seguro sem lock
+                ids = self._seen[account_id] = {}
+            seen_at = ids.get(update_id)
+            if seen_at is not None and now - seen_at <= self.window:
+                self._stats["duplicates"] += 1
+                return False
+
+            ids.pop(update_id, None)
+            ids[update_id] = now
+            # Os mais antigos ficam no início: descarta por tamanho e por idade
+            while ids:
+                oldest_id = next(iter(ids))
+                if len(ids) <= self.max_per_account and now - ids[oldest_id] <= self.window:
+                    break
+                del ids[oldest_id]
+                self._stats["expired"] += 1
+
+        if self._writer:
+            self._writer.mark_dirty(account_id)
+        return True
+
+    def release(self, account_id: str, update_id: int) -> None:
+        """Desfaz ``claim`` quando o update não pôde ser aceito (ex.: fila cheia)"""
+        with self._lock:
+            ids = self._seen.get(account_id)
+            if ids is not None:
+                ids.pop(update_id, None)
+        if self._writer:
+            self._writer.mark_dirty(account_id)
+
+    def forget_account(self, account_id: str) -> None:
+        with self._lock:
+            self._seen.pop(account_id, None)
+        if self._writer:
+            self._writer.discard(account_id)
+        if self.directory is not None:
+            self._path(account_id).unlink(missing_ok=True)
+
+    def stop(self) -> None:
+        if self._writer:
+            self._writer.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            checked = self._stats["checked"]
+            return {
+                **self._stats,
+                "duplicate_rate": round(self._stats["duplicates"] / checked, 4) if checked else 0.0,
+                "accounts": len(self._seen),
+                "tracked_updates": sum(len(ids) for ids in self._seen.values()),
+                "window_seconds": self.window,
+            }
@@ -0,0 +1,152 @@
+"""Pool de workers para updates do Telegram: ordem estrita por chat, paralelismo entre chats."""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ChatOrderedWorkerPool:
+    """
+    Processa itens com ``handler(chat_id, item)`` em ``workers`` threads.
+
+    Cada chat tem sua fila; um chat só é entregue a um worker por vez, então os itens
+    de um mesmo chat são processados na ordem de chegada, enquanto chats diferentes
+    andam em paralelo. Depois de cada item o chat volta ao fim da fila de prontos,
+    para que um chat com muitos itens não monopolize um worker.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str, Any], None],
+        workers: int = 8,
+        max_pending: int = 10000,
+        name: str = "telegram-ingest",
+    ):
+        self._handler = handler
+        self.workers = max(1, workers)
+        self.max_pending = max_pending
+        self.name = name
+        self._cond = threading.Condition()
+        # chat_id -> itens pendentes (instante de chegada, item)
+        self._chats: Dict[str, Deque[Tuple[float, Any]]] = {}
+        # Chats com itens e sem worker no momento, em ordem de chegada
+        self._ready: Deque[str] = deque()
+        self._busy: set = set()
+        self._pending = 0
+        self._threads = []
+        self._running = False
+        self._stats = {
+            "submitted": 0,
+            "processed": 0,
+            "errors": 0,
+            "rejected": 0,
+        }
+        # Janela das últimas latências (chegada -> fim do processamento), em segundos
+        self._latencies: Deque[float] = deque(maxlen=1000)
+        self._max_latency = 0.0
+
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"{self.name}-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Pool de ingestão iniciado com {self.workers} workers")
+
+    def submit(self, chat_id: str, item: Any) -> bool:
+        """Enfileira o item do chat; retorna False quando a fila está cheia"""
+        if not self._running:
+            self.start()
+
+        with self._cond:
+            if self._pending >= self.max_pending:
+                self._stats["rejected"] += 1
+                return False
+
+            queue = self._chats.get(chat_id)
+            if queue is None:
+                queue = self._chats[chat_id] = deque()
+            queue.append((time.monotonic(), item))
+            self._pending += 1
+            self._stats["submitted"] += 1
+
+            if chat_id not in self._busy and len(queue) == 1:
+                self._ready.append(chat_id)
+                self._cond.notify()
+        return True
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while self._running and not self._ready:
+                    self._cond.wait()
+                if not self._running and not self._ready:
+                    return
+
+                chat_id = self._ready.popleft()
+                self._busy.add(chat_id)
+                enqueued_at, item = self._chats[chat_id].popleft()
+
+            try:
+                self._handler(chat_id, item)
+                failed = False
+            except Exception as error:
+                logger.error(f"Erro ao processar update do chat {chat_id}: {error}")
+                failed = True
+
+            with self._cond:
+                latency = time.monotonic() - enqueued_at
+                self._latencies.append(latency)
+                self._max_latency = max(self._max_latency, latency)
+                self._stats["errors" if failed else "processed"] += 1
+                self._pending -= 1
+                self._busy.discard(chat_id)
+
+                if self._chats[chat_id]:
+                    self._ready.append(chat_id)
+                    self._cond.notify()
+                else:
+                    del self._chats[chat_id]
+                self._cond.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Aguarda todos os itens pendentes serem processados"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Processa o que já está na fila e encerra os workers"""
+        self.join(timeout)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._threads = []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            latencies = sorted(self._latencies)
+            return {
+                **self._stats,
+                "workers": self.workers,
+                "queue_depth": self._pending,
+                "chats_waiting": len(self._chats),
+                "chats_in_progress": len(self._busy),
+                "latency_avg_ms": round(1000 * sum(latencies) / len(latencies), 1) if latencies else 0.0,
+                "latency_p95_ms": round(1000 * latencies[int(0.95 * (len(latencies) - 1))], 1) if latencies else 0.0,
+                "latency_max_ms": round(1000 * self._max_latency, 1),
+            }
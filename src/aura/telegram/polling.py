@@ -0,0 +1,220 @@
+"""Ingestão por long polling (getUpdates), alternativa ao webhook: um poller por conta."""
+
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from .client import TelegramBotClient, TelegramClientRegistry
+
+logger = logging.getLogger(__name__)
+
+# Recebe (id da conta, update); False = não aceito agora (fila cheia), repetir depois
+UpdateHandler = Callable[[str, Dict[str, Any]], bool]
+
+
+class UpdatePoller:
+    """
+    Busca updates de uma conta com ``getUpdates`` em long polling e os entrega a
+    ``handler``. O offset avança por lote: ele é confirmado ao Telegram na chamada
+    seguinte, depois que o lote inteiro foi aceito. Se o handler recusa um update,
+    o lote para ali e o update volta no próximo ``getUpdates``.
+    """
+
+    def __init__(
+        self,
+        account_id: str,
+        client: TelegramBotClient,
+        handler: UpdateHandler,
+        poll_timeout: int = 25,
+        batch_size: int = 100,
+        max_backoff: float = 30.0,
+    ):
+        self.account_id = account_id
+        self.client = client
+        self._handler = handler
+        self.poll_timeout = poll_timeout
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.offset: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {
+            "polls": 0,
+            "empty_polls": 0,
+            "updates": 0,
+            "batches": 0,
+            "refused": 0,
+            "errors": 0,
+        }
+        self._last_error: Optional[str] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name=f"telegram-poller-{self.account_id[:8]}", daemon=True)
+        self._thread.start()
+        logger.info(f"Polling getUpdates iniciado para a conta {self.account_id}")
+
+    def stop(self, timeout: float = 1.0) -> None:
+        # A chamada em andamento pode durar até poll_timeout; a thread é daemon
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        # getUpdates não funciona com webhook configurado (409)
+        self._delete_webhook()
+
+        backoff = 1.0
+        while not self._stop.is_set():
+            try:
+                retry_in = self.poll_once()
+                backoff = 1.0
+            except Exception as error:
+                self._stats["errors"] += 1
+                self._last_error = str(error)
+                logger.error(f"Erro no polling da conta {self.account_id}: {error}")
+                retry_in = backoff
+                backoff = min(self.max_backoff, backoff * 2)
+
+            if retry_in:
+                self._stop.wait(retry_in)
+
+    def _delete_webhook(self) -> None:
+        try:
+            self.client.delete_webhook()
+        except Exception as error:
+            logger.warning(f"Erro ao remover webhook da conta {self.account_id}: {error}")
+
+    def poll_once(self) -> float:
+        """Uma chamada de getUpdates; retorna quantos segundos esperar antes da próxima"""
+        payload: Dict[str, Any] = {
+            "timeout": self.poll_timeout,
+            "limit": self.batch_size,
+            "allowed_updates": ["message"],
+        }
+        if self.offset is not None:
+            payload["offset"] = self.offset
+
+        response = self.client.call("getUpdates", json=payload, timeout=self.poll_timeout + 10)
+        self._stats["polls"] += 1
+
+        if response.status_code == 429:
+            retry_after = float(response.json().get("parameters", {}).get("retry_after", 1))
+            logger.warning(f"getUpdates limitado (429) para a conta {self.account_id}: aguardando {retry_after}s")
+            return retry_after
+
+        if response.status_code == 409:
+            logger.warning(f"getUpdates em conflito (409) para a conta {self.account_id}: removendo webhook")
+            self._delete_webhook()
+            return 1.0
+
+        result = response.json()
+        if response.status_code != 200 or not result.get("ok"):
+            raise RuntimeError(f"getUpdates falhou ({response.status_code}): {result.get('description', 'erro desconhecido')}")
+
+        updates: List[Dict[str, Any]] = result.get("result", [])
+        if not updates:
+            self._stats["empty_polls"] += 1
+            return 0.0
+
+        if self._stop.is_set():
+            # Conta removida durante a chamada: o lote não é confirmado nem processado
+            return 0.0
+
+        self._stats["batches"] += 1
+        for update in updates:
+            try:
+                accepted = self._handler(self.account_id, update)
+            except Exception as error:
+                # Update inválido não pode travar o offset: é descartado como o webhook faria
+                logger.error(f"Erro ao receber update {update.get('update_id')} da conta {self.account_id}: {error}")
+                accepted = True
+            if not accepted:
+                self._stats["refused"] += 1
+                logger.warning(f"Update {update.get('update_id')} recusado; será recebido de novo no próximo lote")
+                return 1.0
+            self._stats["updates"] += 1
+            # Confirmado ao Telegram no próximo getUpdates
+            self.offset = update["update_id"] + 1
+        return 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "offset": self.offset,
+            "running": self._thread is not None and self._thread.is_alive(),
+            "last_error": self._last_error,
+        }
+
+
+class PollingManager:
+    """
+    Mantém um ``UpdatePoller`` por conta de ``accounts_provider``. ``sync()`` inicia
+    pollers de contas novas e encerra os de contas removidas.
+    """
+
+    def __init__(
+        self,
+        accounts_provider: Callable[[], Iterable[Any]],
+        clients: TelegramClientRegistry,
+        handler: UpdateHandler,
+        poll_timeout: int = 25,
+        batch_size: int = 100,
+    ):
+        self._accounts_provider = accounts_provider
+        self._clients = clients
+        self._handler = handler
+        self.poll_timeout = poll_timeout
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._pollers: Dict[str, UpdatePoller] = {}
+        self._running = False
+
+    def start(self) -> None:
+        with self._lock:
+            self._running = True
+        self.sync()
+
+    def sync(self) -> None:
+        if not self._running:
+            return
+
+        account_ids = {account.id for account in self._accounts_provider()}
+        with self._lock:
+            removed = [self._pollers.pop(account_id) for account_id in list(self._pollers) if account_id not in account_ids]
+            for account_id in account_ids:
+                if account_id in self._pollers:
+                    continue
+                client = self._clients.get(account_id)
+                if client is None:
+                    continue
+                poller = self._pollers[account_id] = UpdatePoller(
+                    account_id,
+                    client,
+                    self._handler,
+                    poll_timeout=self.poll_timeout,
+                    batch_size=self.batch_size,
+                )
+                poller.start()
+
+        for poller in removed:
+            poller.stop()
+            logger.info(f"Polling getUpdates encerrado para a conta {poller.account_id}")
+
+    def stop(self) -> None:
+        with self._lock:
+            self._running = False
+            pollers = list(self._pollers.values())
+            self._pollers.clear()
+        for poller in pollers:
+            poller.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pollers = dict(self._pollers)
+        return {
+            "running": self._running,
+            "accounts": {account_id: poller.stats() for account_id, poller in pollers.items()},
+        }
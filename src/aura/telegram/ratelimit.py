@@ -0,0 +1,140 @@
+"""Limite de envio para a Bot API: token bucket por bot (taxa global) e por chat."""
+
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TokenBucket:
+    """
+    Token bucket com ``rate`` fichas por segundo e capacidade ``burst``.
+
+    Guarda só o instante teórico em que o balde volta a ficar cheio (``_full_at``),
+    o que permite calcular quando a próxima ficha estará disponível sem
+    consumi-la (``available_at``) e reservar uma ficha para um instante futuro
+    (``take``).
+    """
+
+    __slots__ = ("interval", "tolerance", "_full_at")
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        # Quanto o balde pode "adiantar": burst - 1 fichas além da atual
+        self.tolerance = self.interval * (max(1, burst) - 1)
+        self._full_at = 0.0
+
+    def available_at(self, now: float) -> float:
+        return max(now, self._full_at - self.tolerance)
+
+    def take(self, at: float) -> None:
+        self._full_at = max(self._full_at, at) + self.interval
+
+    def block_until(self, until: float) -> None:
+        """Nenhuma ficha antes de ``until`` (ex.: ``retry_after`` de um 429)"""
+        self._full_at = max(self._full_at, until + self.tolerance)
+
+    def idle(self, now: float) -> bool:
+        """Balde cheio: equivale a um balde novo e pode ser descartado"""
+        return self._full_at <= now
+
+
+class TelegramRateLimiter:
+    """
+    Combina um balde global por bot (``key``, ex.: o token) com um balde por chat.
+
+    ``reserve(key, chat_id)`` devolve quantos segundos o envio deve esperar (0 = enviar
+    agora). Quando precisa esperar, a ficha fica reservada para o horário devolvido:
+    chamar ``reserve`` de novo para o mesmo chat nesse horário libera o envio sem
+    pegar outra ficha. Isso supõe um envio por vez por chat, como faz o agendador.
+    """
+
+    def __init__(self, global_rate: float = 30.0, global_burst: int = 30, chat_rate: float = 1.0, chat_burst: int = 3):
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._lock = threading.Lock()
+        self._global: Dict[Hashable, TokenBucket] = {}
+        self._chats: Dict[Tuple[Hashable, str], TokenBucket] = {}
+        # (key, chat_id) -> horário reservado para o próximo envio do chat
+        self._reserved: Dict[Tuple[Hashable, str], float] = {}
+        self._operations = 0
+        self._stats = {
+            "reservations": 0,
+            "throttled": 0,
+            "throttle_wait_total_ms": 0.0,
+            "throttle_wait_max_ms": 0.0,
+            "rate_limited": 0,
+            "retry_after_total_ms": 0.0,
+        }
+
+    def _buckets(self, key: Hashable, chat_id: str) -> Tuple[TokenBucket, TokenBucket]:
+        bucket = self._global.get(key)
+        if bucket is None:
+            bucket = self._global[key] = TokenBucket(self.global_rate, self.global_burst)
+        chat_bucket = self._chats.get((key, chat_id))
+        if chat_bucket is None:
+            chat_bucket = self._chats[(key, chat_id)] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket, chat_bucket
+
+    def reserve(self, key: Hashable, chat_id: str, now: Optional[float] = None) -> float:
+        """Segundos até o envio poder acontecer; 0 quando pode enviar agora"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            reserved = self._reserved.get((key, chat_id))
+            if reserved is not None:
+                if reserved > now:
+                    return reserved - now
+                del self._reserved[(key, chat_id)]
+                return 0.0
+
+            bucket, chat_bucket = self._buckets(key, chat_id)
+            at = max(bucket.available_at(now), chat_bucket.available_at(now))
+            bucket.take(at)
+            chat_bucket.take(at)
+            self._stats["reservations"] += 1
+
+            self._operations += 1
+            if self._operations % 1000 == 0:
+                self._prune(now)
+
+            wait = at - now
+            if wait <= 0:
+                return 0.0
+
+            self._reserved[(key, chat_id)] = at
+            self._stats["throttled"] += 1
+            self._stats["throttle_wait_total_ms"] += 1000 * wait
+            self._stats["throttle_wait_max_ms"] = max(self._stats["throttle_wait_max_ms"], 1000 * wait)
+            return wait
+
+    def retry_after(self, key: Hashable, chat_id: str, seconds: float, now: Optional[float] = None) -> None:
+        """
+        Registra um 429 da API: o bot e o chat ficam bloqueados por ``seconds`` e a
+        próxima reserva do chat já respeita esse prazo.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket, chat_bucket = self._buckets(key, chat_id)
+            bucket.block_until(now + seconds)
+            chat_bucket.block_until(now + seconds)
+            self._reserved.pop((key, chat_id), None)
+            self._stats["rate_limited"] += 1
+            self._stats["retry_after_total_ms"] += 1000 * seconds
+
+    def _prune(self, now: float) -> None:
+        for chat_key in [k for k, bucket in self._chats.items() if bucket.idle(now) and k not in self._reserved]:
+            del self._chats[chat_key]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            throttled = self._stats["throttled"]
+            return {
+                **{name: round(value, 1) if isinstance(value, float) else value for name, value in self._stats.items()},
+                "throttle_wait_avg_ms": round(self._stats["throttle_wait_total_ms"] / throttled, 1) if throttled else 0.0,
+                "bots": len(self._global),
+                "chat_buckets": len(self._chats),
+                "pending_reservations": len(self._reserved),
+                "global_rate": self.global_rate,
+                "chat_rate": self.chat_rate,
+            }
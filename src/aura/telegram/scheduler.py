@@ -0,0 +1,155 @@
+"""Agendador de envios com atraso: heap de vencimentos e um pool pequeno de threads de envio."""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class DelayedSendScheduler:
+    """
+    Executa tarefas de envio depois de um atraso, sem prender uma thread por chat.
+
+    As tarefas de um chat formam uma fila: o atraso de cada uma conta a partir do fim
+    da anterior (como os ``time.sleep`` em sequência que ela substitui), e só a
+    primeira tarefa de cada chat fica no heap. Assim a ordem por chat é preservada
+    e ``workers`` threads atendem qualquer número de chats esperando.
+
+    Uma tarefa que retorna um número positivo é repetida depois desse número de
+    segundos, antes das seguintes do chat (ex.: limite de envio ou 429 da API).
+    """
+
+    def __init__(self, workers: int = 4, name: str = "telegram-sender"):
+        self.workers = max(1, workers)
+        self.name = name
+        self._cond = threading.Condition()
+        # (vencimento, desempate, chat_id) da próxima tarefa de cada chat
+        self._heap: List[Tuple[float, int, str]] = []
+        self._counter = itertools.count()
+        # chat_id -> tarefas pendentes (atraso em segundos, tarefa)
+        self._chats: Dict[str, Deque[Tuple[float, Callable[[], Any]]]] = {}
+        self._threads = []
+        self._running = False
+        self._stats = {
+            "scheduled": 0,
+            "executed": 0,
+            "errors": 0,
+            "rescheduled": 0,
+        }
+        # Atraso das execuções em relação ao vencimento, em segundos
+        self._lateness: Deque[float] = deque(maxlen=1000)
+        self._max_lateness = 0.0
+
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"{self.name}-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        logger.info(f"Agendador de envios iniciado com {self.workers} workers")
+
+    def schedule(self, chat_id: str, delay: float, task: Callable[[], Any]) -> None:
+        """Agenda ``task`` para ``delay`` segundos após a tarefa anterior do chat (ou após agora)"""
+        if not self._running:
+            self.start()
+
+        with self._cond:
+            queue = self._chats.get(chat_id)
+            if queue is None:
+                queue = self._chats[chat_id] = deque()
+            queue.append((max(0.0, delay), task))
+            self._stats["scheduled"] += 1
+
+            if len(queue) == 1:
+                self._push(chat_id, time.monotonic() + queue[0][0])
+
+    def _push(self, chat_id: str, due: float) -> None:
+        heapq.heappush(self._heap, (due, next(self._counter), chat_id))
+        self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    if not self._heap:
+                        if not self._running:
+                            return
+                        self._cond.wait()
+                        continue
+                    wait = self._heap[0][0] - time.monotonic()
+                    if wait <= 0:
+                        break
+                    self._cond.wait(wait)
+
+                due, _, chat_id = heapq.heappop(self._heap)
+                _, task = self._chats[chat_id][0]
+                lateness = time.monotonic() - due
+
+            retry_in = None
+            try:
+                retry_in = task()
+                failed = False
+            except Exception as error:
+                logger.error(f"Erro em envio agendado para o chat {chat_id}: {error}")
+                failed = True
+
+            with self._cond:
+                self._lateness.append(lateness)
+                self._max_lateness = max(self._max_lateness, lateness)
+
+                if not failed and isinstance(retry_in, (int, float)) and retry_in > 0:
+                    # A tarefa pediu para ser repetida: continua na frente da fila do chat
+                    self._stats["rescheduled"] += 1
+                    self._push(chat_id, time.monotonic() + retry_in)
+                    continue
+
+                self._stats["errors" if failed else "executed"] += 1
+
+                queue = self._chats[chat_id]
+                queue.popleft()
+                if queue:
+                    self._push(chat_id, time.monotonic() + queue[0][0])
+                else:
+                    del self._chats[chat_id]
+                self._cond.notify_all()
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Aguarda todas as tarefas agendadas serem executadas"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._chats:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Executa o que já está agendado (até ``timeout``) e encerra os workers"""
+        self.join(timeout)
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1)
+        self._threads = []
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            lateness = list(self._lateness)
+            return {
+                **self._stats,
+                "workers": self.workers,
+                "pending": sum(len(queue) for queue in self._chats.values()),
+                "chats_waiting": len(self._chats),
+                "lateness_avg_ms": round(1000 * sum(lateness) / len(lateness), 1) if lateness else 0.0,
+                "lateness_max_ms": round(1000 * self._max_lateness, 1),
+            }
@@ -0,0 +1,275 @@
+"""
+Transcrições gravadas de process_user_message: cada caminho de entrada do fluxo
+(primeira mensagem e os estados de espera de opção, agente, pesquisa, agendamento,
+cancelamento e vendas) seguido de cada tipo de nó. As respostas, o estado da
+execução e os papéis gravados no histórico de cada passo são comparados com
+tests/transcripts/<entrada>.json.
+
+Para regravar depois de uma mudança de comportamento intencional:
+    AURA_RECORD_TRANSCRIPTS=1 python -m pytest tests/test_workflow_transcripts.py
+"""
+
+import json
+import os
+import random
+from pathlib import Path
+
+import pytest
+
+from src.aura import bot_components_api as bot
+from src.aura.chatbot import survey_manager as survey_module
+
+TRANSCRIPTS_DIR = Path(__file__).with_name("transcripts")
+RECORD = os.environ.get("AURA_RECORD_TRANSCRIPTS") == "1"
+
+ITEMS = [
+    {"id": "i1", "name": "Pneu", "unitPrice": 100, "stockQuantity": 2},
+    {"id": "i2", "name": "Vela", "unitPrice": 10, "stockQuantity": 0},
+]
+
+SLOTS = [
+    {"time": "10:00", "date": "2026-01-02", "available": True},
+    {"time": "11:00", "date": "", "available": True},
+    {"time": "12:00", "date": "2026-01-03", "available": False},
+]
+
+
+def _node(node_id, node_type, **data):
+    data.setdefault("label", node_id)
+    return {"id": node_id, "type": node_type, "data": data}
+
+
+# Nó testado (X), colocado depois do caminho de entrada
+FOLLOW = {
+    "sendMessage": [_node("X", "sendMessage", message="Olá X")],
+    "sendMessageEmpty": [_node("X", "sendMessage")],
+    "options": [_node("X", "options", message="Escolha X", options=[{"text": "A"}, {"text": "B"}])],
+    "optionsBare": [_node("X", "options")],
+    "agent": [_node("X", "agent", agentId="ag1", initialMessage="Oi, sou o agente")],
+    "agentNoId": [_node("X", "agent")],
+    "agendamento": [_node("X", "agendamento", message="Agende", availableSlots=SLOTS)],
+    "agendamentoVazio": [_node("X", "agendamento", availableSlots=[])],
+    "venda": [_node("X", "venda", message="Loja")],
+    "vendaVazia": [_node("X", "venda")],
+    "finalizar": [_node("X", "finalizar", finalMessage="Tchau", surveyQuestion="Nota?")],
+    "finalizarDefault": [_node("X", "finalizar")],
+    "agentes": [_node("X", "agentes", initialMessage="Transferindo")],
+    "code": [_node("X", "code", code="x=1")],
+    # Tipos que o editor não cria; o caminho de cancelamento tinha ramos (quebrados) para eles
+    "ai": [_node("X", "ai")],
+    "whatsappContact": [_node("X", "whatsappContact")],
+    "media": [_node("X", "media")],
+    "none": [],
+}
+
+# Depois do nó X: uma mensagem, para ver se o fluxo segue
+TAIL = _node("T", "sendMessage", message="Cauda")
+
+# Caminho de entrada: nós antes de X e mensagens até chegar nele.
+# None reinicia a conversa, "$CODE" é o código do último agendamento do usuário e
+# "$EMPTY" faz a próxima consulta de estoque voltar vazia.
+ENTRY = {
+    "start": ([], ["oi"]),
+    "options": ([_node("P", "options", message="Menu", options=[{"text": "ir"}, {"text": "b"}])], ["oi", "1"]),
+    "agent": ([_node("P", "agent", agentId="ag0")], ["oi", "fim"]),
+    "survey": ([_node("P", "finalizar", finalMessage="Fim")], ["oi", "5"]),
+    "booking": ([_node("P", "agendamento", availableSlots=SLOTS)], ["oi", "1"]),
+    "cancel": (
+        [_node("P", "agendamento", availableSlots=SLOTS)],
+        ["oi", "1", None, "oi", "cancelar", "XXXXXX", "$CODE", "curto", "motivo bem detalhado"],
+    ),
+    "saleCustom": ([_node("P", "venda")], ["oi", "0", "Parafuso"]),
+    "saleCustomEmpty": ([_node("P", "venda")], ["$EMPTY", "oi", "Parafuso"]),
+    "salePhone": ([_node("P", "venda")], ["oi", "1", "11999"]),
+}
+
+# Mensagens enviadas depois de chegar em X (opção, texto, horário, agente, nota...)
+AFTER = ["1", "abc", "1", "fim", "4", "0", "cancelar"]
+
+
+class _FakeServices:
+    """Estoque, vendas e agente de IA determinísticos (sem banco nem modelo)"""
+
+    def __init__(self):
+        self.inventory = []
+        self.sales = []
+        # Execução encerrada por reset_conversation no último passo (histórico do fim do fluxo)
+        self.last_reset = None
+
+    def fetch_inventory(self):
+        return self.inventory.pop(0) if self.inventory else [dict(item) for item in ITEMS]
+
+    def register_sale_request(self, payload):
+        self.sales.append(payload)
+        return {"contactBy": "2026-01-10", "pickupDeadline": "2026-01-05"}
+
+    def register_sale_transaction(self, **kwargs):
+        self.sales.append(kwargs)
+        return {}
+
+    @staticmethod
+    def initialize_conversation(agent_id, user_id):
+        return {"success": True}
+
+    @staticmethod
+    def process_message(agent_id, user_id, message):
+        return {"success": True, "message": "agente: " + message, "is_complete": message == "fim"}
+
+
+@pytest.fixture
+def services(tmp_path, monkeypatch):
+    fake = _FakeServices()
+    monkeypatch.setattr(bot, "_fetch_available_inventory", fake.fetch_inventory)
+    monkeypatch.setattr(bot, "_register_sale_request", fake.register_sale_request)
+    monkeypatch.setattr(bot, "_register_sale_transaction", fake.register_sale_transaction)
+    monkeypatch.setattr(bot.agent_manager, "initialize_conversation", fake.initialize_conversation, raising=False)
+    monkeypatch.setattr(bot.agent_manager, "process_message", fake.process_message, raising=False)
+
+    # Arquivos de sessões, agendamentos e pesquisas em um diretório temporário
+    monkeypatch.setattr(bot.agent_manager, "sessions_file", str(tmp_path / "agent_sessions.json"))
+    bot.agent_manager._ensure_file_exists()
+    monkeypatch.setattr(bot.booking_manager, "_file_path", tmp_path / "bookings.json")
+    bot.booking_manager._write_file({"bookings": []})
+    monkeypatch.setattr(survey_module, "SURVEY_RESPONSES_FILE", tmp_path / "survey_responses.json")
+
+    monkeypatch.setattr(bot, "_published_workflows", {})
+    monkeypatch.setattr(bot, "_workflow_graphs", {})
+    monkeypatch.setattr(bot, "_active_executions", {})
+    monkeypatch.setattr(bot, "_active_workflow", None)
+
+    reset_conversation = bot.reset_conversation
+
+    def _reset(user_id, workflow_id):
+        fake.last_reset = bot.get_execution(user_id, workflow_id)
+        return reset_conversation(user_id, workflow_id)
+
+    monkeypatch.setattr(bot, "reset_conversation", _reset)
+    return fake
+
+
+def _strip_volatile(value):
+    """Remove timestamps, que mudam a cada execução"""
+    if isinstance(value, dict):
+        return {key: _strip_volatile(item) for key, item in value.items() if key not in ("timestamp", "created_at")}
+    if isinstance(value, list):
+        return [_strip_volatile(item) for item in value]
+    return value
+
+
+def _register(workflow_id, nodes):
+    edges = []
+    for source, target in zip(nodes, nodes[1:]):
+        if source["type"] == "options":
+            for index in range(2):
+                edges.append({
+                    "id": f"{source['id']}-{target['id']}-{index}",
+                    "source": source["id"],
+                    "target": target["id"],
+                    "sourceHandle": f"output-{index}",
+                })
+        else:
+            edges.append({"id": f"{source['id']}-{target['id']}", "source": source["id"], "target": target["id"]})
+    assert bot.register_workflow({"_id": workflow_id, "flowData": {"nodes": nodes, "edges": edges}})
+
+
+def _run(services, entry, follow):
+    """Executa a conversa do cenário e devolve a transcrição"""
+    random.seed(1234)
+    workflow_id = f"w-{entry}-{follow}"
+    user_id = f"u-{entry}-{follow}"
+    prefix, messages = ENTRY[entry]
+    _register(workflow_id, [_node("S", "start")] + prefix + FOLLOW[follow] + [TAIL])
+
+    steps = []
+    last_execution, last_length = None, 0
+    for message in list(messages) + AFTER:
+        if message is None:
+            bot.reset_conversation(user_id, workflow_id)
+            continue
+        if message == "$EMPTY":
+            services.inventory.append([])
+            continue
+        if message == "$CODE":
+            bookings = [b for b in bot.booking_manager.get_all_bookings() if b.get("user_id") == user_id]
+            message = bookings[-1]["code"] if bookings else "NOPE"
+
+        services.last_reset = None
+        response = bot.process_user_message(user_id, workflow_id, message)
+
+        execution = bot.get_execution(user_id, workflow_id)
+        state = None
+        if execution is not None:
+            # Estados vazios e ids (fixos no cenário) ficam de fora
+            state = {
+                key: value
+                for key, value in _strip_volatile(execution.to_dict()).items()
+                if key not in ("workflow_id", "user_id", "conversation_history") and value != {}
+            }
+
+        # Papéis acrescentados ao histórico neste passo, inclusive quando o fluxo terminou
+        history = []
+        used = execution or services.last_reset
+        if used is not None:
+            skip = last_length if used is last_execution else 0
+            history = [item["role"] for item in used.conversation_history[skip:]]
+            last_length = len(used.conversation_history)
+        last_execution = execution
+
+        steps.append({
+            "in": message,
+            "out": _strip_volatile(response),
+            "state": state,
+            "history": history,
+            "operator": bot.agent_manager.is_agent_session_active(user_id),
+        })
+
+    return {"steps": steps, "sales": _strip_volatile(services.sales)}
+
+
+def _dump_transcripts(transcripts):
+    """JSON com um passo por linha, para diffs legíveis ao regravar"""
+    lines = ["{"]
+    for index, (follow, transcript) in enumerate(transcripts.items()):
+        lines.append(f"{json.dumps(follow)}: {{\"steps\": [")
+        steps = transcript["steps"]
+        for position, step in enumerate(steps):
+            lines.append(json.dumps(step, ensure_ascii=False) + ("," if position < len(steps) - 1 else ""))
+        closing = "," if index < len(transcripts) - 1 else ""
+        lines.append(f"], \"sales\": {json.dumps(transcript['sales'], ensure_ascii=False)}}}{closing}")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+SCENARIOS = [(entry, follow) for entry in ENTRY for follow in FOLLOW]
+
+
+@pytest.mark.parametrize("entry,follow", SCENARIOS, ids=[f"{e}-{f}" for e, f in SCENARIOS])
+def test_transcript(services, entry, follow):
+    transcript = _run(services, entry, follow)
+    path = TRANSCRIPTS_DIR / f"{entry}.json"
+
+    recorded = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+    if RECORD:
+        recorded[follow] = transcript
+        TRANSCRIPTS_DIR.mkdir(exist_ok=True)
+        path.write_text(_dump_transcripts(recorded), encoding="utf-8")
+        return
+
+    assert follow in recorded, f"transcrição não gravada: {entry}/{follow}"
+    assert transcript == recorded[follow]
+
+
+@pytest.mark.parametrize("follow", ["ai", "whatsappContact", "media"])
+def test_cancellation_skips_unsupported_nodes(services, follow):
+    """
+    Depois de um cancelamento, tipos sem handler encerram o fluxo normalmente. Antes
+    do interpretador, ai/whatsappContact/media liam campos inexistentes de NodeData
+    e a mensagem terminava em "Erro: ..." (AttributeError)
+    """
+    steps = _run(services, "cancel", follow)["steps"]
+    done = next(step for step in steps if step["in"] == "motivo bem detalhado")
+
+    assert done["out"]["success"] is True
+    assert done["out"]["is_final"] is True
+    assert done["out"]["messages"][0]["text"].startswith("✅ Cancelamento concluído")
+    assert not any(message["text"].startswith("Erro:") for message in done["out"]["messages"])